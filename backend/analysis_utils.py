@@ -0,0 +1,196 @@
+"""
+Document analysis utilities for Pleader AI
+Single-call analysis for short documents and map-reduce analysis for long ones
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+
+from prompt_utils import RESPONSE_RESERVE, count_tokens, get_token_budget, remaining_budget, select_document_passages, split_by_tokens, truncate_to_tokens
+from rag_utils import gemini_generate
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL = 'gemini-2.5-pro'
+# Sections are analysed with a faster model; the reduce step uses ANALYSIS_MODEL
+ANALYSIS_MAP_MODEL = os.environ.get('ANALYSIS_MAP_MODEL', 'gemini-2.5-flash')
+ANALYSIS_SECTION_TOKENS = int(os.environ.get('ANALYSIS_SECTION_TOKENS', '6000'))
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get('ANALYSIS_MAX_CONCURRENCY', '10'))
+# Gemini calls block, and the default to_thread pool is too small to run many at once
+_llm_executor = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_CONCURRENCY, thread_name_prefix="analysis")
+
+# Opening of the document sent with every section so parties and definitions are known
+ANALYSIS_CONTEXT_TOKENS = 400
+
+# auto: map-reduce only when the document does not fit a single prompt
+ANALYSIS_MODES = ("auto", "single", "map_reduce")
+
+ANALYSIS_PROMPT_TEMPLATE = """Analyze this legal document strictly within the Indian legal framework:
+
+Document text:
+{text}
+
+Provide a comprehensive analysis with these sections:
+
+1. **Key Points**: Identify main clauses, provisions, and important sections. Reference specific clause numbers or paragraph references.
+
+2. **Risk Assessment**: Identify legal risks or concerns under Indian law. For each risk:
+   - Categorize severity: LOW/MEDIUM/HIGH
+   - Reference applicable Indian Acts, IPC sections, or constitutional articles
+   - Explain potential legal consequences under Indian jurisdiction
+
+3. **Suggestions**: Provide recommendations for improvement:
+   - Missing clauses required under Indian law
+   - Ambiguous terms needing clarification
+   - Compliance with Indian Contract Act, Consumer Protection Act, or other relevant legislation
+
+4. **Legal References**: Cite specific Indian legal provisions:
+   - Relevant sections from Indian Acts (e.g., Indian Contract Act 1872, IPC, CPC)
+   - Articles from the Indian Constitution if applicable
+   - Relevant Supreme Court or High Court precedents
+   - Mandatory compliance requirements under Indian law
+
+Format with clear headings, bullet points, and bold key terms. Be specific and professional, focusing exclusively on Indian legal framework."""
+
+SECTION_PROMPT_TEMPLATE = """You are analysing part {number} of {total} of a long legal document strictly within the Indian legal framework.
+
+Opening of the document (for context only, do not analyse it unless this is part 1):
+{context}
+
+Part {number} text:
+{text}
+
+Analyse ONLY part {number} with these sections:
+
+1. **Key Points**: Main clauses and provisions in this part, with clause or paragraph numbers.
+
+2. **Risk Assessment**: Legal risks under Indian law in this part. Give each risk a severity (LOW/MEDIUM/HIGH) and the applicable Act, section or article.
+
+3. **Suggestions**: Missing protections, ambiguous terms and compliance gaps in this part.
+
+4. **Legal References**: Indian Acts, sections, constitutional articles and precedents relevant to this part.
+
+Be concise and specific. Use bullet points. Do not add an introduction or conclusion."""
+
+REDUCE_PROMPT_TEMPLATE = """Below are analyses of the consecutive parts of one legal document, each produced separately.
+Merge them into a single analysis of the whole document strictly within the Indian legal framework.
+
+{partials}
+
+Write the combined analysis with these sections:
+
+1. **Key Points**: The document's main clauses and provisions, deduplicated and in document order, with clause or paragraph references.
+
+2. **Risk Assessment**: All distinct legal risks under Indian law, most severe first. For each risk:
+   - Categorize severity: LOW/MEDIUM/HIGH
+   - Reference applicable Indian Acts, IPC sections, or constitutional articles
+   - Explain potential legal consequences under Indian jurisdiction
+   Merge risks that repeat across parts and note where clauses in different parts conflict.
+
+3. **Suggestions**: Consolidated recommendations, including clauses missing from the document as a whole.
+
+4. **Legal References**: The deduplicated Indian legal provisions and precedents cited.
+
+Format with clear headings, bullet points, and bold key terms. Be specific and professional, focusing exclusively on Indian legal framework."""
+
+# Identifies the prompts, models, token budgets and sectioning that produce an
+# analysis; cached analyses are only reused while it is unchanged
+ANALYSIS_PROMPT_VERSION = hashlib.sha256("\0".join([
+    ANALYSIS_MODEL, ANALYSIS_MAP_MODEL, str(ANALYSIS_SECTION_TOKENS), str(ANALYSIS_CONTEXT_TOKENS),
+    # The budgets decide how much of the document a single-call analysis sees
+    str(get_token_budget(ANALYSIS_MODEL)), str(get_token_budget(ANALYSIS_MAP_MODEL)), str(RESPONSE_RESERVE),
+    ANALYSIS_PROMPT_TEMPLATE, SECTION_PROMPT_TEMPLATE, REDUCE_PROMPT_TEMPLATE,
+]).encode('utf-8')).hexdigest()[:16]
+
+
+class AnalysisResult(NamedTuple):
+    """Analysis text, and whether every section of the document was analysed"""
+    text: str
+    complete: bool
+
+
+async def _call_llm(llm: Callable[[str, str], str], model_name: str, prompt: str) -> str:
+    """Run a blocking LLM call on the analysis thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_llm_executor, llm, model_name, prompt)
+
+
+def build_analysis_prompt(text: str) -> str:
+    """Build the Gemini prompt for analysing a legal document within the model's token budget"""
+    budget = remaining_budget(ANALYSIS_MODEL, ANALYSIS_PROMPT_TEMPLATE)
+    return ANALYSIS_PROMPT_TEMPLATE.format(text=select_document_passages(text, budget))
+
+
+def build_reduce_prompt(partials: List[str]) -> str:
+    """Build the prompt merging section analyses, trimming each evenly if they exceed the budget"""
+    sections = [f"=== Analysis of part {i + 1} of {len(partials)} ===\n{partial}" for i, partial in enumerate(partials)]
+    budget = remaining_budget(ANALYSIS_MODEL, REDUCE_PROMPT_TEMPLATE)
+    if sum(count_tokens(section) for section in sections) > budget:
+        share = budget // len(sections)
+        sections = [truncate_to_tokens(section, share) for section in sections]
+    return REDUCE_PROMPT_TEMPLATE.format(partials="\n\n".join(sections))
+
+
+async def analyze_text(text: str, mode: str = "auto",
+                       llm: Optional[Callable[[str, str], str]] = None) -> AnalysisResult:
+    """
+    Analyse document text with Gemini
+
+    Args:
+        text: Extracted document text
+        mode: auto, single or map_reduce
+        llm: (model_name, prompt) -> text callable, Gemini by default
+
+    Returns:
+        Analysis text, incomplete if some sections could not be analysed
+    """
+    llm = llm or gemini_generate
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {mode}. Use one of: {', '.join(ANALYSIS_MODES)}")
+
+    fits = count_tokens(text) <= remaining_budget(ANALYSIS_MODEL, ANALYSIS_PROMPT_TEMPLATE)
+    if mode == "single" or (mode == "auto" and fits):
+        return AnalysisResult(await _call_llm(llm, ANALYSIS_MODEL, build_analysis_prompt(text)), True)
+
+    return await map_reduce_analysis(text, llm)
+
+
+async def map_reduce_analysis(text: str, llm: Callable[[str, str], str]) -> AnalysisResult:
+    """
+    Analyse sections of a long document concurrently, then merge the partial analyses
+
+    Args:
+        text: Extracted document text
+        llm: (model_name, prompt) -> text callable
+
+    Returns:
+        Merged analysis text, incomplete if some sections failed
+    """
+    sections = split_by_tokens(text, ANALYSIS_SECTION_TOKENS)
+    context = truncate_to_tokens(sections[0], ANALYSIS_CONTEXT_TOKENS) if sections else ""
+    semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+
+    async def analyse_section(number: int, section: str) -> Optional[str]:
+        prompt = SECTION_PROMPT_TEMPLATE.format(number=number, total=len(sections), context=context, text=section)
+        async with semaphore:
+            try:
+                return await _call_llm(llm, ANALYSIS_MAP_MODEL, prompt)
+            except Exception as e:
+                logger.error(f"Analysis of part {number}/{len(sections)} failed: {e}")
+                return None
+
+    logger.info(f"Map-reduce analysis of {len(sections)} sections ({count_tokens(text)} tokens)")
+    results = await asyncio.gather(*(analyse_section(i + 1, section) for i, section in enumerate(sections)))
+
+    partials = [
+        result if result is not None else "(This part could not be analysed.)"
+        for result in results
+    ]
+    if all(result is None for result in results):
+        raise RuntimeError("Analysis failed for every section of the document")
+
+    merged = await _call_llm(llm, ANALYSIS_MODEL, build_reduce_prompt(partials))
+    return AnalysisResult(merged, all(result is not None for result in results))
@@ -0,0 +1,152 @@
+"""
+Caching utilities for Pleader AI
+Size-bounded LRU cache of rendered files on local disk
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts: str) -> str:
+    """Stable hex key for a tuple of strings"""
+    return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+
+class DiskLRUCache:
+    """
+    Files on disk, evicted least-recently-used first once they exceed max_bytes
+
+    Entries are written to a temporary file and renamed into place, so readers
+    never see a partial entry. Access order is kept in memory and mirrored to
+    file mtimes, so it survives restarts. Worker processes sharing a directory
+    each enforce the limit on their own view; an entry evicted by another
+    process is simply a miss.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recent first
+        self._size = 0
+
+        existing = []
+        for path in self.directory.iterdir():
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                existing.append((stat.st_mtime, path.name, stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return a cached entry and mark it most recently used, or None"""
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Open a cached entry for reading and mark it most recently used, or None
+
+        The open file stays readable even if the entry is evicted meanwhile.
+        """
+        try:
+            f = open(self._path(key), 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        size = os.fstat(f.fileno()).st_size
+
+        with self._lock:
+            # The entry may have been written (or rewritten) by another worker process
+            self._size += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+        return f
+
+    def put(self, key: str, data: bytes):
+        """Store an entry, evicting the least recently used ones beyond max_bytes"""
+        if len(data) > self.max_bytes:
+            return
+        try:
+            with self.writer(key) as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+
+    def reserve(self) -> str:
+        """Path of a new temporary file in the cache directory, to be passed to commit or discard"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(fd)
+        return tmp_path
+
+    def commit(self, key: str, tmp_path: str):
+        """Move a file written at a reserved path into the cache as key"""
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            self.discard(tmp_path)
+            return
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+
+    def discard(self, tmp_path: str):
+        """Remove a reserved file that will not be committed"""
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[BinaryIO]:
+        """
+        Write an entry incrementally
+
+        The entry is committed when the block exits normally and discarded if
+        it raises (including a streaming response being abandoned).
+        """
+        tmp_path = self.reserve()
+        try:
+            with open(tmp_path, 'wb') as f:
+                yield f
+            self.commit(key, tmp_path)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+
+    def _evict(self):
+        """Drop least recently used entries until within max_bytes (lock must be held)"""
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,104 @@
+"""
+Near-duplicate detection utilities for Pleader AI
+64-bit SimHash signatures with a banded LSH table for fast lookups
+"""
+
+import os
+import re
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Maximum differing bits for two chunks to count as near-duplicates
+MAX_DISTANCE = int(os.environ.get('RAG_DEDUP_MAX_DISTANCE', '3'))
+SHINGLE_SIZE = 3
+SIMHASH_BITS = 64
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def simhash(text: str) -> int:
+    """
+    Compute a 64-bit SimHash over word shingles
+
+    Args:
+        text: Input text
+
+    Returns:
+        Signature as an unsigned 64-bit int
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) >= SHINGLE_SIZE:
+        features = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        features = tokens or [text]
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode('utf-8'), digest_size=8).digest(), 'little') for f in features],
+        dtype=np.uint64
+    )
+    # One row of 64 bits per feature; each bit votes +1/-1
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(features)
+    packed = np.packbits(votes > 0, bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two signatures"""
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    Banded LSH table over SimHash signatures
+
+    With MAX_DISTANCE + 1 bands, any two signatures within MAX_DISTANCE bits
+    share at least one identical band, so lookups only compare a few candidates.
+    Lookups and additions may come from different threads.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(self.num_bands)]
+        self.signatures: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _bands(self, signature: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(signature >> (band * self.band_bits)) & mask for band in range(self.num_bands)]
+
+    def add(self, key: int, signature: int):
+        """Register a signature under a key (e.g. a vector id)"""
+        with self._lock:
+            if key in self.signatures:
+                return
+            self.signatures[key] = signature
+            for table, band in zip(self.tables, self._bands(signature)):
+                table.setdefault(band, []).append(key)
+
+    def find(self, signature: int) -> Optional[int]:
+        """
+        Find a stored near-duplicate
+
+        Args:
+            signature: SimHash to look up
+
+        Returns:
+            Key of the closest stored signature within max_distance, or None
+        """
+        best_key, best_distance = None, self.max_distance + 1
+        with self._lock:
+            for table, band in zip(self.tables, self._bands(signature)):
+                for key in table.get(band, ()):
+                    distance = hamming_distance(signature, self.signatures[key])
+                    if distance < best_distance:
+                        best_key, best_distance = key, distance
+        return best_key
+
+    def __len__(self) -> int:
+        return len(self.signatures)
@@ -3,139 +3,529 @@ Document extraction utilities for Pleader AI
 Supports PDF, DOCX, TXT, and images (JPG, PNG) with OCR
 """
 
+import os
 import logging
-from typing import Optional
+from typing import Optional, Union, BinaryIO, Iterator, List, NamedTuple, Tuple, Dict
 from pathlib import Path
+from contextlib import contextmanager
 import io
+import time
+import shutil
+import tempfile
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
 
 # PDF extraction
 from pypdf import PdfReader
 
-# DOCX extraction
-from docx import Document
-
 # Image OCR
 from PIL import Image
 import pytesseract
+from ocr_utils import OCR_QUEUE_TIMEOUT, OCR_WORKERS, OCRQueueFull, load_image_for_ocr, submit_ocr
+from pool_utils import WorkerPool
 
 logger = logging.getLogger(__name__)
 
+# Uploads can be passed as bytes, a path on disk, or an open binary file
+FileSource = Union[bytes, str, Path, BinaryIO]
+
+# Leading bytes of each supported format; TXT has none and is checked separately
+MAGIC_SIGNATURES = {
+    'pdf': [b'%PDF-'],
+    'docx': [b'PK\x03\x04'],
+    'doc': [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'],
+    'jpg': [b'\xff\xd8\xff'],
+    'jpeg': [b'\xff\xd8\xff'],
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'bmp': [b'BM'],
+    'tiff': [b'II*\x00', b'MM\x00*'],
+}
+TEXT_EXTENSIONS = ['txt', 'text']
+# Bytes needed to sniff any supported format
+SNIFF_BYTES = 2048
+
+# Page-parallel PDF extraction: pypdf is pure Python, so pages are spread over processes
+PDF_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', '8'))
+PDF_EXTRACT_TIMEOUT = float(os.environ.get('PDF_EXTRACT_TIMEOUT', '120'))
+# Below this many pages the process round-trip costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', '16'))
+
+# Pages with less text than this are treated as scanned and OCR'd
+OCR_PDF_PAGES = os.environ.get('OCR_PDF_PAGES', 'true').lower() in ('1', 'true', 'yes')
+OCR_MIN_PAGE_CHARS = 20
+
+# WordprocessingML elements read by the streaming DOCX extractor
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+# Legacy copies of text boxes and shapes, which would otherwise be read twice
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+DOCX_BODY_PART = 'word/document.xml'
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+class ExtractionResult(NamedTuple):
+    """Extracted text, and whether every page made it in before the deadline"""
+    text: str
+    complete: bool
+
+
+@contextmanager
+def open_source(source: FileSource) -> Iterator[BinaryIO]:
     """
-    Extract text from PDF file
+    Open a file source as a readable binary stream positioned at the start
+    
+    Paths are opened (and closed afterwards); file objects are rewound but left open.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+    elif isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        if source.seekable():
+            source.seek(0)
+        yield source
+
+
+def file_extension(filename: str) -> str:
+    """Lower-case extension of a filename ('' if none)"""
+    return filename.lower().split('.')[-1] if '.' in filename else ''
+
+
+def matches_file_type(header: bytes, filename: str) -> bool:
+    """
+    Check that a file's leading bytes match the type its extension claims
     
     Args:
-        file_content: PDF file bytes
+        header: First SNIFF_BYTES bytes of the file
+        filename: Original filename
         
     Returns:
-        Extracted text
+        True if the content looks like the claimed type
     """
-    try:
-        pdf_file = io.BytesIO(file_content)
-        reader = PdfReader(pdf_file)
+    file_ext = file_extension(filename)
+    if file_ext in TEXT_EXTENSIONS:
+        # Binary formats almost always contain NUL bytes early on
+        return b'\x00' not in header
+    return any(header.startswith(magic) for magic in MAGIC_SIGNATURES.get(file_ext, []))
+
+
+def _get_pdf_pool(workers: int) -> WorkerPool:
+    """Shared process pool for PDF extraction, created on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool.workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown()
+            _pdf_pool = WorkerPool(workers, drain_timeout=PDF_EXTRACT_TIMEOUT, name="PDF extraction")
+        return _pdf_pool
+
+
+def _extract_pdf_page_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF on disk (runs in a worker process)"""
+    reader = PdfReader(path)
+    pages = []
+    for page_num in range(start, end):
+        try:
+            pages.append((page_num, reader.pages[page_num].extract_text() or ""))
+        except Exception as e:
+            logger.warning(f"Error extracting page {page_num + 1}: {e}")
+            pages.append((page_num, ""))
+    return pages
+
+
+def _extract_pdf_parallel(pdf_file: BinaryIO, num_pages: int, workers: int,
+                          timeout: float) -> Tuple[List[Tuple[int, str]], bool]:
+    """
+    Extract page ranges in the process pool
+    
+    Pages not finished within the timeout, or whose range failed, are left out.
+    
+    Returns:
+        (page number, text) pairs in page order, and whether every range was extracted
+    """
+    # Workers read the PDF from disk; the OS page cache shares it between them
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        pdf_file.seek(0)
+        shutil.copyfileobj(pdf_file, tmp)
+        tmp.flush()
+        
+        pool = _get_pdf_pool(workers)
+        futures = [
+            pool.submit(_extract_pdf_page_range, tmp.name, start, min(start + PDF_PAGES_PER_TASK, num_pages))
+            for start in range(0, num_pages, PDF_PAGES_PER_TASK)
+        ]
+        done, pending = wait(futures, timeout=timeout)
+        
+        if pending:
+            logger.warning(f"PDF extraction timed out after {timeout}s with {len(pending)} of {len(futures)} page ranges unfinished")
+            # Only this document's page ranges are given up; other uploads keep their workers
+            pool.retire(pending)
         
-        text_parts = []
-        for page_num, page in enumerate(reader.pages):
+        pages = []
+        complete = not pending
+        for future in futures:
+            if future not in done:
+                continue
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                raise error
+            if error is not None:
+                logger.warning(f"Error extracting PDF page range: {error}")
+                complete = False
+            else:
+                pages.extend(future.result())
+        return pages, complete
+
+
+def _page_image(page) -> Optional[Tuple[Image.Image, float]]:
+    """
+    Return the scanned image of a page without a text layer, with its effective DPI
+    
+    Scanners embed each page as one full-page image, so the largest image is used.
+    """
+    try:
+        images = [image_file.image for image_file in page.images]
+    except Exception as e:
+        logger.warning(f"Could not decode page images: {e}")
+        return None
+    if not images:
+        return None
+    
+    image = max(images, key=lambda im: im.width * im.height)
+    if page.rotation:
+        image = image.rotate(-page.rotation, expand=True)
+    page_inches = float(page.mediabox.width if page.rotation % 180 == 0 else page.mediabox.height) / 72
+    return image, image.width / page_inches if page_inches else None
+
+
+def _ocr_scanned_pages(reader: PdfReader, pages: Dict[int, str], deadline: float) -> bool:
+    """
+    OCR pages that have no text layer, in parallel on the OCR pool
+    
+    Page images are decoded one at a time and at most two per OCR worker are
+    in flight, so memory stays bounded on long scanned filings. Pages are
+    deskewed and binarized before OCR, which suits flat scans. Pages missing
+    from pages (their range timed out) are not OCR'd, and a page whose OCR
+    fails is left out without losing the others.
+    
+    Returns:
+        False if OCR ran out of time, failed on a page or Tesseract is missing,
+        so some pages were skipped
+    
+    Raises:
+        OCRQueueFull: If the OCR pool stays saturated before the deadline; the caller should retry later
+    """
+    scanned = [n for n, text in sorted(pages.items()) if len(text.strip()) < OCR_MIN_PAGE_CHARS]
+    if not scanned:
+        return True
+    
+    complete = False
+    in_flight = deque()
+    recognised = 0
+    failed = 0
+    
+    def collect(limit: int):
+        nonlocal recognised, failed
+        while len(in_flight) > limit:
+            page_num, future = in_flight.popleft()
             try:
-                text = page.extract_text()
-                if text:
-                    text_parts.append(f"[Page {page_num + 1}]\n{text}")
+                text = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except (FutureTimeoutError, pytesseract.TesseractNotFoundError):
+                raise
             except Exception as e:
-                logger.warning(f"Error extracting page {page_num + 1}: {e}")
+                logger.warning(f"OCR failed on page {page_num + 1}: {e}")
+                failed += 1
+                continue
+            if text.strip():
+                pages[page_num] = text
+                recognised += 1
+    
+    try:
+        for page_num in scanned:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FutureTimeoutError()
+            extracted = _page_image(reader.pages[page_num])
+            if extracted is None:
+                continue
+            try:
+                future = submit_ocr(*extracted, timeout=min(remaining, OCR_QUEUE_TIMEOUT), scan=True)
+            except OCRQueueFull:
+                # Waiting out the rest of the deadline is a timeout, not an overloaded queue
+                if time.monotonic() < deadline:
+                    raise
+                raise FutureTimeoutError()
+            in_flight.append((page_num, future))
+            collect(OCR_WORKERS * 2)
+        collect(0)
+        complete = not failed
+    except pytesseract.TesseractNotFoundError:
+        logger.error("Tesseract is not installed; scanned PDF pages cannot be OCR'd")
+    except FutureTimeoutError:
+        logger.warning(f"PDF OCR timed out with {len(in_flight)} pages outstanding")
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+    
+    logger.info(f"OCR recognised {recognised} of {len(scanned)} pages without a text layer"
+                + (f" ({failed} failed)" if failed else ""))
+    return complete
+
+
+def extract_text_from_pdf(source: FileSource, workers: Optional[int] = None,
+                          timeout: Optional[float] = None, ocr: Optional[bool] = None) -> str:
+    """
+    Extract text from PDF file
+    
+    Large PDFs are split into page ranges extracted in parallel worker processes.
+    Pages without a text layer (scans) are OCR'd from their embedded page image.
+    
+    Args:
+        source: PDF file bytes, path or binary file object
+        workers: Worker processes (default PDF_EXTRACT_WORKERS; 1 extracts in-process)
+        timeout: Seconds to wait for all pages, including OCR (default PDF_EXTRACT_TIMEOUT)
+        ocr: OCR scanned pages (default OCR_PDF_PAGES)
         
+    Returns:
+        Extracted text
+        
+    Raises:
+        OCRQueueFull: If the OCR pool is saturated; the caller should retry later
+    """
+    return _extract_pdf(source, workers, timeout, ocr).text
+
+
+def _extract_pdf(source: FileSource, workers: Optional[int] = None,
+                 timeout: Optional[float] = None, ocr: Optional[bool] = None) -> ExtractionResult:
+    """extract_text_from_pdf, also reporting whether any pages were given up on"""
+    workers = workers or PDF_WORKERS
+    timeout = timeout or PDF_EXTRACT_TIMEOUT
+    ocr = OCR_PDF_PAGES if ocr is None else ocr
+    deadline = time.monotonic() + timeout
+    try:
+        with open_source(source) as pdf_file:
+            reader = PdfReader(pdf_file)
+            num_pages = len(reader.pages)
+            
+            pages = None
+            complete = True
+            if workers > 1 and num_pages >= PDF_PARALLEL_MIN_PAGES:
+                try:
+                    pages, complete = _extract_pdf_parallel(pdf_file, num_pages, workers, timeout)
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. out of memory); retry this document in-process.
+                    # The pool replaces the broken executor on the next submission
+                    logger.warning(f"PDF worker pool failed, extracting in-process: {e}")
+            
+            if pages is None:
+                pages = []
+                for page_num, page in enumerate(reader.pages):
+                    try:
+                        pages.append((page_num, page.extract_text() or ""))
+                    except Exception as e:
+                        logger.warning(f"Error extracting page {page_num + 1}: {e}")
+                        pages.append((page_num, ""))
+            
+            pages = dict(pages)
+            if ocr:
+                complete = _ocr_scanned_pages(reader, pages, deadline) and complete
+        
+        text_parts = [f"[Page {page_num + 1}]\n{pages[page_num]}" for page_num in sorted(pages) if pages[page_num]]
         extracted_text = "\n\n".join(text_parts)
-        logger.info(f"Extracted {len(extracted_text)} characters from PDF ({len(reader.pages)} pages)")
+        logger.info(f"Extracted {len(extracted_text)} characters from PDF ({num_pages} pages)")
         
-        return extracted_text
+        return ExtractionResult(extracted_text, complete)
         
+    except OCRQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error extracting PDF: {e}")
-        return f"Error extracting PDF: {str(e)}"
+        return ExtractionResult(f"Error extracting PDF: {str(e)}", False)
 
 
-def extract_text_from_docx(file_content: bytes) -> str:
+def iter_docx_blocks(docx_file: BinaryIO) -> Iterator[str]:
     """
-    Extract text from DOCX file
+    Stream the paragraphs and table rows of a DOCX body in document order
+    
+    word/document.xml is parsed incrementally and each top-level block is
+    discarded once emitted, so memory stays flat however long the document is.
+    Paragraph text follows python-docx (tabs as \\t, line breaks as \\n); table
+    rows are emitted as "cell | cell", with nested tables folded into their cell.
     
     Args:
-        file_content: DOCX file bytes
+        docx_file: Seekable binary DOCX (zip) file
         
-    Returns:
-        Extracted text
+    Yields:
+        Non-empty paragraph and table-row texts
     """
-    try:
-        docx_file = io.BytesIO(file_content)
-        doc = Document(docx_file)
-        
-        text_parts = []
+    with zipfile.ZipFile(docx_file) as archive, archive.open(DOCX_BODY_PART) as xml_file:
+        body = None
+        depth = 0
+        body_depth = None
+        fallback_depth = None
+        paragraphs: List[List[str]] = []  # open paragraphs (text boxes nest inside paragraphs)
+        cells: List[List[str]] = []       # open table cells, holding their paragraph texts
+        rows: List[List[str]] = []        # open table rows, holding their cell texts
         
-        # Extract paragraphs
-        for para in doc.paragraphs:
-            if para.text.strip():
-                text_parts.append(para.text)
+        def emit(text: str) -> Optional[str]:
+            # Text inside a table cell belongs to the cell; anything else is a block of its own
+            if cells:
+                cells[-1].append(text)
+                return None
+            return text if text.strip() else None
         
-        # Extract tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells)
-                if row_text.strip():
-                    text_parts.append(row_text)
+        for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                depth += 1
+                if fallback_depth is not None:
+                    continue
+                if tag == _MC_FALLBACK:
+                    fallback_depth = depth
+                elif tag == _W + 'body':
+                    body, body_depth = elem, depth
+                elif tag == _W + 'p':
+                    paragraphs.append([])
+                elif tag == _W + 'tc':
+                    cells.append([])
+                elif tag == _W + 'tr':
+                    rows.append([])
+                continue
+            
+            if fallback_depth is not None:
+                if depth == fallback_depth:
+                    fallback_depth = None
+                depth -= 1
+                continue
+            
+            block = None
+            if tag == _W + 't' and paragraphs:
+                paragraphs[-1].append(elem.text or "")
+            elif tag in (_W + 'tab', _W + 'ptab') and paragraphs:
+                paragraphs[-1].append("\t")
+            elif tag == _W + 'cr' and paragraphs:
+                paragraphs[-1].append("\n")
+            elif tag == _W + 'br' and paragraphs:
+                # Page and column breaks carry no text
+                if elem.get(_W + 'type', 'textWrapping') == 'textWrapping':
+                    paragraphs[-1].append("\n")
+            elif tag == _W + 'noBreakHyphen' and paragraphs:
+                paragraphs[-1].append("-")
+            elif tag == _W + 'p':
+                block = emit("".join(paragraphs.pop()))
+            elif tag == _W + 'tc':
+                rows[-1].append("\n".join(cells.pop()))
+            elif tag == _W + 'tr':
+                block = emit(" | ".join(cell.strip() for cell in rows.pop()))
+            
+            if block is not None:
+                yield block
+            
+            if body is not None and depth == body_depth + 1:
+                # A top-level paragraph or table is finished; drop it from the tree
+                body.clear()
+            depth -= 1
+
+
+def extract_text_from_docx(source: FileSource) -> str:
+    """
+    Extract text from DOCX file
+    
+    Args:
+        source: DOCX file bytes, path or binary file object
         
-        extracted_text = "\n\n".join(text_parts)
+    Returns:
+        Extracted text, with paragraphs and table rows in document order
+    """
+    return _extract_docx(source).text
+
+
+def _extract_docx(source: FileSource) -> ExtractionResult:
+    """extract_text_from_docx, reporting an error message as incomplete"""
+    try:
+        with open_source(source) as docx_file:
+            extracted_text = "\n\n".join(iter_docx_blocks(docx_file))
         logger.info(f"Extracted {len(extracted_text)} characters from DOCX")
         
-        return extracted_text
+        return ExtractionResult(extracted_text, True)
         
     except Exception as e:
         logger.error(f"Error extracting DOCX: {e}")
-        return f"Error extracting DOCX: {str(e)}"
+        return ExtractionResult(f"Error extracting DOCX: {str(e)}", False)
 
 
-def extract_text_from_image(file_content: bytes, filename: str = "") -> str:
+def extract_text_from_image(source: FileSource, filename: str = "") -> str:
     """
     Extract text from image using OCR (JPG, PNG, etc.)
     
+    Oversized images are downscaled while decoding, then OCR'd in grayscale on
+    the shared bounded OCR pool. Photos are not binarized, so Tesseract's
+    adaptive thresholding handles uneven lighting.
+    
     Args:
-        file_content: Image file bytes
+        source: Image file bytes, path or binary file object
         filename: Original filename (for logging)
         
     Returns:
         Extracted text via OCR
+        
+    Raises:
+        OCRQueueFull: If the OCR pool is saturated; the caller should retry later
     """
+    return _extract_image(source, filename).text
+
+
+def _extract_image(source: FileSource, filename: str = "") -> ExtractionResult:
+    """extract_text_from_image, reporting an error message as incomplete"""
     try:
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        with open_source(source) as image_file:
+            image = load_image_for_ocr(image_file)
         
-        # Perform OCR
-        text = pytesseract.image_to_string(image)
+        text = submit_ocr(image).result()
         
         logger.info(f"Extracted {len(text)} characters from image {filename} using OCR")
         
         if not text.strip():
-            return "No text could be extracted from this image. The image may not contain readable text."
+            return ExtractionResult(
+                "No text could be extracted from this image. The image may not contain readable text.", True
+            )
         
-        return text
+        return ExtractionResult(text, True)
         
+    except OCRQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text from image: {e}")
-        return f"Error performing OCR on image: {str(e)}"
+        return ExtractionResult(f"Error performing OCR on image: {str(e)}", False)
 
 
-def extract_text_from_txt(file_content: bytes) -> str:
+def extract_text_from_txt(source: FileSource) -> str:
     """
     Extract text from TXT file
     
     Args:
-        file_content: Text file bytes
+        source: Text file bytes, path or binary file object
         
     Returns:
         Decoded text
     """
+    return _extract_txt(source).text
+
+
+def _extract_txt(source: FileSource) -> ExtractionResult:
+    """extract_text_from_txt, reporting an error message as incomplete"""
     try:
+        with open_source(source) as text_file:
+            file_content = text_file.read()
+        
         # Try UTF-8 first
         try:
             text = file_content.decode('utf-8')
@@ -144,40 +534,62 @@ def extract_text_from_txt(file_content: bytes) -> str:
             text = file_content.decode('latin-1', errors='ignore')
         
         logger.info(f"Extracted {len(text)} characters from TXT file")
-        return text
+        return ExtractionResult(text, True)
         
     except Exception as e:
         logger.error(f"Error extracting TXT: {e}")
-        return f"Error extracting text: {str(e)}"
+        return ExtractionResult(f"Error extracting text: {str(e)}", False)
 
 
-def extract_text_from_file(file_content: bytes, filename: str) -> str:
+def extract_text_from_file(source: FileSource, filename: str) -> str:
     """
     Extract text from any supported file type
     
     Args:
-        file_content: File bytes
+        source: File bytes, path or binary file object
         filename: Original filename
         
     Returns:
         Extracted text
     """
-    file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
+    return extract_file(source, filename).text
+
+
+def extract_file(source: FileSource, filename: str) -> ExtractionResult:
+    """
+    Extract text from any supported file type, reporting whether it is complete
+    
+    Extraction is incomplete when PDF page ranges or scanned pages missed the
+    extraction deadline or failed, and whenever the text is an error message
+    rather than the file's content. Such text is fine for the upload at hand
+    but should not be reused for later uploads of the same file.
+    
+    Args:
+        source: File bytes, path or binary file object
+        filename: Original filename
+        
+    Returns:
+        Extracted text and whether all of it was extracted
+        
+    Raises:
+        OCRQueueFull: If the OCR pool is saturated; the caller should retry later
+    """
+    file_ext = file_extension(filename)
     
     if file_ext == 'pdf':
-        return extract_text_from_pdf(file_content)
+        return _extract_pdf(source)
     elif file_ext in ['docx', 'doc']:
         if file_ext == 'doc':
             logger.warning("Legacy .doc format detected. Only .docx is fully supported.")
-            return "Legacy .doc format is not supported. Please convert to .docx format."
-        return extract_text_from_docx(file_content)
-    elif file_ext in ['txt', 'text']:
-        return extract_text_from_txt(file_content)
+            return ExtractionResult("Legacy .doc format is not supported. Please convert to .docx format.", False)
+        return _extract_docx(source)
+    elif file_ext in TEXT_EXTENSIONS:
+        return _extract_txt(source)
     elif file_ext in ['jpg', 'jpeg', 'png', 'bmp', 'tiff']:
-        return extract_text_from_image(file_content, filename)
+        return _extract_image(source, filename)
     else:
         logger.warning(f"Unsupported file type: {file_ext}")
-        return f"Unsupported file type: {file_ext}. Supported types: PDF, DOCX, TXT, JPG, PNG"
+        return ExtractionResult(f"Unsupported file type: {file_ext}. Supported types: PDF, DOCX, TXT, JPG, PNG", False)
 
 
 def validate_file_type(filename: str) -> bool:
@@ -191,5 +603,5 @@ def validate_file_type(filename: str) -> bool:
         True if supported, False otherwise
     """
     supported_extensions = ['pdf', 'docx', 'doc', 'txt', 'text', 'jpg', 'jpeg', 'png', 'bmp', 'tiff']
-    file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
+    file_ext = file_extension(filename)
     return file_ext in supported_extensions
@@ -0,0 +1,202 @@
+"""
+Embedding backends for Pleader AI
+Gemini API embeddings, a local CPU sentence-transformers model, and a deterministic hashing embedder
+"""
+
+import os
+import re
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+# Initialize Gemini API
+genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+
+# Maximum texts per Gemini batch embedding request
+GEMINI_BATCH_SIZE = 100
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class EmbeddingBackend(ABC):
+    """Base class for embedding backends"""
+
+    name = "base"
+    dimension = 0
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embed document chunks for indexing
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One float32 vector per text, or None where embedding failed
+        """
+
+    @abstractmethod
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """
+        Embed a search query
+
+        Args:
+            query: Search query
+
+        Returns:
+            float32 vector or None on error
+        """
+
+    def embed_queries(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embed several search queries, batching where the backend supports it
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            One float32 vector per query, or None where embedding failed
+        """
+        return [self.embed_query(query) for query in queries]
+
+
+class GeminiEmbedder(EmbeddingBackend):
+    """Remote embeddings from the Gemini API"""
+
+    dimension = 768
+
+    def __init__(self, model: str = "models/embedding-001"):
+        self.model = model
+        self.name = f"gemini:{model}"
+
+    def _embed_one(self, text: str, task_type: str) -> Optional[np.ndarray]:
+        try:
+            result = genai.embed_content(
+                model=self.model,
+                content=text,
+                task_type=task_type
+            )
+            return np.array(result['embedding'], dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            return None
+
+    def _embed_batched(self, texts: List[str], task_type: str) -> List[Optional[np.ndarray]]:
+        embeddings = []
+        for start in range(0, len(texts), GEMINI_BATCH_SIZE):
+            batch = texts[start:start + GEMINI_BATCH_SIZE]
+            try:
+                result = genai.embed_content(
+                    model=self.model,
+                    content=batch,
+                    task_type=task_type
+                )
+                embeddings.extend(np.array(e, dtype=np.float32) for e in result['embedding'])
+            except Exception as e:
+                # Retry one by one so a single bad text does not drop the whole batch
+                logger.warning(f"Batch embedding failed, falling back to single requests: {e}")
+                embeddings.extend(self._embed_one(text, task_type) for text in batch)
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        return self._embed_batched(texts, "retrieval_document")
+
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        return self._embed_one(query, "retrieval_query")
+
+    def embed_queries(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        return self._embed_batched(queries, "retrieval_query")
+
+
+class LocalEmbedder(EmbeddingBackend):
+    """Offline CPU embeddings from a sentence-transformers model"""
+
+    def __init__(self, model: Optional[str] = None):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError(
+                "The local embedding backend requires sentence-transformers: pip install sentence-transformers"
+            )
+
+        self.model_name = model or os.environ.get('LOCAL_EMBEDDING_MODEL', "sentence-transformers/all-MiniLM-L6-v2")
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.name = f"local:{self.model_name}"
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        try:
+            vectors = self.model.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True)
+            return list(vectors.astype(np.float32))
+        except Exception as e:
+            logger.error(f"Error generating local embeddings: {e}")
+            return [None] * len(texts)
+
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        vectors = self.embed_documents([query])
+        return vectors[0] if vectors else None
+
+    def embed_queries(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        return self.embed_documents(queries)
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """
+    Deterministic feature-hashing embedder
+
+    Word unigrams and bigrams are hashed into signed buckets and L2 normalized.
+    No model or network access is needed, so it suits tests and offline benchmarks.
+    """
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+        self.name = f"hashing:{dimension}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimension] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        return self._embed(query)
+
+
+def get_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Create the embedding backend selected by name or the EMBEDDING_BACKEND env var
+
+    Args:
+        name: gemini, local or hashing
+
+    Returns:
+        Embedding backend instance
+    """
+    name = (name or os.environ.get('EMBEDDING_BACKEND', 'gemini')).lower()
+
+    if name == "gemini":
+        return GeminiEmbedder()
+    if name == "local":
+        return LocalEmbedder()
+    if name == "hashing":
+        return HashingEmbedder(int(os.environ.get('HASHING_EMBEDDING_DIM', '768')))
+
+    raise ValueError(f"Unknown embedding backend: {name}. Use gemini, local or hashing")
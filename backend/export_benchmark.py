@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Pleader AI chat and analysis exports
+
+Renders a synthetic chat and document analysis with each export function and
+measures CPU time per export: the first export in a fresh process (which pays
+for building styles and templates) and the median of the exports after it.
+
+Results are written as JSON so runs on different commits can be compared.
+
+Usage:
+    python export_benchmark.py --messages 20 --repeats 30
+    python export_benchmark.py --output before.json
+    python export_benchmark.py --compare before.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import export_utils
+from rag_benchmark import git_commit, synthetic_legal_document
+
+EXPORTERS = {
+    "chat_pdf": "export_chat_to_pdf",
+    "chat_docx": "export_chat_to_docx",
+    "chat_txt": "export_chat_to_txt",
+    "analysis_pdf": "export_analysis_to_pdf",
+    "analysis_docx": "export_analysis_to_docx",
+    "analysis_txt": "export_analysis_to_txt",
+}
+
+
+def synthetic_chat(num_messages: int, seed: int = 0) -> Dict[str, Any]:
+    """A chat alternating short questions and clause-length answers, stored as the server stores it"""
+    rng = random.Random(seed)
+    started = datetime(2026, 1, 5, 9, 30, tzinfo=timezone.utc)
+    messages = []
+    for i in range(num_messages):
+        from_user = i % 2 == 0
+        messages.append({
+            "sender": "user" if from_user else "ai",
+            "content": synthetic_legal_document(rng, num_clauses=1 if from_user else 4),
+            "timestamp": (started + timedelta(minutes=i)).isoformat(),
+        })
+    return {
+        "title": "Tenancy dispute - notice period",
+        "created_at": started.isoformat(),
+        "messages": messages,
+    }
+
+
+def synthetic_analysis(num_paragraphs: int, seed: int = 0) -> Dict[str, Any]:
+    """A stored document analysis with num_paragraphs paragraphs"""
+    rng = random.Random(seed)
+    paragraphs = [synthetic_legal_document(rng, num_clauses=3) for _ in range(num_paragraphs)]
+    return {
+        "filename": "lease_agreement.pdf",
+        "uploaded_at": datetime(2026, 1, 5, 9, 30, tzinfo=timezone.utc).isoformat(),
+        "analysis_result": {"full_analysis": "\n\n".join(paragraphs)},
+    }
+
+
+def _measure_export(name: str, data: Dict[str, Any], repeats: int) -> Dict[str, Any]:
+    """Export repeatedly in this (fresh) process and summarise CPU time per export"""
+    exporter = getattr(export_utils, EXPORTERS[name])
+    start = time.process_time()
+    rendered = exporter(data)
+    first = time.process_time() - start
+
+    timings = []
+    for _ in range(repeats):
+        start = time.process_time()
+        exporter(data)
+        timings.append(time.process_time() - start)
+    return {
+        "export": name,
+        "first_cpu_ms": first * 1000,
+        "median_cpu_ms": statistics.median(timings) * 1000,
+        "min_cpu_ms": min(timings) * 1000,
+        "bytes": len(rendered),
+    }
+
+
+def run_exports(args) -> List[Dict[str, Any]]:
+    chat = synthetic_chat(args.messages)
+    analysis = synthetic_analysis(args.paragraphs)
+    print(f"Synthetic chat: {args.messages} messages; analysis: {args.paragraphs} paragraphs "
+          f"(template version {export_utils.EXPORT_TEMPLATE_VERSION})")
+
+    results = []
+    for name in args.exports:
+        data = chat if name.startswith("chat") else analysis
+        # A new process per export so the first run pays for any per-process setup
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(_measure_export, name, data, args.repeats).result()
+        result["messages"] = args.messages
+        result["paragraphs"] = args.paragraphs
+        results.append(result)
+        print(f"{name:>14}: first {result['first_cpu_ms']:7.2f} ms, "
+              f"median {result['median_cpu_ms']:7.2f} ms CPU ({result['bytes'] / 1024:.0f} KB)")
+    return results
+
+
+def compare_results(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> int:
+    """
+    Print CPU time changes against a previous run and count regressions
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from a previous run
+        threshold: Relative change treated as a regression (0.1 = 10%)
+
+    Returns:
+        Number of regressed metrics
+    """
+    previous = {r["export"]: r for r in baseline}
+    regressions = 0
+    for result in current:
+        base = previous.get(result["export"])
+        if base is None:
+            continue
+        for metric in ("first_cpu_ms", "median_cpu_ms"):
+            change = (result[metric] - base[metric]) / base[metric]
+            regressed = change > threshold
+            regressions += regressed
+            print(f"{'REGRESSION ' if regressed else ''}{result['export']} {metric}: "
+                  f"{base[metric]:.2f} -> {result[metric]:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CPU time benchmark")
+    parser.add_argument("--messages", type=int, default=20, help="Messages in the synthetic chat")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphs in the synthetic analysis")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--exports", nargs="+", default=list(EXPORTERS), choices=list(EXPORTERS))
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    results = run_exports(args)
+
+    report = {
+        "benchmark": "export",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline["results"], args.threshold)
+        print(f"{regressions} regression(s) against {baseline.get('commit') or args.compare}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
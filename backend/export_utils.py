@@ -3,10 +3,17 @@ Export utilities for Pleader AI
 Supports PDF, DOCX, and TXT exports for chats and document analyses
 """
 
+import os
 import logging
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures.process import BrokenProcessPool
 import io
+import copy
+import pickle
+import zipfile
 
 # PDF generation
 from reportlab.lib.pagesizes import letter, A4
@@ -19,109 +26,411 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from docx import Document
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.style import WD_STYLE_TYPE
+
+from pool_utils import WorkerPool
 
 logger = logging.getLogger(__name__)
 
+# Bump when an export layout changes so cached exports are rendered again
+EXPORT_TEMPLATE_VERSION = "2"
 
-def export_chat_to_pdf(chat_data: Dict[str, Any]) -> bytes:
+EXPORT_MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+}
+
+# Rendering is CPU-bound, so it runs in worker processes off the event loop
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+EXPORT_TIMEOUT = float(os.environ.get('EXPORT_TIMEOUT', '60'))
+# Renders of each format allowed at once, so a burst of PDF exports cannot occupy every worker
+EXPORT_FORMAT_CONCURRENCY = {
+    "pdf": int(os.environ.get('EXPORT_PDF_CONCURRENCY', '2')),
+    "docx": int(os.environ.get('EXPORT_DOCX_CONCURRENCY', '2')),
+    "txt": int(os.environ.get('EXPORT_TXT_CONCURRENCY', '4')),
+}
+
+# Workers are spawned on the first export
+_export_pool = WorkerPool(EXPORT_WORKERS, drain_timeout=EXPORT_TIMEOUT, name="export")
+_format_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+class ExportTimeout(Exception):
+    """Raised when an export does not finish rendering within the timeout"""
+    pass
+
+
+def _render(exporter: Callable[[Dict[str, Any]], Union[bytes, str]], data: Dict[str, Any]) -> bytes:
+    """Run an export function and return its bytes (runs in a worker process)"""
+    rendered = exporter(data)
+    return rendered if isinstance(rendered, bytes) else rendered.encode('utf-8')
+
+
+async def run_export(format: str, func: Callable[..., Any], *args: Any, timeout: float = EXPORT_TIMEOUT) -> Any:
     """
-    Export chat to PDF format
+    Run an export function in the export process pool without blocking the event loop
     
     Args:
-        chat_data: Chat data including messages
+        format: pdf, docx or txt (selects the concurrency cap)
+        func: Module-level function to run in a worker
+        *args: Picklable arguments for func
+        timeout: Seconds to wait for the result, including time queued for a slot
         
     Returns:
-        PDF file bytes
+        Whatever func returns
+        
+    Raises:
+        ExportTimeout: If rendering does not finish in time
     """
+    slots = _format_slots.setdefault(format, asyncio.Semaphore(EXPORT_FORMAT_CONCURRENCY.get(format, 1)))
+    future = None
     try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        story = []
-        styles = getSampleStyleSheet()
+        async with asyncio.timeout(timeout):
+            async with slots:
+                try:
+                    future = _export_pool.submit(func, *args)
+                    return await asyncio.wrap_future(future)
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); retry once on the fresh pool that replaces it
+                    logger.warning("Export worker pool failed, retrying render")
+                    future = _export_pool.submit(func, *args)
+                    return await asyncio.wrap_future(future)
+    except TimeoutError:
+        if future is not None:
+            # Only this render is given up; if its worker is stuck, the pool is recycled once other exports finish
+            logger.warning(f"{format} export timed out after {timeout}s")
+            _export_pool.retire([future])
+        raise ExportTimeout(f"Export did not finish within {timeout:g} seconds")
+
+
+async def render_export(exporter: Callable[[Dict[str, Any]], Union[bytes, str]], format: str,
+                        data: Dict[str, Any], timeout: float = EXPORT_TIMEOUT) -> bytes:
+    """
+    Render an export in the export process pool without blocking the event loop
+    
+    Args:
+        exporter: Module-level export function, e.g. export_chat_to_pdf
+        format: pdf, docx or txt (selects the concurrency cap)
+        data: Chat or analysis document to render
+        timeout: Seconds to wait for the render, including time queued for a slot
+        
+    Returns:
+        Rendered file bytes
         
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
+    Raises:
+        ExportTimeout: If rendering does not finish in time
+    """
+    return await run_export(format, _render, exporter, data, timeout=timeout)
+
+
+class _StreamedStory(list):
+    """
+    Story list that pulls flowables from an iterator as the front is consumed
+
+    Platypus only ever works at the head of the story (and looks a few items
+    ahead for keep-with-next), so holding a small window keeps memory flat
+    however many messages a chat has.
+    """
+
+    def __init__(self, flowables: Iterator[Any], window: int = 64):
+        super().__init__()
+        self._source = flowables
+        self._window = window
+
+    def __len__(self):
+        while list.__len__(self) < self._window and self._source is not None:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable output that collects whatever is written until drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    ZIP archive written incrementally, handing back its bytes as they are produced
+
+    zipfile writes data descriptors when its output cannot seek, so entries are
+    added without knowing their size and only one chunk is buffered at a time.
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, 'w')
+
+    def add(self, name: str, source: BinaryIO, compress: bool = True,
+            chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Copy a file into a new entry, yielding archive bytes as they are written"""
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with self._zip.open(info, 'w') as entry:
+            while chunk := source.read(chunk_size):
+                entry.write(chunk)
+                yield self._sink.drain()
+        yield self._sink.drain()
+
+    def close(self) -> bytes:
+        """Finish the archive and return its remaining bytes (the central directory)"""
+        self._zip.close()
+        return self._sink.drain()
+
+
+def spill_message(spool: BinaryIO, message: Dict[str, Any]):
+    """Append a message to a spool file read back by read_spilled_messages"""
+    pickle.dump(message, spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_spilled_messages(spool: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield the messages written to a spool file, one at a time"""
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+class ExportMessage(NamedTuple):
+    """A chat message normalized once and rendered by every export format"""
+    from_user: bool
+    content: str
+    time: str  # e.g. "03:15 PM", or "" when unknown
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Stored timestamps are datetimes or ISO strings (possibly with a Z suffix)"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return None
+
+
+def format_export_date(value: Any) -> str:
+    """Long date shown in export headers, or the value as stored if it is not a timestamp"""
+    parsed = _parse_timestamp(value)
+    if parsed is None:
+        return str(value or '')
+    return parsed.strftime('%B %d, %Y at %I:%M %p')
+
+
+def normalize_message(msg: Dict[str, Any]) -> ExportMessage:
+    """Prepare a stored chat message for export"""
+    parsed = _parse_timestamp(msg.get('timestamp'))
+    return ExportMessage(
+        from_user=msg.get('sender', 'user') == 'user',
+        content=msg.get('content', ''),
+        time=parsed.strftime('%I:%M %p') if parsed else '',
+    )
+
+
+def normalize_messages(messages: Iterable[Dict[str, Any]]) -> Iterator[ExportMessage]:
+    """Normalize messages lazily, so long chats can be streamed"""
+    return map(normalize_message, messages)
+
+
+def _message_heading(message: ExportMessage, user_label: str, ai_label: str) -> str:
+    sender_label = user_label if message.from_user else ai_label
+    return f"{sender_label} ({message.time})" if message.time else sender_label
+
+
+def _pdf_markup(text: str) -> str:
+    """Escape plain text for a reportlab Paragraph, keeping line breaks"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
+
+
+@lru_cache(maxsize=None)
+def pdf_styles() -> Dict[str, ParagraphStyle]:
+    """Paragraph styles shared by every PDF export, built once per process"""
+    base = getSampleStyleSheet()
+    return {
+        "normal": base['Normal'],
+        "title": ParagraphStyle(
+            'ExportTitle',
+            parent=base['Heading1'],
             fontSize=18,
             textColor='#059669',  # Green theme
             spaceAfter=30,
             alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
+        ),
+        "message_heading": ParagraphStyle(
+            'MessageHeading',
+            parent=base['Heading2'],
             fontSize=12,
             textColor='#047857',
             spaceAfter=10,
             spaceBefore=15
-        )
-        
-        message_style = ParagraphStyle(
-            'MessageStyle',
-            parent=styles['Normal'],
+        ),
+        "message": ParagraphStyle(
+            'Message',
+            parent=base['Normal'],
             fontSize=10,
             spaceAfter=12,
             leftIndent=20
-        )
-        
-        # Title
-        title = Paragraph("Pleader AI - Chat Export", title_style)
-        story.append(title)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Chat info
-        chat_title = chat_data.get('title', 'Untitled Chat')
-        created_at = chat_data.get('created_at', '')
-        if isinstance(created_at, str):
-            try:
-                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                created_at = created_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        info = Paragraph(f"<b>Chat:</b> {chat_title}<br/><b>Date:</b> {created_at}", styles['Normal'])
-        story.append(info)
-        story.append(Spacer(1, 0.3*inch))
+        ),
+        "section": ParagraphStyle(
+            'Section',
+            parent=base['Heading2'],
+            fontSize=14,
+            textColor='#047857',
+            spaceAfter=15,
+            spaceBefore=20
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def _docx_template() -> Tuple[Any, Dict[str, str]]:
+    """
+    Blank export document with the theme applied to its styles, built once per process
+
+    Returns the document and the style id of each style exports use.
+    Colours and indents live in the styles rather than on every run.
+    """
+    doc = Document()
+    styles = doc.styles
+    
+    styles['Title'].font.color.rgb = RGBColor(5, 150, 105)  # Green theme
+    styles['Title'].paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    styles['Heading 2'].font.color.rgb = RGBColor(4, 120, 87)
+    
+    message = styles.add_style('Chat Message', WD_STYLE_TYPE.PARAGRAPH)
+    message.base_style = styles['Normal']
+    message.paragraph_format.left_indent = Inches(0.3)
+    
+    style_ids = {name: styles[name].style_id for name in ('Title', 'Heading 1', 'Heading 2', 'Chat Message')}
+    return doc, style_ids
+
+
+def _new_docx() -> Tuple[Any, Dict[str, str]]:
+    """A fresh copy of the export template (copying is faster than loading a package)"""
+    template, style_ids = _docx_template()
+    return copy.deepcopy(template), style_ids
+
+
+def _add_docx_paragraph(doc, text: str = '', style_id: Optional[str] = None):
+    """Add a paragraph styled by id"""
+    paragraph = doc.add_paragraph(text)
+    if style_id:
+        # python-docx resolves style names by scanning styles.xml on every paragraph
+        paragraph._p.style = style_id
+    return paragraph
+
+
+def _add_docx_info(doc, fields: List[Tuple[str, str]]):
+    """Bold label / value lines under an export title"""
+    info_para = doc.add_paragraph()
+    for i, (label, value) in enumerate(fields):
+        info_para.add_run(f"{label}: ").bold = True
+        info_para.add_run(value + ("\n" if i < len(fields) - 1 else ""))
+
+
+def _save_docx(doc) -> bytes:
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def write_chat_pdf(chat_data: Dict[str, Any], messages: Iterable[Dict[str, Any]], output: BinaryIO) -> int:
+    """
+    Write a chat as PDF, consuming its messages lazily
+    
+    Args:
+        chat_data: Chat data (title and created_at are used)
+        messages: Messages in order; may be a generator
+        output: Binary file to write the PDF to
         
-        # Messages
-        messages = chat_data.get('messages', [])
-        for i, msg in enumerate(messages):
-            sender = msg.get('sender', 'user')
-            content = msg.get('content', '')
-            timestamp = msg.get('timestamp', '')
-            
-            # Format timestamp
-            if isinstance(timestamp, str) and timestamp:
-                try:
-                    ts = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    timestamp = ts.strftime('%I:%M %p')
-                except:
-                    timestamp = ''
+    Returns:
+        Number of messages written
+    """
+    try:
+        doc = SimpleDocTemplate(output, pagesize=letter)
+        styles = pdf_styles()
+        count = 0
+        
+        def flowables():
+            nonlocal count
+            yield Paragraph("Pleader AI - Chat Export", styles['title'])
+            yield Spacer(1, 0.2*inch)
             
-            # Sender heading
-            sender_label = "You" if sender == "user" else "Pleader AI"
-            heading_text = f"{sender_label} {f'({timestamp})' if timestamp else ''}"
-            story.append(Paragraph(heading_text, heading_style))
+            chat_title = _pdf_markup(chat_data.get('title', 'Untitled Chat'))
+            created_at = format_export_date(chat_data.get('created_at'))
+            yield Paragraph(f"<b>Chat:</b> {chat_title}<br/><b>Date:</b> {created_at}", styles['normal'])
+            yield Spacer(1, 0.3*inch)
             
-            # Message content
-            content_safe = content.replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
-            story.append(Paragraph(content_safe, message_style))
-            story.append(Spacer(1, 0.1*inch))
+            for message in normalize_messages(messages):
+                yield Paragraph(_message_heading(message, "You", "Pleader AI"), styles['message_heading'])
+                yield Paragraph(_pdf_markup(message.content), styles['message'])
+                yield Spacer(1, 0.1*inch)
+                count += 1
         
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        doc.build(_StreamedStory(flowables()))
         
-        logger.info(f"Exported chat to PDF with {len(messages)} messages")
-        return buffer.getvalue()
+        logger.info(f"Exported chat to PDF with {count} messages")
+        return count
         
     except Exception as e:
         logger.error(f"Error exporting chat to PDF: {e}")
         raise Exception(f"Failed to export chat to PDF: {str(e)}")
 
 
+def export_chat_to_pdf(chat_data: Dict[str, Any]) -> bytes:
+    """
+    Export chat to PDF format
+    
+    Args:
+        chat_data: Chat data including messages
+        
+    Returns:
+        PDF file bytes
+    """
+    buffer = io.BytesIO()
+    write_chat_pdf(chat_data, chat_data.get('messages', []), buffer)
+    return buffer.getvalue()
+
+
+def export_chat_to_pdf_file(chat_data: Dict[str, Any], messages_path: str, output_path: str) -> int:
+    """
+    Export a chat to a PDF file, reading its messages from a spool file
+    
+    Used for long chats: neither the messages nor the finished PDF are ever
+    held in the server process.
+    
+    Args:
+        chat_data: Chat data without messages
+        messages_path: Spool file written with spill_message
+        output_path: File to write the PDF to
+        
+    Returns:
+        Number of messages written
+    """
+    with open(messages_path, 'rb') as spool, open(output_path, 'wb') as output:
+        return write_chat_pdf(chat_data, read_spilled_messages(spool), output)
+
+
 def export_chat_to_docx(chat_data: Dict[str, Any]) -> bytes:
     """
     Export chat to DOCX format
@@ -133,73 +442,51 @@ def export_chat_to_docx(chat_data: Dict[str, Any]) -> bytes:
         DOCX file bytes
     """
     try:
-        doc = Document()
-        
-        # Title
-        title = doc.add_heading('Pleader AI - Chat Export', level=0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        title_run = title.runs[0]
-        title_run.font.color.rgb = RGBColor(5, 150, 105)  # Green theme
-        
-        # Chat info
-        chat_title = chat_data.get('title', 'Untitled Chat')
-        created_at = chat_data.get('created_at', '')
-        if isinstance(created_at, str):
-            try:
-                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                created_at = created_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        info_para = doc.add_paragraph()
-        info_para.add_run('Chat: ').bold = True
-        info_para.add_run(f"{chat_title}\n")
-        info_para.add_run('Date: ').bold = True
-        info_para.add_run(str(created_at))
+        doc, style_ids = _new_docx()
         
+        _add_docx_paragraph(doc, 'Pleader AI - Chat Export', style_ids['Title'])
+        _add_docx_info(doc, [
+            ('Chat', chat_data.get('title', 'Untitled Chat')),
+            ('Date', format_export_date(chat_data.get('created_at'))),
+        ])
         doc.add_paragraph()  # Spacer
         
-        # Messages
         messages = chat_data.get('messages', [])
-        for msg in messages:
-            sender = msg.get('sender', 'user')
-            content = msg.get('content', '')
-            timestamp = msg.get('timestamp', '')
-            
-            # Format timestamp
-            if isinstance(timestamp, str) and timestamp:
-                try:
-                    ts = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    timestamp = ts.strftime('%I:%M %p')
-                except:
-                    timestamp = ''
-            
-            # Sender heading
-            sender_label = "You" if sender == "user" else "Pleader AI"
-            heading_text = f"{sender_label} {f'({timestamp})' if timestamp else ''}"
-            heading = doc.add_heading(heading_text, level=2)
-            heading_run = heading.runs[0]
-            heading_run.font.color.rgb = RGBColor(4, 120, 87)
-            
-            # Message content
-            content_para = doc.add_paragraph(content)
-            content_para.paragraph_format.left_indent = Inches(0.3)
-            
+        for message in normalize_messages(messages):
+            _add_docx_paragraph(doc, _message_heading(message, "You", "Pleader AI"), style_ids['Heading 2'])
+            _add_docx_paragraph(doc, message.content, style_ids['Chat Message'])
             doc.add_paragraph()  # Spacer
         
-        # Save to buffer
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        
+        content = _save_docx(doc)
         logger.info(f"Exported chat to DOCX with {len(messages)} messages")
-        return buffer.getvalue()
+        return content
         
     except Exception as e:
         logger.error(f"Error exporting chat to DOCX: {e}")
         raise Exception(f"Failed to export chat to DOCX: {str(e)}")
 
 
+def chat_txt_header(chat_data: Dict[str, Any]) -> str:
+    """Opening banner and chat info of a plain text chat export"""
+    return "\n".join([
+        "=" * 60,
+        "PLEADER AI - CHAT EXPORT",
+        "=" * 60,
+        "",
+        f"Chat: {chat_data.get('title', 'Untitled Chat')}",
+        f"Date: {format_export_date(chat_data.get('created_at'))}",
+        "",
+        "-" * 60,
+        "",
+    ])
+
+
+def chat_txt_message(message: ExportMessage) -> str:
+    """One normalized message of a plain text chat export, to be appended after chat_txt_header"""
+    heading = _message_heading(message, "YOU", "PLEADER AI")
+    return "\n" + "\n".join([heading, "-" * len(heading), message.content, "", ""])
+
+
 def export_chat_to_txt(chat_data: Dict[str, Any]) -> str:
     """
     Export chat to plain text format
@@ -211,53 +498,8 @@ def export_chat_to_txt(chat_data: Dict[str, Any]) -> str:
         Plain text string
     """
     try:
-        lines = []
-        lines.append("=" * 60)
-        lines.append("PLEADER AI - CHAT EXPORT")
-        lines.append("=" * 60)
-        lines.append("")
-        
-        # Chat info
-        chat_title = chat_data.get('title', 'Untitled Chat')
-        created_at = chat_data.get('created_at', '')
-        if isinstance(created_at, str):
-            try:
-                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                created_at = created_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        lines.append(f"Chat: {chat_title}")
-        lines.append(f"Date: {created_at}")
-        lines.append("")
-        lines.append("-" * 60)
-        lines.append("")
-        
-        # Messages
         messages = chat_data.get('messages', [])
-        for msg in messages:
-            sender = msg.get('sender', 'user')
-            content = msg.get('content', '')
-            timestamp = msg.get('timestamp', '')
-            
-            # Format timestamp
-            if isinstance(timestamp, str) and timestamp:
-                try:
-                    ts = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    timestamp = ts.strftime('%I:%M %p')
-                except:
-                    timestamp = ''
-            
-            # Sender heading
-            sender_label = "YOU" if sender == "user" else "PLEADER AI"
-            heading = f"{sender_label} {f'({timestamp})' if timestamp else ''}"
-            lines.append(heading)
-            lines.append("-" * len(heading))
-            lines.append(content)
-            lines.append("")
-            lines.append("")
-        
-        text = "\n".join(lines)
+        text = chat_txt_header(chat_data) + "".join(map(chat_txt_message, normalize_messages(messages)))
         logger.info(f"Exported chat to TXT with {len(messages)} messages")
         return text
         
@@ -266,6 +508,13 @@ def export_chat_to_txt(chat_data: Dict[str, Any]) -> str:
         raise Exception(f"Failed to export chat to TXT: {str(e)}")
 
 
+def _analysis_paragraphs(analysis_data: Dict[str, Any]) -> List[str]:
+    """Non-empty paragraphs of the full analysis text"""
+    analysis = analysis_data.get('analysis_result') or {}
+    full_analysis = analysis.get('full_analysis', 'No analysis available')
+    return [para.strip() for para in full_analysis.split('\n\n') if para.strip()]
+
+
 def export_analysis_to_pdf(analysis_data: Dict[str, Any]) -> bytes:
     """
     Export document analysis to PDF format
@@ -279,65 +528,22 @@ def export_analysis_to_pdf(analysis_data: Dict[str, Any]) -> bytes:
     try:
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor='#059669',
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        section_style = ParagraphStyle(
-            'SectionStyle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor='#047857',
-            spaceAfter=15,
-            spaceBefore=20
-        )
-        
-        # Title
-        title = Paragraph("Pleader AI - Document Analysis", title_style)
-        story.append(title)
-        story.append(Spacer(1, 0.2*inch))
+        styles = pdf_styles()
         
-        # Document info
         filename = analysis_data.get('filename', 'Unknown')
-        uploaded_at = analysis_data.get('uploaded_at', '')
-        if isinstance(uploaded_at, str):
-            try:
-                uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-                uploaded_at = uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        info = Paragraph(f"<b>Document:</b> {filename}<br/><b>Analyzed:</b> {uploaded_at}", styles['Normal'])
-        story.append(info)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Analysis result
-        analysis = analysis_data.get('analysis_result', {})
-        
-        # Full analysis
-        full_analysis = analysis.get('full_analysis', 'No analysis available')
-        story.append(Paragraph("Analysis", section_style))
-        
-        # Split into paragraphs
-        paragraphs = full_analysis.split('\n\n')
-        for para in paragraphs:
-            if para.strip():
-                para_safe = para.replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
-                story.append(Paragraph(para_safe, styles['Normal']))
-                story.append(Spacer(1, 0.1*inch))
+        uploaded_at = format_export_date(analysis_data.get('uploaded_at'))
+        story = [
+            Paragraph("Pleader AI - Document Analysis", styles['title']),
+            Spacer(1, 0.2*inch),
+            Paragraph(f"<b>Document:</b> {_pdf_markup(filename)}<br/><b>Analyzed:</b> {uploaded_at}", styles['normal']),
+            Spacer(1, 0.3*inch),
+            Paragraph("Analysis", styles['section']),
+        ]
+        for para in _analysis_paragraphs(analysis_data):
+            story.append(Paragraph(_pdf_markup(para), styles['normal']))
+            story.append(Spacer(1, 0.1*inch))
         
-        # Build PDF
         doc.build(story)
-        buffer.seek(0)
         
         logger.info(f"Exported analysis to PDF for {filename}")
         return buffer.getvalue()
@@ -358,51 +564,23 @@ def export_analysis_to_docx(analysis_data: Dict[str, Any]) -> bytes:
         DOCX file bytes
     """
     try:
-        doc = Document()
+        doc, style_ids = _new_docx()
         
-        # Title
-        title = doc.add_heading('Pleader AI - Document Analysis', level=0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        title_run = title.runs[0]
-        title_run.font.color.rgb = RGBColor(5, 150, 105)
-        
-        # Document info
         filename = analysis_data.get('filename', 'Unknown')
-        uploaded_at = analysis_data.get('uploaded_at', '')
-        if isinstance(uploaded_at, str):
-            try:
-                uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-                uploaded_at = uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        info_para = doc.add_paragraph()
-        info_para.add_run('Document: ').bold = True
-        info_para.add_run(f"{filename}\n")
-        info_para.add_run('Analyzed: ').bold = True
-        info_para.add_run(str(uploaded_at))
-        
+        _add_docx_paragraph(doc, 'Pleader AI - Document Analysis', style_ids['Title'])
+        _add_docx_info(doc, [
+            ('Document', filename),
+            ('Analyzed', format_export_date(analysis_data.get('uploaded_at'))),
+        ])
         doc.add_paragraph()
         
-        # Analysis result
-        analysis = analysis_data.get('analysis_result', {})
-        full_analysis = analysis.get('full_analysis', 'No analysis available')
-        
-        doc.add_heading('Analysis', level=1)
-        
-        # Add analysis text
-        paragraphs = full_analysis.split('\n\n')
-        for para in paragraphs:
-            if para.strip():
-                doc.add_paragraph(para.strip())
-        
-        # Save to buffer
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
+        _add_docx_paragraph(doc, 'Analysis', style_ids['Heading 1'])
+        for para in _analysis_paragraphs(analysis_data):
+            doc.add_paragraph(para)
         
+        content = _save_docx(doc)
         logger.info(f"Exported analysis to DOCX for {filename}")
-        return buffer.getvalue()
+        return content
         
     except Exception as e:
         logger.error(f"Error exporting analysis to DOCX: {e}")
@@ -420,37 +598,24 @@ def export_analysis_to_txt(analysis_data: Dict[str, Any]) -> str:
         Plain text string
     """
     try:
-        lines = []
-        lines.append("=" * 60)
-        lines.append("PLEADER AI - DOCUMENT ANALYSIS")
-        lines.append("=" * 60)
-        lines.append("")
-        
-        # Document info
         filename = analysis_data.get('filename', 'Unknown')
-        uploaded_at = analysis_data.get('uploaded_at', '')
-        if isinstance(uploaded_at, str):
-            try:
-                uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-                uploaded_at = uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-            except:
-                pass
-        
-        lines.append(f"Document: {filename}")
-        lines.append(f"Analyzed: {uploaded_at}")
-        lines.append("")
-        lines.append("-" * 60)
-        lines.append("")
-        
-        # Analysis
-        analysis = analysis_data.get('analysis_result', {})
-        full_analysis = analysis.get('full_analysis', 'No analysis available')
-        
-        lines.append("ANALYSIS")
-        lines.append("-" * 60)
-        lines.append("")
-        lines.append(full_analysis)
-        lines.append("")
+        analysis = analysis_data.get('analysis_result') or {}
+        lines = [
+            "=" * 60,
+            "PLEADER AI - DOCUMENT ANALYSIS",
+            "=" * 60,
+            "",
+            f"Document: {filename}",
+            f"Analyzed: {format_export_date(analysis_data.get('uploaded_at'))}",
+            "",
+            "-" * 60,
+            "",
+            "ANALYSIS",
+            "-" * 60,
+            "",
+            analysis.get('full_analysis', 'No analysis available'),
+            "",
+        ]
         
         text = "\n".join(lines)
         logger.info(f"Exported analysis to TXT for {filename}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Pleader AI document text extraction
+
+pdf: generates a synthetic multi-page legal filing and measures page-parallel
+    extraction time for each worker count, reporting the speedup over a
+    single in-process extraction.
+docx: generates a large Word document with interleaved clauses and tables and
+    compares the streaming extractor with loading the full python-docx object
+    model, measuring time and peak memory (each run in a fresh process).
+
+Results are written as JSON so runs on different commits or machines can be compared.
+
+Usage:
+    python extraction_benchmark.py pdf --pages 300 --workers 1 2 4 8
+    python extraction_benchmark.py pdf --pages 300 --output pdf.json
+    python extraction_benchmark.py docx --paragraphs 20000
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import docx
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import document_utils
+from rag_benchmark import ACTS, git_commit, synthetic_legal_document
+
+
+def synthetic_pdf(num_pages: int, seed: int = 0) -> bytes:
+    """Render a multi-page PDF of synthetic legal clauses, roughly 45 lines per page"""
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    for page in range(num_pages):
+        pdf.setFont("Helvetica-Bold", 12)
+        pdf.drawString(50, height - 50, f"IN THE MATTER OF {rng.choice(ACTS).upper()} - PAGE {page + 1}")
+        pdf.setFont("Helvetica", 9)
+        y = height - 75
+        for line in synthetic_legal_document(rng, num_clauses=6).split(". "):
+            while line and y > 50:
+                pdf.drawString(50, y, line[:110])
+                line = line[110:]
+                y -= 12
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def time_pdf_extraction(content: bytes, workers: int, repeats: int) -> Dict[str, Any]:
+    """Extract a PDF several times with a worker count and summarise the timings"""
+    # Warm-up spawns the pool so process start-up is not counted
+    text = document_utils.extract_text_from_pdf(content, workers=workers)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        document_utils.extract_text_from_pdf(content, workers=workers)
+        timings.append(time.perf_counter() - start)
+    return {
+        "workers": workers,
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "characters": len(text),
+        "page_markers": text.count("[Page "),
+    }
+
+
+def run_pdf(args) -> List[Dict[str, Any]]:
+    content = synthetic_pdf(args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(content) / 1e6:.1f} MB")
+
+    results = []
+    baseline = None
+    for workers in args.workers:
+        result = time_pdf_extraction(content, workers, args.repeats)
+        result["pages"] = args.pages
+        baseline = baseline or result["median_seconds"]
+        result["speedup"] = baseline / result["median_seconds"]
+        result["pages_per_second"] = args.pages / result["median_seconds"]
+        results.append(result)
+        print(f"{workers:>3} workers: {result['median_seconds']:.2f} s "
+              f"({result['pages_per_second']:.0f} pages/s, {result['speedup']:.2f}x)")
+
+    if len({r["characters"] for r in results}) > 1:
+        print("WARNING: extracted text differs between worker counts")
+    return results
+
+
+def synthetic_docx(num_paragraphs: int, table_every: int = 25, seed: int = 0) -> bytes:
+    """Build a Word document of synthetic clauses with a schedule table every table_every paragraphs"""
+    rng = random.Random(seed)
+    document = docx.Document()
+    for i in range(num_paragraphs):
+        document.add_paragraph(synthetic_legal_document(rng, num_clauses=2))
+        if (i + 1) % table_every == 0:
+            table = document.add_table(rows=6, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = f"{rng.choice(ACTS)} s.{rng.randint(1, 500)}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def python_docx_text(path: str) -> str:
+    """The previous extractor: full python-docx object model, paragraphs first, then tables"""
+    document = docx.Document(path)
+    parts = [para.text for para in document.paragraphs if para.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            row_text = " | ".join(cell.text.strip() for cell in row.cells)
+            if row_text.strip():
+                parts.append(row_text)
+    return "\n\n".join(parts)
+
+
+DOCX_METHODS = {
+    "python-docx": python_docx_text,
+    "streaming": document_utils.extract_text_from_docx,
+}
+
+
+def _rss_kb(field: str) -> int:
+    """VmRSS (current) or VmHWM (peak) of this process in kilobytes"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure_docx(method: str, path: str) -> Tuple[float, float, str]:
+    """Run one extraction in this (fresh) process; returns seconds, peak RSS growth in MB and the text"""
+    try:
+        # Reset the peak so memory used while importing is not counted
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+    baseline = _rss_kb("VmRSS")
+    start = time.perf_counter()
+    text = DOCX_METHODS[method](path)
+    seconds = time.perf_counter() - start
+    peak_mb = (_rss_kb("VmHWM") - baseline) / 1024
+    return seconds, peak_mb, text
+
+
+def run_docx(args) -> List[Dict[str, Any]]:
+    content = synthetic_docx(args.paragraphs)
+    print(f"Synthetic DOCX: {args.paragraphs} paragraphs, {len(content) / 1e6:.1f} MB")
+
+    with tempfile.NamedTemporaryFile(suffix=".docx") as f:
+        f.write(content)
+        f.flush()
+
+        results = []
+        texts = {}
+        for method in DOCX_METHODS:
+            timings, peaks = [], []
+            for _ in range(args.repeats):
+                # A new process per run so peak RSS is not inherited from an earlier run
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    seconds, peak_mb, texts[method] = pool.submit(_measure_docx, method, f.name).result()
+                timings.append(seconds)
+                peaks.append(peak_mb)
+            result = {
+                "method": method,
+                "paragraphs": args.paragraphs,
+                "median_seconds": statistics.median(timings),
+                "peak_rss_mb": max(peaks),
+                "characters": len(texts[method]),
+            }
+            results.append(result)
+            print(f"{method:>12}: {result['median_seconds']:.2f} s, peak +{result['peak_rss_mb']:.0f} MB")
+
+    # Same blocks, different order: the old extractor appended all tables after the body text
+    if sorted(texts["python-docx"].split("\n\n")) != sorted(texts["streaming"].split("\n\n")):
+        print("WARNING: extracted blocks differ between methods")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document extraction benchmarks")
+    # Shared by every benchmark, so it goes after the benchmark name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output", help="Write results as JSON to this file")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pdf = subparsers.add_parser("pdf", parents=[common], help="Page-parallel PDF extraction speedup by worker count")
+    pdf.add_argument("--pages", type=int, default=200)
+    pdf.add_argument("--workers", nargs="+", type=int,
+                     default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    pdf.add_argument("--repeats", type=int, default=3)
+    pdf.set_defaults(func=run_pdf)
+
+    docx_parser = subparsers.add_parser("docx", parents=[common],
+                                        help="Streaming vs python-docx extraction time and memory")
+    docx_parser.add_argument("--paragraphs", type=int, default=20000)
+    docx_parser.add_argument("--repeats", type=int, default=3)
+    docx_parser.set_defaults(func=run_docx)
+
+    args = parser.parse_args()
+    results = args.func(args)
+
+    report = {
+        "benchmark": args.benchmark,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
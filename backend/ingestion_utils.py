@@ -0,0 +1,328 @@
+"""
+Background ingestion queue for Pleader AI
+Mongo-backed job queue with a bounded worker pool, per-stage progress and restart recovery
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import tempfile
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', '2'))
+# A running job whose lease expires (worker crashed or restarted) is picked up again
+JOB_LEASE = timedelta(seconds=int(os.environ.get('INGESTION_LEASE_SECONDS', '300')))
+# The worker running a job renews its lease this often, however long a stage takes
+HEARTBEAT_INTERVAL = JOB_LEASE / 3
+JOB_MAX_ATTEMPTS = int(os.environ.get('INGESTION_MAX_ATTEMPTS', '3'))
+# A failed attempt is retried after JOB_RETRY_BACKOFF * 2 ** (attempt - 1), capped at JOB_RETRY_BACKOFF_MAX
+JOB_RETRY_BACKOFF = timedelta(seconds=int(os.environ.get('INGESTION_RETRY_BACKOFF_SECONDS', '30')))
+JOB_RETRY_BACKOFF_MAX = timedelta(seconds=int(os.environ.get('INGESTION_RETRY_BACKOFF_MAX_SECONDS', '900')))
+POLL_INTERVAL = 1.0
+# Blobs larger than this are spooled to disk when downloaded
+BLOB_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATUSES = (COMPLETED, FAILED)
+
+# A stage receives the job document and returns fields to merge into job["state"]
+StageHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobFailed(Exception):
+    """Raised by a stage for errors that retrying will not fix"""
+
+
+class IngestionQueue:
+    """Persistent job queue processed by a fixed number of async workers"""
+
+    def __init__(self, db, stages: List[Tuple[str, StageHandler]], num_workers: int = INGESTION_WORKERS,
+                 collection: str = "ingestion_jobs", bucket: str = "uploads"):
+        self.jobs = db[collection]
+        self.blobs = AsyncIOMotorGridFSBucket(db, bucket_name=bucket)
+        self.stages = stages
+        self.num_workers = num_workers
+        self.worker_id = str(uuid.uuid4())
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    # ==================== BLOB STORAGE ====================
+
+    async def put_blob(self, filename: str, content: Union[bytes, BinaryIO]) -> Any:
+        """Store bytes or a binary file in GridFS and return the file id"""
+        return await self.blobs.upload_from_stream(filename, content)
+
+    async def get_blob(self, file_id: Any) -> bytes:
+        """Read bytes stored with put_blob"""
+        stream = await self.blobs.open_download_stream(file_id)
+        return await stream.read()
+
+    async def get_blob_file(self, file_id: Any) -> BinaryIO:
+        """Download a blob into a spooled temporary file, rewound to the start"""
+        spool = tempfile.SpooledTemporaryFile(max_size=BLOB_SPOOL_BYTES)
+        await self.blobs.download_to_stream(file_id, spool)
+        spool.seek(0)
+        return spool
+
+    async def delete_blob(self, file_id: Any):
+        """Delete bytes stored with put_blob, ignoring missing files"""
+        try:
+            await self.blobs.delete(file_id)
+        except Exception as e:
+            logger.warning(f"Could not delete blob {file_id}: {e}")
+
+    # ==================== JOBS ====================
+
+    async def enqueue(self, user_id: str, filename: str, content: Union[bytes, BinaryIO], **fields) -> Dict[str, Any]:
+        """
+        Persist an upload and queue it for processing
+
+        Args:
+            user_id: Owner of the job
+            filename: Original filename
+            content: Uploaded file bytes or binary file
+            **fields: Extra fields stored on the job
+
+        Returns:
+            The created job document
+        """
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "filename": filename,
+            "file_id": await self.put_blob(filename, content),
+            "status": QUEUED,
+            "stage": None,
+            "stages": {name: {"status": "pending"} for name, _ in self.stages},
+            "progress": 0.0,
+            "state": {},
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "available_at": None,  # Earliest time a retried job may run again
+            "created_at": now,
+            "updated_at": now,
+            "lease_expires_at": None,
+            **fields,
+        }
+        await self.jobs.insert_one(job)
+        self._wakeup.set()
+        return job
+
+    async def get_job(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fetch a job, optionally scoped to its owner"""
+        query = {"id": job_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self.jobs.find_one(query, {"_id": 0, "file_id": 0, "state": 0})
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job whose retry delay has passed, or one
+        whose lease expired with attempts left
+        """
+        now = datetime.now(timezone.utc)
+        return await self.jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED, "available_at": {"$not": {"$gt": now}}},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$lt": JOB_MAX_ATTEMPTS}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + JOB_LEASE,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=True,
+        )
+
+    async def _fail_abandoned(self):
+        """
+        Fail jobs whose lease expired on their last attempt
+
+        The worker died while running them (e.g. killed for running out of
+        memory), so running them again would most likely kill the next one too.
+        """
+        now = datetime.now(timezone.utc)
+        while True:
+            job = await self.jobs.find_one_and_update(
+                {"status": RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+                {"$set": {"status": FAILED, "lease_expires_at": None, "updated_at": now}},
+            )
+            if job is None:
+                return
+            stage = job.get("stage") or "unknown"
+            error = f"Worker stopped while running the job ({job['attempts']} attempts)"
+            logger.error(f"Ingestion job {job['id']} failed at {stage}: {error}")
+            await self.jobs.update_one(
+                {"id": job["id"]},
+                {"$set": {"error": error, f"stages.{stage}.status": FAILED}}
+            )
+            await self._cleanup(job)
+
+    async def _update(self, job: Dict[str, Any], fields: Dict[str, Any]):
+        """Set fields on a job and renew its lease"""
+        now = datetime.now(timezone.utc)
+        fields = {"updated_at": now, "lease_expires_at": now + JOB_LEASE, **fields}
+        await self.jobs.update_one({"id": job["id"]}, {"$set": fields})
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        """Renew a job's lease until cancelled, so a long stage is not claimed by another worker"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL.total_seconds())
+            now = datetime.now(timezone.utc)
+            try:
+                result = await self.jobs.update_one(
+                    {"id": job["id"], "worker_id": self.worker_id, "status": RUNNING},
+                    {"$set": {"lease_expires_at": now + JOB_LEASE, "updated_at": now}}
+                )
+                if not result.matched_count:
+                    logger.warning(f"Ingestion job {job['id']} lease was lost to another worker")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not renew lease of ingestion job {job['id']}: {e}")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        """Run a job's stages while a heartbeat keeps its lease alive"""
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._run_stages(job)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _run_stages(self, job: Dict[str, Any]):
+        """Run the remaining stages of a job, skipping stages completed before a restart"""
+        total = len(self.stages)
+        for position, (name, handler) in enumerate(self.stages):
+            if job["stages"].get(name, {}).get("status") == COMPLETED:
+                continue
+
+            job["stage"] = name
+            started_at = datetime.now(timezone.utc)
+            await self._update(job, {
+                "stage": name,
+                f"stages.{name}": {"status": RUNNING, "started_at": started_at},
+            })
+
+            state = await handler(job) or {}
+            job["state"].update(state)
+
+            completed_at = datetime.now(timezone.utc)
+            await self._update(job, {
+                **{f"state.{key}": value for key, value in state.items()},
+                f"stages.{name}": {
+                    "status": COMPLETED,
+                    "started_at": started_at,
+                    "completed_at": completed_at,
+                    "seconds": (completed_at - started_at).total_seconds(),
+                },
+                "progress": (position + 1) / total,
+            })
+
+        await self._update(job, {
+            "status": COMPLETED,
+            "stage": None,
+            "result": job["state"].get("result"),
+            "lease_expires_at": None,
+        })
+        await self._cleanup(job)
+
+    async def _cleanup(self, job: Dict[str, Any]):
+        """Delete the upload and any intermediate blobs a stage recorded as *_file_id"""
+        file_ids = [job["file_id"]] + [
+            value for key, value in job.get("state", {}).items() if key.endswith("_file_id")
+        ]
+        for file_id in file_ids:
+            await self.delete_blob(file_id)
+
+    async def _fail(self, job: Dict[str, Any], error: Exception, retry: bool):
+        """Record a stage failure, requeueing the job while attempts remain"""
+        stage = job.get("stage") or "unknown"
+        if retry and job["attempts"] < JOB_MAX_ATTEMPTS:
+            delay = min(JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1), JOB_RETRY_BACKOFF_MAX)
+            logger.warning(f"Ingestion job {job['id']} failed at {stage} (attempt {job['attempts']}), "
+                           f"retrying in {delay.total_seconds():.0f}s: {error}")
+            await self._update(job, {
+                "status": QUEUED,
+                "error": str(error),
+                "lease_expires_at": None,
+                "available_at": datetime.now(timezone.utc) + delay,
+            })
+            return
+
+        logger.error(f"Ingestion job {job['id']} failed at {stage}: {error}")
+        await self._update(job, {
+            "status": FAILED,
+            "error": str(error),
+            f"stages.{stage}.status": FAILED,
+            "lease_expires_at": None,
+        })
+        await self._cleanup(job)
+
+    async def _worker(self, number: int):
+        """Claim and process jobs until cancelled"""
+        while True:
+            try:
+                await self._fail_abandoned()
+                job = await self._claim()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                logger.info(f"Worker {number} processing ingestion job {job['id']} ({job['filename']})")
+                try:
+                    await self._run_job(job)
+                except asyncio.CancelledError:
+                    raise
+                except JobFailed as e:
+                    await self._fail(job, e, retry=False)
+                except Exception as e:
+                    await self._fail(job, e, retry=True)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ingestion worker {number} error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def start(self):
+        """Create indexes and start the worker pool"""
+        await self.jobs.create_index("id", unique=True)
+        await self.jobs.create_index([("status", 1), ("created_at", 1)])
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        logger.info(f"Ingestion queue started with {self.num_workers} workers")
+
+    async def stop(self):
+        """Cancel the workers and requeue the jobs they were running"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Hand our in-flight jobs back to the queue without waiting for the lease
+        await self.jobs.update_many(
+            {"worker_id": self.worker_id, "status": RUNNING},
+            {"$set": {"status": QUEUED, "lease_expires_at": None}}
+        )
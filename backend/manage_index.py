@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Index maintenance commands for Pleader AI
+
+Usage:
+    python manage_index.py stats
+    python manage_index.py reencode sq8
+    python manage_index.py generations
+    python manage_index.py compact
+    python manage_index.py rollback 12
+    python manage_index.py reindex --workers 4 [--resume]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from rag_utils import RAGPipeline, IndexBuilder, INDEX_FACTORY_STRINGS  # noqa: E402
+from storage_utils import TEXT_COLLECTION, read_text_record  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Partial reindex state, kept next to the generations it will replace
+REINDEX_CHECKPOINT = "reindex.checkpoint"
+
+
+def open_pipeline(args) -> RAGPipeline:
+    """Open the pipeline for the configured index directory"""
+    return RAGPipeline(index_dir=args.index_dir)
+
+
+def cmd_stats(args):
+    """Print index statistics"""
+    rag = open_pipeline(args)
+    print(json.dumps(rag.get_stats(), indent=2))
+
+
+def cmd_reencode(args):
+    """Re-encode the published index with another compression type"""
+    rag = open_pipeline(args)
+    before = rag.get_stats()
+    rag.reencode(args.index_type)
+    after = rag.get_stats()
+    print(f"Re-encoded {after['index_size']} vectors: "
+          f"{before['index_type']} ({before['bytes_per_vector']} B/vector) -> "
+          f"{after['index_type']} ({after['bytes_per_vector']} B/vector), generation {after['generation']}")
+
+
+def cmd_generations(args):
+    """List the index generations kept on disk"""
+    rag = open_pipeline(args)
+    for generation in rag.list_generations():
+        marker = "*" if generation["current"] else " "
+        modified = datetime.fromtimestamp(generation["modified_at"]).isoformat(timespec="seconds")
+        delta = f"  delta of {generation['parent']}" if generation["parent"] is not None else ""
+        print(f"{marker} {generation['generation']:>6}  {generation['index_type'] or 'empty':<5}  "
+              f"{generation['num_vectors']:>9} vectors  {modified}{delta}")
+
+
+def cmd_compact(args):
+    """Fold the delta generations written by uploads into one full generation"""
+    rag = open_pipeline(args)
+    deltas = rag.get_stats()["delta_generations"]
+    if rag.compact():
+        print(f"Compacted {deltas} delta generation(s) into generation {rag.generation}")
+    else:
+        print("No delta generations to compact")
+
+
+def cmd_rollback(args):
+    """Switch the live index back to a retained generation"""
+    rag = open_pipeline(args)
+    previous = rag.generation
+    rag.rollback(args.generation)
+    print(f"Live index switched from generation {previous} to {rag.generation}")
+
+
+def iter_document_batches(db, after: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Stream documents in id order, in batches, with their full text attached"""
+    query = {"id": {"$gt": after}} if after else {}
+    projection = {"_id": 0, "id": 1, "user_id": 1, "filename": 1, "analysis_result.extracted_text": 1}
+    cursor = db.documents.find(query, projection).sort("id", 1).batch_size(batch_size)
+
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield attach_texts(db, batch)
+            batch = []
+    if batch:
+        yield attach_texts(db, batch)
+
+
+def attach_texts(db, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Load the compressed full texts for a batch of documents"""
+    records = db[TEXT_COLLECTION].find({"document_id": {"$in": [doc["id"] for doc in batch]}}, {"analysis": 0})
+    texts = {record["document_id"]: read_text_record(record) for record in records}
+    for doc in batch:
+        doc["text"] = texts.get(doc["id"])
+        doc["truncated"] = doc["text"] is None
+        if doc["truncated"]:
+            # Uploaded before full texts were stored: only the preview is left
+            preview = doc.get("analysis_result", {}).get("extracted_text", "")
+            doc["text"] = preview[:-3] if preview.endswith("...") else preview
+    return batch
+
+
+def embed_chunks(rag: RAGPipeline, chunks: List[str], positions: List[int]) -> Dict[int, Any]:
+    """Embed the chunks at the given positions (runs in a worker thread)"""
+    if not positions:
+        return {}
+    vectors = rag.embedder.embed_documents([chunks[i] for i in positions])
+    return {i: vector for i, vector in zip(positions, vectors) if vector is not None}
+
+
+def cmd_reindex(args):
+    """Rebuild the index from the documents stored in MongoDB"""
+    rag = RAGPipeline(index_dir=args.index_dir, index_type=args.index_type)
+    checkpoint_dir = Path(args.index_dir) / REINDEX_CHECKPOINT
+
+    if args.resume and checkpoint_dir.exists():
+        builder, state = IndexBuilder.from_checkpoint(rag, checkpoint_dir)
+        logger.info(f"Resuming reindex after document {state['last_id']} ({state['documents']} documents done)")
+        if (state["chunk_size"], state["overlap"]) != (args.chunk_size, args.overlap):
+            logger.warning(f"Keeping the checkpoint's chunking: size {state['chunk_size']}, overlap {state['overlap']}")
+    else:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        builder = rag.new_builder()
+        state = {
+            "last_id": None,
+            "documents": 0,
+            "chunks": 0,
+            "truncated": 0,
+            "chunk_size": args.chunk_size,
+            "overlap": args.overlap,
+        }
+
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    total = db.documents.count_documents({})
+    started = time.monotonic()
+    documents_at_start, chunks_at_start = state["documents"], state["chunks"]
+    batches_done = 0
+
+    def append_finished(limit: int):
+        """Append completed batches in order, keeping at most limit in flight"""
+        nonlocal batches_done
+        while len(pending) > limit:
+            batch, chunks, metadata, future = pending.popleft()
+            builder.add_documents(chunks, metadata, embeddings=future.result())
+            state["last_id"] = batch[-1]["id"]
+            state["documents"] += len(batch)
+            state["chunks"] += len(chunks)
+            state["truncated"] += sum(doc["truncated"] for doc in batch)
+
+            batches_done += 1
+            if batches_done % args.checkpoint_every == 0:
+                builder.save_checkpoint(checkpoint_dir, state)
+
+            elapsed = max(time.monotonic() - started, 1e-9)
+            logger.info(
+                f"{state['documents']}/{total} documents, {state['chunks']} chunks "
+                f"({(state['documents'] - documents_at_start) / elapsed:.1f} docs/s, "
+                f"{(state['chunks'] - chunks_at_start) / elapsed:.1f} chunks/s)"
+            )
+
+    # Embedding runs in the pool while the main thread reads and chunks the next batches
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for batch in iter_document_batches(db, state["last_id"], args.batch_size):
+                chunks, metadata = [], []
+                for doc in batch:
+                    doc_chunks = rag.chunk_text(doc["text"] or "", state["chunk_size"], state["overlap"])
+                    chunks.extend(doc_chunks)
+                    metadata.extend(
+                        {
+                            "filename": doc.get("filename"),
+                            "user_id": doc.get("user_id"),
+                            "document_id": doc["id"],
+                            "chunk_index": i
+                        }
+                        for i in range(len(doc_chunks))
+                    )
+                future = executor.submit(embed_chunks, rag, chunks, builder.needs_embedding(chunks))
+                pending.append((batch, chunks, metadata, future))
+                append_finished(args.workers)
+            append_finished(0)
+    except KeyboardInterrupt:
+        builder.save_checkpoint(checkpoint_dir, state)
+        print(f"Interrupted after {state['documents']} documents; run again with --resume to continue")
+        raise SystemExit(1)
+    finally:
+        client.close()
+
+    generation = builder.publish()
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    elapsed = time.monotonic() - started
+    print(f"Reindexed {state['documents']} documents into {len(builder.documents)} chunks as generation "
+          f"{generation} in {elapsed:.1f}s ({(state['chunks'] - chunks_at_start) / max(elapsed, 1e-9):.1f} chunks/s)")
+    if state["truncated"]:
+        print(f"{state['truncated']} documents had no stored full text and were indexed from their 2000 character preview")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pleader AI index maintenance")
+    parser.add_argument(
+        "--index-dir",
+        default=os.environ.get('RAG_INDEX_DIR', "/app/backend/faiss_index"),
+        help="FAISS index directory"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Show index statistics")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    reencode_parser = subparsers.add_parser("reencode", help="Migrate the index to another compression type")
+    reencode_parser.add_argument("index_type", choices=sorted(INDEX_FACTORY_STRINGS))
+    reencode_parser.set_defaults(func=cmd_reencode)
+
+    generations_parser = subparsers.add_parser("generations", help="List index generations kept for rollback")
+    generations_parser.set_defaults(func=cmd_generations)
+
+    compact_parser = subparsers.add_parser("compact", help="Fold delta generations into a full generation")
+    compact_parser.set_defaults(func=cmd_compact)
+
+    rollback_parser = subparsers.add_parser("rollback", help="Make a retained generation live again")
+    rollback_parser.add_argument("generation", type=int)
+    rollback_parser.set_defaults(func=cmd_rollback)
+
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild the index from the documents in MongoDB")
+    reindex_parser.add_argument("--workers", type=int, default=4, help="Parallel embedding batches")
+    reindex_parser.add_argument("--batch-size", type=int, default=32, help="Documents per batch")
+    reindex_parser.add_argument("--chunk-size", type=int, default=500)
+    reindex_parser.add_argument("--overlap", type=int, default=100)
+    reindex_parser.add_argument("--index-type", choices=sorted(INDEX_FACTORY_STRINGS), default=None)
+    reindex_parser.add_argument("--checkpoint-every", type=int, default=10, help="Batches between checkpoints")
+    reindex_parser.add_argument("--resume", action="store_true", help="Continue an interrupted reindex")
+    reindex_parser.set_defaults(func=cmd_reindex)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
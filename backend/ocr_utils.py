@@ -0,0 +1,305 @@
+"""
+OCR utilities for Pleader AI
+Image preprocessing and a bounded Tesseract worker pool
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+import pytesseract
+
+logger = logging.getLogger(__name__)
+
+# Each Tesseract call is its own process, so a thread per core keeps all cores busy
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', str(os.cpu_count() or 1)))
+OCR_LANGUAGE = os.environ.get('OCR_LANGUAGE', 'eng')
+# Tesseract is most accurate on text scanned at ~300 DPI
+OCR_TARGET_DPI = 300
+# Skew angles searched when straightening a page, in degrees
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.5
+# Width the page is reduced to when estimating skew
+SKEW_SAMPLE_WIDTH = 600
+# Jobs allowed to wait for a worker; further submissions block, then fail with OCRQueueFull
+OCR_MAX_QUEUE = int(os.environ.get('OCR_MAX_QUEUE', str(OCR_WORKERS * 4)))
+OCR_QUEUE_TIMEOUT = float(os.environ.get('OCR_QUEUE_TIMEOUT', '30'))
+# Images are reduced to this many pixels before OCR (~A4 at 400 DPI); phone photos are often 4x larger
+OCR_MAX_PIXELS = int(os.environ.get('OCR_MAX_PIXELS', '15000000'))
+# Recent jobs kept for latency percentiles
+OCR_LATENCY_WINDOW = 500
+
+# One OpenMP thread per Tesseract process; parallelism comes from the pool
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+class OCRQueueFull(Exception):
+    """Raised when the OCR queue stays full for longer than the submit timeout"""
+    pass
+
+
+class OCRPool:
+    """
+    Fixed-size Tesseract worker pool with a bounded queue and latency metrics
+
+    At most workers + max_queue jobs are admitted at once, so a burst of uploads
+    waits (and eventually fails fast) instead of forking unbounded Tesseract
+    processes or holding every decoded image in memory.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, max_queue: int = OCR_MAX_QUEUE):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_seconds = deque(maxlen=OCR_LATENCY_WINDOW)
+        self._run_seconds = deque(maxlen=OCR_LATENCY_WINDOW)
+
+    def submit(self, image: Image.Image, source_dpi: Optional[float] = None,
+               timeout: Optional[float] = OCR_QUEUE_TIMEOUT, scan: bool = False) -> Future:
+        """
+        Queue an image for OCR
+
+        Args:
+            image: Page or photo image
+            source_dpi: Resolution the image was scanned at, if known
+            timeout: Seconds to wait for queue space (None waits indefinitely)
+            scan: Deskew and binarize the image as a flat scanned page
+
+        Returns:
+            Future resolving to the recognised text
+
+        Raises:
+            OCRQueueFull: If no queue space frees up within the timeout
+        """
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._rejected += 1
+            raise OCRQueueFull(f"OCR queue full ({self.capacity} jobs)")
+
+        with self._lock:
+            self._queued += 1
+        try:
+            future = self._executor.submit(self._run, image, source_dpi, scan, time.monotonic())
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, image: Image.Image, source_dpi: Optional[float], scan: bool, submitted: float) -> str:
+        started = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_seconds.append(started - submitted)
+        succeeded = False
+        try:
+            text = ocr_image(image, source_dpi, scan)
+            succeeded = True
+            return text
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_seconds.append(time.monotonic() - started)
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def _release(self, future: Future):
+        if future.cancelled():
+            # Cancelled before it ran, so _run never dequeued it
+            with self._lock:
+                self._queued -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput counters and recent latency percentiles"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "wait_seconds": _percentiles(self._wait_seconds),
+                "run_seconds": _percentiles(self._run_seconds),
+            }
+
+
+def _percentiles(samples) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    """
+    Otsu's global threshold for an 8-bit grayscale image
+
+    Args:
+        pixels: uint8 array
+
+    Returns:
+        Threshold separating dark ink from light background
+    """
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = total - weight_dark
+    cumulative_mean = np.cumsum(histogram * levels)
+    mean_dark = cumulative_mean / np.maximum(weight_dark, 1)
+    mean_light = (cumulative_mean[-1] - cumulative_mean) / np.maximum(weight_light, 1)
+    between_variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between_variance))
+
+
+def estimate_skew(gray: Image.Image) -> float:
+    """
+    Estimate page rotation by maximising the variance of the row profile
+
+    Text lines produce sharp peaks in the row sums only when they are horizontal.
+
+    Args:
+        gray: Grayscale page image
+
+    Returns:
+        Angle in degrees to rotate the page by to straighten it
+    """
+    scale = min(SKEW_SAMPLE_WIDTH / gray.width, 1.0)
+    sample = gray.resize((max(int(gray.width * scale), 1), max(int(gray.height * scale), 1)))
+    pixels = np.asarray(sample)
+    ink = Image.fromarray(((pixels < otsu_threshold(pixels)) * 255).astype(np.uint8))
+
+    def profile_variance(angle: float) -> float:
+        rotated = np.asarray(ink.rotate(angle, resample=Image.NEAREST, fillcolor=0), dtype=np.float32)
+        return float(np.var(rotated.sum(axis=1)))
+
+    # Start from the unrotated page so blank or ambiguous pages are left alone
+    best_angle, best_score = 0.0, profile_variance(0.0)
+    for angle in np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + SKEW_STEP_DEGREES / 2, SKEW_STEP_DEGREES):
+        score = profile_variance(float(angle))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_for_ocr(image: Image.Image, source_dpi: Optional[float] = None, scan: bool = False) -> Image.Image:
+    """
+    Prepare an image for Tesseract
+
+    Converts to grayscale and rescales to OCR_TARGET_DPI. Scanned pages are
+    also straightened and binarized with Otsu's global threshold; photos are
+    left in grayscale, since unevenly lit ones lose text to a single threshold
+    that Tesseract's own adaptive thresholding keeps.
+
+    Args:
+        image: Page or photo image
+        source_dpi: Resolution the image was scanned at, if known
+        scan: Deskew and binarize (flat, evenly lit scans such as PDF pages)
+
+    Returns:
+        Grayscale image, or binarized (mode "1") image for scans
+    """
+    gray = ImageOps.grayscale(ImageOps.exif_transpose(image))
+
+    if source_dpi:
+        # Upscaling beyond 2x adds no detail; downscaling very high DPI scans speeds OCR up
+        scale = min(OCR_TARGET_DPI / source_dpi, 2.0)
+        if abs(scale - 1.0) > 0.1:
+            gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS)
+
+    if not scan:
+        return gray
+
+    angle = estimate_skew(gray)
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    pixels = np.asarray(gray)
+    return Image.fromarray(pixels > otsu_threshold(pixels))
+
+
+def ocr_image(image: Image.Image, source_dpi: Optional[float] = None, scan: bool = False) -> str:
+    """
+    Preprocess and OCR one image (blocking)
+
+    Args:
+        image: Page or photo image
+        source_dpi: Resolution the image was scanned at, if known
+        scan: Deskew and binarize the image as a flat scanned page
+
+    Returns:
+        Recognised text
+    """
+    prepared = preprocess_for_ocr(image, source_dpi, scan)
+    return pytesseract.image_to_string(prepared, lang=OCR_LANGUAGE, config="--psm 3")
+
+
+def load_image_for_ocr(image_file: BinaryIO, max_pixels: int = OCR_MAX_PIXELS) -> Image.Image:
+    """
+    Decode an uploaded image, reduced to at most max_pixels
+
+    JPEGs are decoded directly at a reduced scale, so oversized phone photos
+    never exist in memory at full resolution.
+
+    Args:
+        image_file: Binary image file
+        max_pixels: Pixel budget for the decoded image
+
+    Returns:
+        Loaded grayscale image, upright according to its EXIF orientation
+    """
+    image = Image.open(image_file)
+    pixels = image.width * image.height
+    if pixels > max_pixels:
+        # Only JPEG supports draft(); it picks the smallest decoder scale still above the target
+        scale = (max_pixels / pixels) ** 0.5
+        image.draft('L', (int(image.width * scale), int(image.height * scale)))
+
+    image = ImageOps.grayscale(ImageOps.exif_transpose(image))
+    pixels = image.width * image.height
+    if pixels > max_pixels:
+        scale = (max_pixels / pixels) ** 0.5
+        image = image.resize((max(int(image.width * scale), 1), max(int(image.height * scale), 1)), Image.LANCZOS)
+    image.load()
+    return image
+
+
+_ocr_pool = OCRPool()
+
+
+def submit_ocr(image: Image.Image, source_dpi: Optional[float] = None,
+               timeout: Optional[float] = OCR_QUEUE_TIMEOUT, scan: bool = False) -> Future:
+    """Queue an image on the shared OCR pool and return its Future"""
+    return _ocr_pool.submit(image, source_dpi, timeout, scan)
+
+
+def get_ocr_stats() -> Dict[str, Any]:
+    """Metrics for the shared OCR pool"""
+    return _ocr_pool.stats()
@@ -0,0 +1,119 @@
+"""
+Process pool utilities for Pleader AI
+Spawn-context worker pools whose stuck workers are recycled without failing other callers' tasks
+"""
+
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Shared process pool that can retire its workers one caller at a time
+
+    A caller whose tasks overran cancels only its own futures with retire().
+    If one of them is still running (a worker is stuck on it), new submissions
+    go to a fresh pool and the old pool's workers are terminated once every
+    other task submitted to it has finished, so concurrent callers are never
+    failed by someone else's timeout.
+    """
+
+    def __init__(self, workers: int, drain_timeout: Optional[float] = None, name: str = "worker"):
+        """
+        Args:
+            workers: Worker processes per pool
+            drain_timeout: Longest a retired pool waits for other callers' tasks before its workers are killed
+            name: Used in log messages
+        """
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.name = name
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[ProcessPoolExecutor, Set[Future]] = {}  # executor -> unfinished futures
+        self._retiring: Set[ProcessPoolExecutor] = set()
+
+    def _current(self) -> ProcessPoolExecutor:
+        """The executor taking new submissions (lock must be held)"""
+        if self._executor is None or self._executor._broken:
+            if self._executor is not None:
+                # A worker died; its pending futures already failed with BrokenProcessPool
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._tasks.pop(self._executor, None)
+            # spawn: forking a server process that holds gRPC and thread state is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """Run func(*args) in a worker process and return its Future"""
+        with self._lock:
+            executor = self._current()
+            future = executor.submit(func, *args)
+            self._tasks.setdefault(executor, set()).add(future)
+        future.add_done_callback(lambda done: self._finished(executor, done))
+        return future
+
+    def _finished(self, executor: ProcessPoolExecutor, future: Future):
+        with self._lock:
+            tasks = self._tasks.get(executor)
+            if tasks is not None:
+                tasks.discard(future)
+                if not tasks and executor is not self._executor and executor not in self._retiring:
+                    del self._tasks[executor]
+
+    def retire(self, futures: Iterable[Future]):
+        """
+        Give up on futures after a timeout
+
+        Futures that have not started are cancelled. If any is running, its pool
+        stops taking work and is torn down in the background once the other
+        tasks on it have finished (or drain_timeout has passed).
+
+        Args:
+            futures: The timed-out caller's own futures
+        """
+        futures = set(futures)
+        running = {future for future in futures if not future.cancel() and not future.done()}
+        if not running:
+            return
+
+        with self._lock:
+            executor = next((e for e, tasks in self._tasks.items() if tasks & running), None)
+            if executor is None or executor in self._retiring:
+                return
+            self._retiring.add(executor)
+            if executor is self._executor:
+                self._executor = None
+            others = self._tasks.get(executor, set()) - futures
+
+        logger.warning(f"Recycling {self.name} pool after {len(running)} stuck task(s); "
+                       f"{len(others)} other task(s) will finish first")
+        threading.Thread(
+            target=self._drain, args=(executor, others), name=f"{self.name}-pool-drain", daemon=True
+        ).start()
+
+    def _drain(self, executor: ProcessPoolExecutor, others: Set[Future]):
+        """Wait for other callers' tasks, then kill the retired pool's workers"""
+        if others:
+            wait(others, timeout=self.drain_timeout)
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        with self._lock:
+            self._tasks.pop(executor, None)
+            self._retiring.discard(executor)
+
+    def shutdown(self):
+        """Stop taking work; tasks already submitted still finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
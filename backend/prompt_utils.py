@@ -0,0 +1,237 @@
+"""
+Prompt assembly utilities for Pleader AI
+Fast local token estimates and budgeted packing of prompt content
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Input token budgets per model. These cap cost and latency; they are well
+# below the models' context windows.
+TOKEN_BUDGETS: Dict[str, int] = {
+    "gemini-2.5-pro": int(os.environ.get('PROMPT_BUDGET_PRO', '24000')),
+    "gemini-2.5-flash": int(os.environ.get('PROMPT_BUDGET_FLASH', '8000')),
+}
+DEFAULT_TOKEN_BUDGET = 8000
+# Tokens held back from the budget for the model's answer
+RESPONSE_RESERVE = 1000
+# Don't bother keeping a truncated piece shorter than this
+MIN_PARTIAL_TOKENS = 50
+
+GAP_MARKER = "\n[...]\n"
+
+# Words, numbers and single punctuation marks; SentencePiece-style tokenizers
+# split long words into roughly 4-character pieces
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_CHARS_PER_SUBWORD = 4
+
+# Language that marks operative legal content worth keeping in an analysis prompt
+_LEGAL_SIGNAL_RE = re.compile(
+    r"\b(shall|must|liab\w*|indemn\w*|terminat\w*|penalt\w*|breach\w*|warrant\w*|"
+    r"govern\w*|jurisdiction|arbitrat\w*|confidential\w*|section|clause|article|act)\b",
+    re.IGNORECASE
+)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=\s*(?:\d+[.)]|[A-Z][A-Z ]{3,}\n))")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in text
+
+    Args:
+        text: Input text
+
+    Returns:
+        Approximate token count (within ~10% of Gemini's tokenizer on English legal text)
+    """
+    if not text:
+        return 0
+    return sum(
+        (len(piece) + _CHARS_PER_SUBWORD - 1) // _CHARS_PER_SUBWORD
+        for piece in _TOKEN_RE.findall(text)
+    )
+
+
+def get_token_budget(model_name: str) -> int:
+    """Input token budget for a model"""
+    return TOKEN_BUDGETS.get(model_name, DEFAULT_TOKEN_BUDGET)
+
+
+def remaining_budget(model_name: str, *fixed_parts: str, reserve: int = RESPONSE_RESERVE) -> int:
+    """
+    Tokens left for variable content once the fixed parts of a prompt are counted
+
+    Args:
+        model_name: Model the prompt is for
+        *fixed_parts: Instructions and other text that is always sent
+        reserve: Tokens held back for the response
+
+    Returns:
+        Token budget for the variable content (never negative)
+    """
+    used = sum(count_tokens(part) for part in fixed_parts)
+    return max(get_token_budget(model_name) - reserve - used, 0)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to a token budget, preferring a sentence or line boundary
+
+    Args:
+        text: Input text
+        max_tokens: Token budget
+
+    Returns:
+        Text within budget, ending in " [...]" if it was cut
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # Walk the token matches to find the character offset where the budget runs out
+    used = 0
+    end = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += (len(match.group()) + _CHARS_PER_SUBWORD - 1) // _CHARS_PER_SUBWORD
+        if used > max_tokens:
+            break
+        end = match.end()
+
+    cut = text[:end]
+    boundary = max(cut.rfind('. '), cut.rfind('\n'))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " [...]"
+
+
+def pack(items: Sequence[str], budget: int, priorities: Optional[Sequence[float]] = None,
+         allow_partial: bool = True) -> List[Optional[str]]:
+    """
+    Choose the highest-priority items that fit in a token budget
+
+    Args:
+        items: Candidate pieces of prompt content
+        budget: Token budget for all selected items
+        priorities: Value of each item (defaults to earlier items first)
+        allow_partial: Truncate the first item that does not fit instead of skipping it
+
+    Returns:
+        One entry per item in the original order: the (possibly truncated) text, or None if dropped
+    """
+    if priorities is None:
+        priorities = [-i for i in range(len(items))]
+
+    packed: List[Optional[str]] = [None] * len(items)
+    remaining = budget
+    for i in sorted(range(len(items)), key=lambda i: priorities[i], reverse=True):
+        if remaining <= 0:
+            break
+        tokens = count_tokens(items[i])
+        if tokens <= remaining:
+            packed[i] = items[i]
+            remaining -= tokens
+        elif allow_partial and remaining >= MIN_PARTIAL_TOKENS:
+            packed[i] = truncate_to_tokens(items[i], remaining)
+            remaining = 0
+    return packed
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split document text into paragraphs or numbered clauses"""
+    return [p.strip() for p in _PARAGRAPH_RE.split(text) if p and p.strip()]
+
+
+def select_document_passages(text: str, budget: int) -> str:
+    """
+    Fit a document into a token budget, keeping its most informative passages
+
+    The opening paragraphs (parties, recitals, definitions) are always favoured,
+    then paragraphs dense in operative legal language. Kept passages stay in
+    document order and dropped stretches are marked with [...].
+
+    Args:
+        text: Full document text
+        budget: Token budget for the document
+
+    Returns:
+        The whole text if it fits, otherwise the selected passages
+    """
+    if count_tokens(text) <= budget:
+        return text
+
+    paragraphs = split_paragraphs(text)
+    priorities = []
+    for position, paragraph in enumerate(paragraphs):
+        signal = len(_LEGAL_SIGNAL_RE.findall(paragraph)) * 100 / max(count_tokens(paragraph), 1)
+        priorities.append(signal + (50 if position < 3 else 0))
+
+    # The [...] markers cost tokens too, so shrink the packing target until the result fits
+    target = budget
+    while True:
+        output = _join_passages(pack(paragraphs, target, priorities))
+        overflow = count_tokens(output) - budget
+        if overflow <= 0 or target <= 0:
+            return output
+        target -= overflow
+
+
+def _join_passages(packed: List[Optional[str]]) -> str:
+    """Join packed passages in order, marking each dropped stretch once"""
+    output = ""
+    for passage in packed:
+        if passage is None:
+            if not output.endswith(GAP_MARKER):
+                output += GAP_MARKER
+        elif output and not output.endswith(GAP_MARKER):
+            output += "\n\n" + passage
+        else:
+            output += passage
+    return output
+
+
+def split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into consecutive sections of at most max_tokens, breaking between paragraphs
+
+    Args:
+        text: Input text
+        max_tokens: Token budget per section
+
+    Returns:
+        Sections in document order
+    """
+    sections: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in split_paragraphs(text):
+        tokens = count_tokens(paragraph)
+        if current and current_tokens + tokens > max_tokens:
+            sections.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > max_tokens:
+            # A single paragraph longer than a section is cut at token boundaries
+            pieces = _split_long_paragraph(paragraph, max_tokens)
+            sections.extend(pieces[:-1])
+            paragraph, tokens = pieces[-1], count_tokens(pieces[-1])
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def _split_long_paragraph(paragraph: str, max_tokens: int) -> List[str]:
+    """Cut a paragraph into pieces of at most max_tokens"""
+    pieces = []
+    start = 0
+    used = 0
+    for match in _TOKEN_RE.finditer(paragraph):
+        tokens = (len(match.group()) + _CHARS_PER_SUBWORD - 1) // _CHARS_PER_SUBWORD
+        if used + tokens > max_tokens and used:
+            pieces.append(paragraph[start:match.start()].strip())
+            start, used = match.start(), 0
+        used += tokens
+    pieces.append(paragraph[start:].strip())
+    return pieces
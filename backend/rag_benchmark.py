@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the Pleader AI RAG pipeline
+
+compression: compares vector compression types against the uncompressed flat
+    index (memory per vector, search latency, recall@k).
+retrieval: builds synthetic legal corpora at several scales with a hashing
+    embedder and a fake LLM, and measures chunking and indexing throughput,
+    search/rerank/query latency, memory (including the private memory each
+    extra reader process adds) and recall for each index type.
+rerank: compares no re-ranking, local MMR and the LLM re-ranker on a labelled
+    query set (precision@k, MRR, diversity and re-rank latency).
+
+Results are written as JSON so runs on different commits can be compared.
+
+Usage:
+    python rag_benchmark.py compression --num-vectors 50000 --types flat fp16 sq8 pq
+    python rag_benchmark.py retrieval --scales 10000 100000 --output results.json
+    python rag_benchmark.py retrieval --scales 10000 --compare results.json
+    python rag_benchmark.py rerank --llm gemini --queries labelled.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import faiss
+
+from embedding_utils import HashingEmbedder
+from rag_utils import RAGPipeline, build_index, gemini_generate, INDEX_FACTORY_STRINGS, MIN_TRAINING_VECTORS
+
+# Synthetic corpus vocabulary
+PARTIES = [
+    "Reliance Textiles Pvt. Ltd.", "Sharma Constructions", "Mehta & Sons", "Bharat Logistics Ltd.",
+    "Ananya Iyer", "Rajesh Kumar", "Karnataka Power Corporation", "Delhi Metro Rail Corporation",
+]
+ACTS = [
+    "Indian Contract Act, 1872", "Arbitration and Conciliation Act, 1996", "Specific Relief Act, 1963",
+    "Transfer of Property Act, 1882", "Consumer Protection Act, 2019", "Code of Civil Procedure, 1908",
+    "Negotiable Instruments Act, 1881", "Information Technology Act, 2000", "Companies Act, 2013",
+]
+CITIES = ["Mumbai", "New Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Ahmedabad"]
+CLAUSES = [
+    "The Lessee shall pay a monthly rent of Rs. {amount} on or before the {day}th day of each month to the Lessor at {city}.",
+    "Either party may terminate this Agreement by giving {days} days written notice in the event of a material breach under Section {section} of the {act}.",
+    "All disputes arising out of this Agreement shall be referred to a sole arbitrator seated at {city} under the {act}.",
+    "{party} shall indemnify and hold harmless {other} against all losses, claims and damages up to Rs. {amount}.",
+    "The Receiving Party shall keep all Confidential Information strictly confidential for a period of {years} years after termination.",
+    "This Agreement shall be governed by the laws of India and the courts at {city} shall have exclusive jurisdiction.",
+    "Neither party shall be liable for delay caused by force majeure events including flood, epidemic or acts of Government for up to {days} days.",
+    "The Contractor shall complete the works within {days} days failing which liquidated damages of Rs. {amount} per week shall be payable.",
+    "The cheque for Rs. {amount} issued by {party} was dishonoured and notice was served under Section 138 of the {act}.",
+    "The petitioner {party} prays that the Hon'ble High Court at {city} grant an interim injunction under Order {section} of the {act}.",
+]
+
+# Labelled queries for the synthetic corpus: a chunk is relevant if it contains a phrase
+LABELLED_QUERIES = [
+    {"query": "When is the monthly rent payable to the lessor?", "relevant_phrases": ["monthly rent"]},
+    {"query": "How are disputes resolved by a sole arbitrator?", "relevant_phrases": ["sole arbitrator"]},
+    {"query": "Who must indemnify and hold harmless the other party against losses?", "relevant_phrases": ["indemnify"]},
+    {"query": "How long must confidential information be kept confidential?", "relevant_phrases": ["Confidential Information"]},
+    {"query": "Which courts have exclusive jurisdiction under the laws of India?", "relevant_phrases": ["governed by the laws of India"]},
+    {"query": "Is a party liable for delay caused by force majeure events?", "relevant_phrases": ["force majeure"]},
+    {"query": "What liquidated damages are payable if the works are delayed?", "relevant_phrases": ["liquidated damages"]},
+    {"query": "Was the cheque dishonoured and notice served under Section 138?", "relevant_phrases": ["dishonoured"]},
+    {"query": "Can either party terminate on material breach with written notice?", "relevant_phrases": ["material breach"]},
+    {"query": "Has the petitioner prayed for an interim injunction from the High Court?", "relevant_phrases": ["interim injunction"]},
+]
+
+
+def synthetic_legal_document(rng: random.Random, num_clauses: int = 12) -> str:
+    """Generate a contract-like document from clause templates"""
+    party, other = rng.sample(PARTIES, 2)
+    clauses = []
+    for n in range(1, num_clauses + 1):
+        template = rng.choice(CLAUSES)
+        clauses.append(f"{n}. " + template.format(
+            party=party, other=other,
+            act=rng.choice(ACTS), city=rng.choice(CITIES),
+            amount=f"{rng.randint(1, 500) * 1000:,}",
+            day=rng.randint(1, 28), days=rng.choice([7, 15, 30, 60, 90]),
+            years=rng.randint(1, 10), section=rng.randint(1, 400),
+        ))
+    return f"AGREEMENT between {party} and {other}\n\n" + "\n".join(clauses)
+
+
+def synthetic_vectors(n: int, dimension: int, num_clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """
+    Generate clustered vectors resembling sentence embeddings
+
+    Args:
+        n: Number of vectors
+        dimension: Vector dimension
+        num_clusters: Number of topic clusters
+        seed: Random seed
+
+    Returns:
+        float32 array of shape (n, dimension)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dimension)).astype(np.float32)
+    assignments = rng.integers(0, num_clusters, size=n)
+    vectors = centers[assignments] + 0.5 * rng.normal(size=(n, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(ground_truth: np.ndarray, found: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours returned by the approximate search"""
+    hits = sum(len(set(gt) & set(f)) for gt, f in zip(ground_truth, found))
+    return hits / ground_truth.size
+
+
+def latency_percentiles(index, queries: np.ndarray, k: int) -> Dict[str, float]:
+    """Time single-query searches and return p50/p99 in milliseconds"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+
+def benchmark_index_types(vectors: np.ndarray, queries: np.ndarray, index_types: List[str], k: int) -> List[Dict[str, Any]]:
+    """
+    Benchmark each compression type against the exact flat index
+
+    Args:
+        vectors: Corpus vectors
+        queries: Query vectors
+        index_types: Compression types to compare
+        k: Neighbours per query
+
+    Returns:
+        One result dict per index type
+    """
+    dimension = vectors.shape[1]
+    exact = build_index("flat", dimension)
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        if len(vectors) < MIN_TRAINING_VECTORS[index_type]:
+            print(f"Skipping {index_type}: needs {MIN_TRAINING_VECTORS[index_type]} vectors to train")
+            continue
+
+        start = time.perf_counter()
+        index = build_index(index_type, dimension, vectors)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "index.bin"
+            faiss.write_index(index, str(path))
+            disk_bytes = os.path.getsize(path)
+
+        _, found = index.search(queries, k)
+        result = {
+            "index_type": index_type,
+            "num_vectors": len(vectors),
+            "bytes_per_vector": index.sa_code_size(),
+            "disk_bytes_per_vector": disk_bytes / len(vectors),
+            "build_seconds": build_seconds,
+            f"recall@{k}": recall_at_k(ground_truth, found),
+            **latency_percentiles(index, queries, k),
+        }
+        results.append(result)
+        print(
+            f"{index_type:>5}: {result['bytes_per_vector']:>5} B/vector, "
+            f"recall@{k}={result[f'recall@{k}']:.3f}, "
+            f"p50={result['p50_ms']:.2f} ms, p99={result['p99_ms']:.2f} ms"
+        )
+
+    return results
+
+
+def fake_llm(model_name: str, prompt: str) -> str:
+    """
+    Stand-in for Gemini: scores rerank prompts by word overlap and echoes a short answer
+
+    Args:
+        model_name: Ignored
+        prompt: Prompt text
+
+    Returns:
+        A 0-10 score for rerank prompts, otherwise a canned answer
+    """
+    if "Relevance score" in prompt:
+        query = prompt.split("Query:", 1)[1].split("Text:", 1)[0].lower().split()
+        text = prompt.split("Text:", 1)[1].lower().split()
+        overlap = len(set(query) & set(text)) / max(len(set(query)), 1)
+        return f"{overlap * 10:.1f}"
+    return "Based on the uploaded documents, the answer is in the cited clauses."
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def anon_rss_mb() -> Optional[float]:
+    """Private (anonymous) resident memory of this process in MB; None where /proc is unavailable"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reader_anon_rss(index_dir: str, use_mmap: bool) -> Optional[float]:
+    """Load the published index in this (fresh) process, search it, and return the private memory it added"""
+    before = anon_rss_mb()
+    rag = RAGPipeline(index_dir=index_dir, use_mmap=use_mmap, embedder=HashingEmbedder(), llm=fake_llm)
+    rag.search("notice period for termination of the lease", k=10)
+    after = anon_rss_mb()
+    return after - before if before is not None and after is not None else None
+
+
+def reader_rss_mb(index_dir: str, use_mmap: bool) -> Optional[float]:
+    """
+    Private memory one extra reader process pays to serve the index
+
+    Each uvicorn worker is such a reader, so this is what memory grows by per worker.
+    Memory-mapped vectors are shared through the page cache and do not count.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_reader_anon_rss, index_dir, use_mmap).result()
+
+
+def git_commit() -> Optional[str]:
+    """Current git commit, if run inside a checkout"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def build_corpus(num_chunks: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Generate and chunk synthetic documents until num_chunks chunks exist
+
+    Args:
+        num_chunks: Target number of chunks
+        seed: Random seed
+
+    Returns:
+        Dict with chunks, metadata and chunking throughput
+    """
+    rng = random.Random(seed)
+    chunker = RAGPipeline.chunk_text
+    chunks, metadata = [], []
+    chunk_seconds, chars = 0.0, 0
+    doc_id = 0
+
+    while len(chunks) < num_chunks:
+        text = synthetic_legal_document(rng)
+        start = time.perf_counter()
+        doc_chunks = chunker(None, text)
+        chunk_seconds += time.perf_counter() - start
+        chars += len(text)
+        for i, chunk in enumerate(doc_chunks):
+            chunks.append(chunk)
+            metadata.append({
+                "filename": f"synthetic_{doc_id}.txt",
+                "document_id": str(doc_id),
+                "chunk_index": i,
+                "chunk_position": len(chunks) - 1,
+            })
+        doc_id += 1
+
+    return {
+        "chunks": chunks[:num_chunks],
+        "metadata": metadata[:num_chunks],
+        "num_documents": doc_id,
+        "chunking_mb_per_second": chars / max(chunk_seconds, 1e-9) / 1e6,
+    }
+
+
+def planted_queries(chunks: List[str], num_queries: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Build queries from random word subsets of known chunks"""
+    rng = random.Random(seed)
+    queries = []
+    for target in rng.sample(range(len(chunks)), min(num_queries, len(chunks))):
+        words = chunks[target].split()
+        start = rng.randint(0, max(len(words) - 12, 0))
+        queries.append({"query": " ".join(words[start:start + 12]), "target": target})
+    return queries
+
+
+def benchmark_retrieval(num_chunks: int, index_type: str, k: int, num_queries: int,
+                        batch_size: int) -> Dict[str, Any]:
+    """
+    Index a synthetic corpus and measure retrieval for one index configuration
+
+    Args:
+        num_chunks: Corpus size in chunks
+        index_type: Compression type for the index
+        k: Results per search
+        num_queries: Number of timed queries
+        batch_size: Chunks per add_documents call
+
+    Returns:
+        Result dict for this scale and index type
+    """
+    corpus = build_corpus(num_chunks)
+    chunks, metadata = corpus["chunks"], corpus["metadata"]
+    queries = planted_queries(chunks, num_queries)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        rag = RAGPipeline(index_dir=index_dir, index_type=index_type, embedder=HashingEmbedder(), llm=fake_llm)
+
+        start = time.perf_counter()
+        for offset in range(0, len(chunks), batch_size):
+            rag.add_documents(chunks[offset:offset + batch_size], metadata[offset:offset + batch_size])
+        index_seconds = time.perf_counter() - start
+
+        stats = rag.get_stats()
+        # Generations retained for rollback are reported apart from the live index
+        dir_bytes = sum(f.stat().st_size for f in Path(index_dir).rglob("*") if f.is_file())
+        reader_mb = reader_rss_mb(index_dir, use_mmap=True)
+        reader_copy_mb = reader_rss_mb(index_dir, use_mmap=False)
+
+        # Exact neighbours over freshly embedded chunks give the recall baseline
+        query_vectors = np.array([rag.generate_query_embedding(q["query"]) for q in queries], dtype=np.float32)
+        exact = build_index("flat", rag.dimension)
+        exact.add(np.array(rag.embedder.embed_documents(chunks), dtype=np.float32))
+        _, ground_truth = exact.search(query_vectors, k)
+
+        search_ms, rerank_ms, query_ms, found, hits = [], [], [], [], 0
+        for q in queries:
+            start = time.perf_counter()
+            results = rag.search(q["query"], k=k)
+            search_ms.append((time.perf_counter() - start) * 1000)
+
+            positions = [doc["metadata"]["chunk_position"] for doc in results]
+            found.append(positions + [-1] * (k - len(positions)))
+            hits += q["target"] in positions
+
+            start = time.perf_counter()
+            rag.rerank_results(q["query"], results, top_k=3)
+            rerank_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            rag.query(q["query"], top_k=3)
+            query_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "num_chunks": len(chunks),
+        "num_documents": corpus["num_documents"],
+        "index_type": stats["index_type"],
+        "chunking_mb_per_second": corpus["chunking_mb_per_second"],
+        "indexing_chunks_per_second": len(chunks) / index_seconds,
+        "search_p50_ms": float(np.percentile(search_ms, 50)),
+        "search_p99_ms": float(np.percentile(search_ms, 99)),
+        "rerank_p50_ms": float(np.percentile(rerank_ms, 50)),
+        "query_p50_ms": float(np.percentile(query_ms, 50)),
+        "bytes_per_vector": stats["bytes_per_vector"],
+        "index_disk_mb": stats["disk_bytes"] / 1e6,
+        "retained_disk_mb": (dir_bytes - stats["disk_bytes"]) / 1e6,
+        "peak_rss_mb": peak_rss_mb(),
+        "reader_rss_mb": reader_mb,
+        "reader_rss_unmapped_mb": reader_copy_mb,
+        f"recall@{k}": recall_at_k(ground_truth, np.array(found)),
+        f"target_hit_rate@{k}": hits / len(queries),
+    }
+
+
+# Metrics where a higher value is better; everything else is lower-is-better
+HIGHER_IS_BETTER = ("per_second", "recall", "hit_rate")
+
+
+def compare_results(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> int:
+    """
+    Print metric deltas against a previous run and count regressions
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from a previous run
+        threshold: Relative change treated as a regression (0.1 = 10%)
+
+    Returns:
+        Number of regressed metrics
+    """
+    previous = {(r["num_chunks"], r["index_type"]): r for r in baseline}
+    regressions = 0
+    for result in current:
+        base = previous.get((result["num_chunks"], result["index_type"]))
+        if base is None:
+            continue
+        for metric, value in result.items():
+            if not isinstance(value, float) or not base.get(metric):
+                continue
+            change = (value - base[metric]) / base[metric]
+            higher_is_better = any(token in metric for token in HIGHER_IS_BETTER)
+            regressed = change < -threshold if higher_is_better else change > threshold
+            if regressed:
+                regressions += 1
+                print(f"REGRESSION {result['num_chunks']}/{result['index_type']} {metric}: "
+                      f"{base[metric]:.4g} -> {value:.4g} ({change:+.1%})")
+    return regressions
+
+
+def load_labelled_queries(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Read a JSONL file of {"query", "relevant_phrases"} records, or use the built-in set"""
+    if not path:
+        return LABELLED_QUERIES
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rank_quality(ranked: List[Dict[str, Any]], phrases: List[str], embedder, k: int) -> Dict[str, float]:
+    """Precision@k, reciprocal rank, distinct source documents and redundancy of one ranking"""
+    relevant = [any(phrase.lower() in doc["text"].lower() for phrase in phrases) for doc in ranked[:k]]
+    first_hit = next((i for i, hit in enumerate(relevant) if hit), None)
+
+    redundancy = 0.0
+    if len(ranked) > 1:
+        vectors = np.array(embedder.embed_documents([doc["text"] for doc in ranked[:k]]), dtype=np.float32)
+        similarity = vectors @ vectors.T
+        pairs = similarity[np.triu_indices(len(vectors), 1)]
+        redundancy = float(np.mean(pairs > 0.9))
+
+    return {
+        "precision": sum(relevant) / k,
+        "reciprocal_rank": 1 / (first_hit + 1) if first_hit is not None else 0.0,
+        "distinct_documents": len({doc["metadata"]["document_id"] for doc in ranked[:k]}) / max(len(ranked[:k]), 1),
+        "redundancy": redundancy,
+    }
+
+
+def run_rerank(args):
+    corpus = build_corpus(args.num_chunks)
+    queries = load_labelled_queries(args.queries)
+    llm = gemini_generate if args.llm == "gemini" else fake_llm
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        rag = RAGPipeline(index_dir=index_dir, embedder=HashingEmbedder(), llm=llm)
+        for offset in range(0, len(corpus["chunks"]), 5000):
+            rag.add_documents(corpus["chunks"][offset:offset + 5000], corpus["metadata"][offset:offset + 5000])
+
+        candidates = []
+        for q in queries:
+            embedding = rag.generate_query_embedding(q["query"])
+            candidates.append((q, embedding, rag.search(q["query"], k=args.candidates, query_embedding=embedding)))
+
+        results = []
+        for method in ("none", "mmr", "llm"):
+            timings, metrics = [], []
+            for q, embedding, hits in candidates:
+                hits = [dict(hit) for hit in hits]
+                start = time.perf_counter()
+                if method == "mmr":
+                    ranked = rag.mmr_rerank(embedding, hits, args.k, args.mmr_lambda)
+                elif method == "llm":
+                    ranked = rag.rerank_results(q["query"], hits, args.k)
+                else:
+                    ranked = hits[:args.k]
+                timings.append((time.perf_counter() - start) * 1e6)
+                metrics.append(rank_quality(ranked, q["relevant_phrases"], rag.embedder, args.k))
+
+            result = {
+                "method": method,
+                "llm": args.llm if method == "llm" else None,
+                "num_chunks": len(corpus["chunks"]),
+                "num_queries": len(queries),
+                f"precision@{args.k}": float(np.mean([m["precision"] for m in metrics])),
+                "mrr": float(np.mean([m["reciprocal_rank"] for m in metrics])),
+                "distinct_documents_ratio": float(np.mean([m["distinct_documents"] for m in metrics])),
+                "redundant_pair_ratio": float(np.mean([m["redundancy"] for m in metrics])),
+                "rerank_p50_us": float(np.percentile(timings, 50)),
+                "rerank_p99_us": float(np.percentile(timings, 99)),
+            }
+            results.append(result)
+            print(
+                f"{method:>4}: P@{args.k}={result[f'precision@{args.k}']:.3f} MRR={result['mrr']:.3f} "
+                f"distinct={result['distinct_documents_ratio']:.2f} redundant={result['redundant_pair_ratio']:.2f} "
+                f"p50={result['rerank_p50_us']:.0f} us"
+            )
+
+    return results
+
+
+def run_compression(args):
+    vectors = synthetic_vectors(args.num_vectors + args.num_queries, args.dimension)
+    corpus, queries = vectors[:args.num_vectors], vectors[args.num_vectors:]
+    return benchmark_index_types(corpus, queries, args.types, args.k)
+
+
+def run_retrieval(args):
+    results = []
+    for num_chunks in args.scales:
+        for index_type in args.types:
+            if num_chunks < MIN_TRAINING_VECTORS[index_type]:
+                print(f"Skipping {index_type} at {num_chunks} chunks: needs {MIN_TRAINING_VECTORS[index_type]} to train")
+                continue
+            batch_size = args.batch_size or max(num_chunks // 20, 1000)
+            result = benchmark_retrieval(num_chunks, index_type, args.k, args.num_queries, batch_size)
+            results.append(result)
+            print(
+                f"{num_chunks:>8} {index_type:>5}: index {result['indexing_chunks_per_second']:.0f} chunks/s, "
+                f"search p50={result['search_p50_ms']:.2f} ms p99={result['search_p99_ms']:.2f} ms, "
+                f"recall@{args.k}={result[f'recall@{args.k}']:.3f}, "
+                f"hit@{args.k}={result[f'target_hit_rate@{args.k}']:.3f}, "
+                f"rss={result['peak_rss_mb']:.0f} MB, "
+                f"per reader={result['reader_rss_mb'] or 0:.0f} MB ({result['reader_rss_unmapped_mb'] or 0:.0f} MB unmapped)"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG benchmarks")
+    # Shared by every benchmark, so they go after the benchmark name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output", help="Write results as JSON to this file")
+    common.add_argument("--compare", help="Previous JSON results to compare against")
+    common.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    compression = subparsers.add_parser("compression", parents=[common], help="Compare vector compression types")
+    compression.add_argument("--num-vectors", type=int, default=20000)
+    compression.add_argument("--num-queries", type=int, default=200)
+    compression.add_argument("--dimension", type=int, default=768)
+    compression.add_argument("--k", type=int, default=10)
+    compression.add_argument("--types", nargs="+", default=list(INDEX_FACTORY_STRINGS), choices=list(INDEX_FACTORY_STRINGS))
+    compression.set_defaults(func=run_compression)
+
+    retrieval = subparsers.add_parser("retrieval", parents=[common],
+                                      help="End-to-end retrieval on synthetic legal corpora")
+    retrieval.add_argument("--scales", nargs="+", type=int, default=[10000, 100000, 1000000])
+    retrieval.add_argument("--types", nargs="+", default=["flat", "sq8"], choices=list(INDEX_FACTORY_STRINGS))
+    retrieval.add_argument("--num-queries", type=int, default=200)
+    retrieval.add_argument("--k", type=int, default=10)
+    retrieval.add_argument("--batch-size", type=int, help="Chunks per add_documents call (default: scale / 20)")
+    retrieval.set_defaults(func=run_retrieval)
+
+    rerank = subparsers.add_parser("rerank", parents=[common], help="Compare MMR and LLM re-ranking on labelled queries")
+    rerank.add_argument("--num-chunks", type=int, default=10000)
+    rerank.add_argument("--queries", help="JSONL file of {query, relevant_phrases} (default: built-in set)")
+    rerank.add_argument("--candidates", type=int, default=10, help="Search results passed to the re-ranker")
+    rerank.add_argument("--k", type=int, default=3)
+    rerank.add_argument("--mmr-lambda", type=float, default=0.7)
+    rerank.add_argument("--llm", choices=["fake", "gemini"], default="fake", help="LLM used by the llm re-ranker")
+    rerank.set_defaults(func=run_rerank)
+
+    args = parser.parse_args()
+    results = args.func(args)
+
+    report = {
+        "benchmark": args.benchmark,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss_version": faiss.__version__,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline["results"], args.threshold)
+        print(f"{regressions} regression(s) against {baseline.get('commit') or args.compare}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
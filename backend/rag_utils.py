@@ -1,38 +1,355 @@
 """
 RAG (Retrieval Augmented Generation) utilities for Pleader AI
-Implements document chunking, FAISS indexing, Gemini embeddings, and retrieval with re-ranking
+Implements document chunking, FAISS indexing, pluggable embeddings, and retrieval with re-ranking
 """
 
 import os
+import uuid
 import logging
+import threading
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, NamedTuple, FrozenSet
 import google.generativeai as genai
 import faiss
 from pathlib import Path
 import json
 import pickle
+from embedding_utils import EmbeddingBackend, get_embedding_backend
+from prompt_utils import pack, remaining_budget
+from dedup_utils import SimHashIndex, simhash, hamming_distance, MAX_DISTANCE as DEDUP_MAX_DISTANCE
+import fcntl
+import shutil
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini API
 genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
 
+# On-disk layout: every published index lives in its own generation directory
+# and CURRENT names the live one, so all workers share a single copy on disk.
+INDEX_FILENAME = "faiss_index.bin"
+DOCS_FILENAME = "documents.pkl"
+MANIFEST_FILENAME = "manifest.json"
+CURRENT_FILENAME = "CURRENT"
+LOCK_FILENAME = "writer.lock"
+CHECKPOINT_FILENAME = "checkpoint.json"
+GENERATION_PREFIX = "gen-"
+READER_LOCK_FILENAME = "readers.lock"
+# The newest generations are kept for rollback; older ones are deleted as soon as no
+# process has them loaded (readers hold a shared lock on every generation they use)
+GENERATIONS_TO_KEEP = int(os.environ.get('RAG_GENERATIONS_TO_KEEP', '3'))
+# Uploads publish delta generations holding only the appended vectors and chunks on
+# top of their parent. The chain is compacted into a full generation after MAX_DELTAS
+# deltas, or once the deltas hold DELTA_COMPACT_RATIO times the base's vectors
+MAX_DELTAS = int(os.environ.get('RAG_MAX_DELTAS', '16'))
+DELTA_COMPACT_RATIO = float(os.environ.get('RAG_DELTA_COMPACT_RATIO', '0.25'))
+
+# Vector compression: flat (float32), fp16 (half precision on disk and in RAM),
+# sq8 (8-bit scalar quantization) or pq (product quantization)
+INDEX_TYPE = os.environ.get('RAG_INDEX_TYPE', 'flat').lower()
+PQ_SUBQUANTIZERS = int(os.environ.get('RAG_PQ_M', '96'))
+INDEX_FACTORY_STRINGS = {
+    "flat": "Flat",
+    "fp16": "SQfp16",
+    "sq8": "SQ8",
+    "pq": "PQ{m}",
+}
+# Vectors needed before an index type can be trained reliably
+# (PQ codebooks want ~39 points for each of the 256 centroids)
+MIN_TRAINING_VECTORS = {
+    "flat": 0,
+    "fp16": 0,
+    "sq8": 1000,
+    "pq": 256 * 39,
+}
+# Index types whose codes live in one flat array (IndexFlatCodes). Only IO_FLAG_MMAP_IFC
+# maps that array from the page cache; IO_FLAG_MMAP still copies it into private memory
+FLAT_CODES_INDEX_TYPES = ("flat", "fp16", "sq8", "pq")
+
+# Link near-duplicate chunks to an existing vector instead of embedding them again
+DEDUP_ENABLED = os.environ.get('RAG_DEDUP', 'true').lower() in ('1', 'true', 'yes')
+
+# Indexes written before manifests existed were always built with Gemini embedding-001
+LEGACY_MANIFEST = {"embedding_backend": "gemini:models/embedding-001", "dimension": 768}
+
+
+RERANK_MODEL = 'gemini-2.5-flash'
+ANSWER_MODEL = 'gemini-2.5-pro'
+
+
+# Relevance/diversity trade-off for MMR re-ranking
+MMR_LAMBDA = float(os.environ.get('RAG_MMR_LAMBDA', '0.7'))
+RERANK_METHODS = ("llm", "mmr")
+
+ANSWER_PROMPT_TEMPLATE = """You are Pleader AI, an expert legal assistant specializing EXCLUSIVELY in Indian law.
+
+Context from documents:
+{context}
+
+Question: {query}
+
+STRICT INSTRUCTIONS:
+- Answer ONLY based on the provided context from uploaded documents
+- You must ONLY discuss Indian legal framework, acts, sections, and precedents
+- Do NOT reference laws from other jurisdictions (US, UK, etc.) unless explicitly comparing to Indian law
+- Cite specific document names, section numbers, article numbers, or case references when making claims
+- Format your response with clear headings, bullet points, and structured sections
+- If the context doesn't contain sufficient information, clearly state: "Based on the uploaded documents, I don't have enough information to answer this fully."
+- Include relevant Indian legal references: Acts, Articles of Constitution, IPC sections, case law citations
+- Be professional, precise, and grounded strictly in Indian legal context
+
+Answer (with citations):"""
+
+NO_RESULTS_ANSWER = (
+    "I don't have enough information in my knowledge base to answer this question accurately. "
+    "Please try uploading relevant legal documents first."
+)
+
+
+def mmr_select(query_vector: np.ndarray, candidates: np.ndarray, top_k: int,
+               lambda_mult: float = MMR_LAMBDA) -> Tuple[List[int], List[float]]:
+    """
+    Pick candidates by maximal marginal relevance using cosine similarity
+    
+    Args:
+        query_vector: Query embedding of shape (dimension,)
+        candidates: Candidate embeddings of shape (n, dimension)
+        top_k: Number of candidates to select
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+        
+    Returns:
+        Tuple of (selected candidate positions in order, their MMR scores)
+    """
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+    
+    relevance = candidates @ query_vector
+    similarity = candidates @ candidates.T
+    
+    n = len(candidates)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    order, scores = [], []
+    
+    for _ in range(min(top_k, n)):
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        order.append(best)
+        scores.append(float(mmr[best]))
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    
+    return order, scores
+
+
+def gemini_generate(model_name: str, prompt: str) -> str:
+    """
+    Generate text with a Gemini model
+    
+    Args:
+        model_name: Gemini model name
+        prompt: Prompt text
+        
+    Returns:
+        Generated text
+    """
+    model = genai.GenerativeModel(model_name)
+    return model.generate_content(prompt).text
+
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when the index was built with a different embedding backend or dimension"""
+
+
+def build_index(index_type: str, dimension: int, training_vectors: Optional[np.ndarray] = None):
+    """
+    Create an empty (trained) FAISS index of the given compression type
+    
+    Args:
+        index_type: One of flat, fp16, sq8, pq
+        dimension: Vector dimension
+        training_vectors: Sample vectors used to train quantizers
+        
+    Returns:
+        FAISS index ready for add()
+    """
+    if index_type not in INDEX_FACTORY_STRINGS:
+        raise ValueError(f"Unknown index type: {index_type}. Use one of: {', '.join(INDEX_FACTORY_STRINGS)}")
+    
+    factory = INDEX_FACTORY_STRINGS[index_type].format(m=PQ_SUBQUANTIZERS)
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    
+    if not index.is_trained:
+        if training_vectors is None or len(training_vectors) == 0:
+            raise ValueError(f"Index type {index_type} requires training vectors")
+        index.train(training_vectors)
+    
+    return index
+
+
+def empty_index_like(index):
+    """
+    Create an empty index with the same compression and trained parameters as index
+    
+    Args:
+        index: FAISS index (may be memory-mapped) or LayeredIndex
+        
+    Returns:
+        FAISS index ready for add(), or None if the index type cannot be copied this way
+    """
+    if isinstance(index, LayeredIndex):
+        index = index.parts[0]
+    index = faiss.downcast_index(index)
+    # merge_from() only accepts the exact same index class
+    if isinstance(index, (faiss.IndexFlatL2, faiss.IndexFlatIP)):
+        return type(index)(index.d)
+    if isinstance(index, faiss.IndexFlat):
+        return faiss.IndexFlat(index.d, index.metric_type)
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        empty = faiss.IndexScalarQuantizer(index.d, index.sq.qtype, index.metric_type)
+        empty.sq = index.sq
+    elif isinstance(index, faiss.IndexPQ):
+        empty = faiss.IndexPQ(index.d, index.pq.M, index.pq.nbits, index.metric_type)
+        empty.pq = index.pq
+    else:
+        return None
+    empty.is_trained = True
+    return empty
+
+
+def index_type_of(index) -> str:
+    """Return the compression type name (flat, fp16, sq8, pq) of a FAISS index"""
+    if isinstance(index, LayeredIndex):
+        index = index.parts[0]
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "fp16"
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_8bit:
+            return "sq8"
+    return type(index).__name__
+
+class LayeredIndex:
+    """
+    A base index and the delta indexes published on top of it, searched as one
+    
+    Vector ids run on from one part to the next, as if the deltas had been added
+    to the base. Parts are never modified, so they can stay memory-mapped.
+    """
+    
+    def __init__(self, parts: List[Any]):
+        self.parts = list(parts)
+        self.offsets = np.cumsum([0] + [part.ntotal for part in self.parts[:-1]])
+        self.d = self.parts[0].d
+        self.metric_type = self.parts[0].metric_type
+        self.ntotal = int(sum(part.ntotal for part in self.parts))
+    
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, labels = [], []
+        for offset, part in zip(self.offsets, self.parts):
+            if not part.ntotal:
+                continue
+            part_distances, part_labels = part.search(x, min(k, part.ntotal))
+            distances.append(part_distances)
+            labels.append(np.where(part_labels >= 0, part_labels + offset, -1))
+        distances, labels = np.hstack(distances), np.hstack(labels)
+        ranking = -distances if self.metric_type == faiss.METRIC_INNER_PRODUCT else distances
+        order = np.argsort(ranking, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(labels, order, axis=1)
+    
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.empty((len(ids), self.d), dtype=np.float32)
+        owners = np.searchsorted(self.offsets, ids, side="right") - 1
+        for owner in np.unique(owners):
+            mask = owners == owner
+            vectors[mask] = self.parts[owner].reconstruct_batch(ids[mask] - self.offsets[owner])
+        return vectors
+    
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return self.reconstruct_batch(np.arange(start, start + count))
+    
+    def sa_code_size(self) -> int:
+        return self.parts[0].sa_code_size()
+    
+    def merge(self):
+        """Fold the deltas into the base and return it (parts must not be memory-mapped)"""
+        base = self.parts[0]
+        for part in self.parts[1:]:
+            base.merge_from(part)
+        return base
+
+
+def combine_parts(parts: List[Any]) -> Optional[Any]:
+    """Single index for a generation chain's parts (None if there are none)"""
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else LayeredIndex(parts)
+
+
+class IndexSnapshot(NamedTuple):
+    """Immutable view of one loaded generation; readers take it once per search"""
+    generation: int
+    index: Optional[Any]
+    documents: List[Dict[str, Any]]
+    vector_docs: Dict[int, List[int]]  # vector id -> positions in documents sharing that vector
+    manifest: Optional[Dict[str, Any]]  # Embedding backend/dimension the index was built with
+    chain: Tuple[int, ...] = ()  # Full generation and the deltas on top of it, oldest first
+    document_ids: FrozenSet[str] = frozenset()  # document_id of every indexed chunk
+
+
+EMPTY_SNAPSHOT = IndexSnapshot(0, None, [], {}, None)
+
+
 class RAGPipeline:
-    """RAG pipeline with FAISS vector store and Gemini embeddings"""
+    """RAG pipeline with FAISS vector store and pluggable embeddings"""
     
-    def __init__(self, index_dir: str = "/app/backend/faiss_index"):
+    def __init__(self, index_dir: str = "/app/backend/faiss_index", use_mmap: bool = True,
+                 index_type: Optional[str] = None, embedder: Optional[EmbeddingBackend] = None,
+                 llm: Optional[Callable[[str, str], str]] = None, dedup: Optional[bool] = None):
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(exist_ok=True)
-        self.index = None
-        self.documents = []  # Store document chunks with metadata
-        self.dimension = 768  # Gemini embedding dimension
-        self.index_file = self.index_dir / "faiss_index.bin"
-        self.docs_file = self.index_dir / "documents.pkl"
+        self._snapshot = EMPTY_SNAPSHOT  # Swapped in one assignment when a generation is loaded
+        self._reload_thread = None  # Background refresh in progress, if any
+        self._load_lock = threading.Lock()
+        self._reader_locks = {}  # generation -> open lock file, held while the snapshot uses it
+        self.dedup = DEDUP_ENABLED if dedup is None else dedup
+        # (generation, SimHash LSH table of its vectors), replaced in one assignment
+        self._dedup: Tuple[Optional[int], Optional[SimHashIndex]] = (None, None)
+        self.embedder = embedder or get_embedding_backend()
+        self.dimension = self.embedder.dimension
+        self.llm = llm or gemini_generate  # (model_name, prompt) -> text
+        self.use_mmap = use_mmap  # Memory-map published indexes instead of copying them into RAM
+        self.index_type = (index_type or INDEX_TYPE).lower()  # Compression used for new/re-encoded indexes
+        self.current_file = self.index_dir / CURRENT_FILENAME
+        self.lock_file = self.index_dir / LOCK_FILENAME
         
         # Load existing index if available
         self._load_index()
     
+    @property
+    def index(self):
+        return self._snapshot.index
+    
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        return self._snapshot.documents
+    
+    @property
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        return self._snapshot.manifest
+    
+    @property
+    def generation(self) -> int:
+        """Generation currently loaded by this process"""
+        return self._snapshot.generation
+    
     def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
         """
         Split text into overlapping chunks
@@ -72,7 +389,7 @@ class RAGPipeline:
     
     def generate_embedding(self, text: str) -> Optional[np.ndarray]:
         """
-        Generate embedding for text using Gemini
+        Generate embedding for text using the configured backend
         
         Args:
             text: Input text
@@ -80,20 +397,12 @@ class RAGPipeline:
         Returns:
             Numpy array of embeddings or None on error
         """
-        try:
-            result = genai.embed_content(
-                model="models/embedding-001",
-                content=text,
-                task_type="retrieval_document"
-            )
-            return np.array(result['embedding'], dtype=np.float32)
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return None
+        embeddings = self.embedder.embed_documents([text])
+        return embeddings[0] if embeddings else None
     
     def generate_query_embedding(self, query: str) -> Optional[np.ndarray]:
         """
-        Generate embedding for query using Gemini
+        Generate embedding for query using the configured backend
         
         Args:
             query: Search query
@@ -101,16 +410,29 @@ class RAGPipeline:
         Returns:
             Numpy array of embeddings or None on error
         """
-        try:
-            result = genai.embed_content(
-                model="models/embedding-001",
-                content=query,
-                task_type="retrieval_query"
+        return self.embedder.embed_query(query)
+    
+    def _build_manifest(self) -> Dict[str, Any]:
+        """Describe the embeddings this pipeline writes"""
+        return {"embedding_backend": self.embedder.name, "dimension": self.dimension}
+    
+    def _check_manifest(self, manifest: Optional[Dict[str, Any]]):
+        """
+        Refuse to mix vectors from different embedding spaces
+        
+        Raises:
+            EmbeddingMismatchError: If the index was built with another backend or dimension
+        """
+        if manifest is None:
+            return
+        expected = self._build_manifest()
+        if (manifest.get("embedding_backend") != expected["embedding_backend"]
+                or manifest.get("dimension") != expected["dimension"]):
+            raise EmbeddingMismatchError(
+                f"Index was built with {manifest.get('embedding_backend')} ({manifest.get('dimension')}d) "
+                f"but the pipeline uses {expected['embedding_backend']} ({expected['dimension']}d). "
+                f"Rebuild the index or switch EMBEDDING_BACKEND."
             )
-            return np.array(result['embedding'], dtype=np.float32)
-        except Exception as e:
-            logger.error(f"Error generating query embedding: {e}")
-            return None
     
     def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]):
         """
@@ -123,76 +445,364 @@ class RAGPipeline:
         if not texts:
             return
         
-        # Initialize index if needed
-        if self.index is None:
-            self.index = faiss.IndexFlatL2(self.dimension)
+        signatures = [simhash(text) if self.dedup else None for text in texts]
         
-        # Generate embeddings
-        embeddings = []
-        valid_texts = []
-        valid_metadata = []
+        # Skip embedding chunks that near-duplicate something already indexed or earlier in this batch
+        to_embed = list(range(len(texts)))
+        if self.dedup:
+            self.refresh()
+            snapshot = self._snapshot
+            indexed = self._get_dedup_index(snapshot.generation, snapshot.documents)
+            batch = SimHashIndex()
+            to_embed = []
+            for i, signature in enumerate(signatures):
+                if indexed.find(signature) is not None or batch.find(signature) is not None:
+                    continue
+                batch.add(i, signature)
+                to_embed.append(i)
         
-        for i, text in enumerate(texts):
-            embedding = self.generate_embedding(text)
-            if embedding is not None:
-                embeddings.append(embedding)
-                valid_texts.append(text)
-                valid_metadata.append(metadata[i])
+        # Generate embeddings
+        embeddings = {}
+        if to_embed:
+            for i, embedding in zip(to_embed, self.embedder.embed_documents([texts[i] for i in to_embed])):
+                if embedding is not None:
+                    embeddings[i] = embedding
         
-        if not embeddings:
+        if not embeddings and not self.dedup:
             logger.warning("No valid embeddings generated")
             return
         
-        # Add to FAISS index
-        embeddings_array = np.array(embeddings, dtype=np.float32)
-        self.index.add(embeddings_array)
+        # Only one process may append at a time; start from the latest published
+        # generation so additions made by other workers are never overwritten
+        with self._writer_lock():
+            self.refresh(wait=True)
+            snapshot = self._snapshot
+            if snapshot.index is not None:
+                self._check_manifest(snapshot.manifest)
+            
+            dedup_index = self._get_dedup_index(snapshot.generation, snapshot.documents) if self.dedup else None
+            delta = None
+            if snapshot.index is not None and not self._migration_due(snapshot.index, len(embeddings)):
+                delta = empty_index_like(snapshot.index)
+            
+            if delta is None:
+                # First vectors, a compression migration or an index type without deltas: write it all
+                index, documents, manifest = self._load_writable()
+                index, new_documents, num_vectors, dropped = self._append_chunks(
+                    index, documents, dedup_index, texts, metadata, signatures, embeddings
+                )
+            else:
+                delta, new_documents, num_vectors, dropped = self._append_chunks(
+                    delta, [], dedup_index, texts, metadata, signatures, embeddings,
+                    id_offset=snapshot.index.ntotal, reencode=False
+                )
+            
+            if not new_documents:
+                logger.warning("No valid embeddings generated")
+                return
+            
+            # Save index
+            if delta is None:
+                saved = self._save_index(index, documents, lineage=(manifest or {}).get("lineage"))
+            else:
+                saved = self._publish_append(snapshot, delta, new_documents)
+            # The table already holds the new vectors; after a failed save it is rebuilt
+            self._dedup = (self.generation, dedup_index) if saved else (None, None)
+        
+        if dropped:
+            logger.warning(f"Dropped {dropped} chunks whose embeddings failed")
+        logger.info(
+            f"Added {len(new_documents)} documents to index ({len(new_documents) - num_vectors} near-duplicates linked "
+            f"to existing vectors). Total: {len(self.documents)}"
+        )
+    
+    def has_document(self, document_id: str) -> bool:
+        """Whether chunks of a document are in the latest published generation"""
+        self.refresh(wait=True)
+        return document_id in self._snapshot.document_ids
+    
+    def copy_document(self, source_document_id: str, metadata: Dict[str, Any]) -> int:
+        """
+        Index an identical copy of an already indexed document without re-embedding
+
+        The copy's chunks point at the source document's vectors, so no embedding
+        calls are made and the FAISS index does not grow.
+
+        Args:
+            source_document_id: document_id of the indexed original
+            metadata: Fields overriding the source chunks' metadata (document_id, user_id, filename)
+
+        Returns:
+            Number of chunks indexed (0 if the source has no chunks in the index)
+        """
+        with self._writer_lock():
+            self.refresh(wait=True)
+            snapshot = self._snapshot
+            source = [doc for doc in snapshot.documents if doc["metadata"].get("document_id") == source_document_id]
+            if snapshot.index is None or not source:
+                return 0
+
+            copies = [
+                {**doc, "metadata": {**doc["metadata"], **metadata}}
+                for doc in source
+            ]
+            if not self._publish_append(snapshot, None, copies):
+                return 0
+            generation, dedup_index = self._dedup
+            if generation == snapshot.generation:
+                # No vectors were added, so the SimHash table is still valid
+                self._dedup = (self.generation, dedup_index)
+
+        logger.info(f"Linked {len(source)} chunks of document {source_document_id} to {metadata.get('document_id')}")
+        return len(source)
+
+    def _append_chunks(self, index: Optional[Any], documents: List[Dict[str, Any]], dedup_index: Optional[SimHashIndex],
+                       texts: List[str], metadata: List[Dict[str, Any]], signatures: List[Optional[int]],
+                       embeddings: Dict[int, np.ndarray], id_offset: int = 0,
+                       reencode: bool = True) -> Tuple[Optional[Any], List[Dict[str, Any]], int, int]:
+        """
+        Append chunks to an index and document list, linking near-duplicates to existing vectors
+        
+        Args:
+            index: Index to extend (None to create one)
+            documents: Document list to extend in place
+            dedup_index: SimHash table of the vectors in index, or None to skip linking
+            texts: Chunk texts
+            metadata: Metadata per chunk
+            signatures: SimHash per chunk (None when dedup is off)
+            embeddings: Embedding per chunk position; chunks without one can only be linked
+            id_offset: Vectors preceding index, when index is a delta on top of a published generation
+            reencode: Migrate to the configured compression once there is enough data to train it
+            
+        Returns:
+            Tuple of (index, appended documents, number of new vectors, number of dropped chunks)
+        """
+        base_id = id_offset + (index.ntotal if index is not None else 0)
+        new_vectors = []
+        new_documents = []
+        dropped = 0
         
-        # Store documents with metadata
-        for text, meta in zip(valid_texts, valid_metadata):
-            self.documents.append({
+        for i, (text, meta, signature) in enumerate(zip(texts, metadata, signatures)):
+            vector_id = dedup_index.find(signature) if dedup_index is not None else None
+            if vector_id is None:
+                if i not in embeddings:
+                    dropped += 1
+                    continue
+                vector_id = base_id + len(new_vectors)
+                new_vectors.append(embeddings[i])
+                if dedup_index is not None:
+                    dedup_index.add(vector_id, signature)
+            
+            # Store documents with metadata
+            new_documents.append({
                 "text": text,
-                "metadata": meta
+                "metadata": meta,
+                "vector_id": vector_id,
+                "simhash": signature
             })
         
-        # Save index
-        self._save_index()
-        logger.info(f"Added {len(embeddings)} documents to index. Total: {len(self.documents)}")
+        if new_vectors:
+            embeddings_array = np.array(new_vectors, dtype=np.float32)
+            if index is None:
+                index = self._new_index(embeddings_array)
+            
+            # Add to FAISS index
+            index.add(embeddings_array)
+            
+            # Migrate to the configured compression once there is enough data to train it
+            if (reencode and index_type_of(index) != self.index_type
+                    and index.ntotal >= MIN_TRAINING_VECTORS.get(self.index_type, 0)):
+                index = self._reencode(index, self.index_type)
+        
+        documents.extend(new_documents)
+        return index, new_documents, len(new_vectors), dropped
+    
+    def _get_dedup_index(self, generation: int, documents: List[Dict[str, Any]]) -> SimHashIndex:
+        """Return the SimHash table for a generation, building it on first use"""
+        built_for, dedup_index = self._dedup
+        if dedup_index is None or built_for != generation:
+            dedup_index = SimHashIndex()
+            for position, doc in enumerate(documents):
+                if doc.get("simhash") is not None:
+                    dedup_index.add(doc.get("vector_id", position), doc["simhash"])
+            self._dedup = (generation, dedup_index)
+        return dedup_index
     
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, k: int = 5, query_embedding: Optional[np.ndarray] = None,
+               user_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant documents
         
         Args:
             query: Search query
             k: Number of results to return
+            query_embedding: Precomputed query embedding (generated if omitted)
+            user_id: Caller; only their own chunks are listed as a result's duplicates
             
         Returns:
             List of relevant documents with scores
         """
+        self.refresh()
         if self.index is None or len(self.documents) == 0:
             logger.warning("Index is empty")
             return []
         
         # Generate query embedding
-        query_embedding = self.generate_query_embedding(query)
+        if query_embedding is None:
+            query_embedding = self.generate_query_embedding(query)
         if query_embedding is None:
             return []
         
-        # Search FAISS index
-        query_embedding = query_embedding.reshape(1, -1)
-        distances, indices = self.index.search(query_embedding, min(k, len(self.documents)))
+        return self.search_by_embeddings(query_embedding.reshape(1, -1), k, user_id=user_id)[0]
+    
+    def batch_search(self, queries: List[str], k: int = 5, use_mmr: bool = False,
+                     user_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search many queries with batched embedding and a single FAISS search
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            use_mmr: Over-fetch and re-rank each query's results with MMR
+            user_id: Caller; only their own chunks are listed as a result's duplicates
+            
+        Returns:
+            One result list per query, in input order (empty where embedding failed)
+        """
+        self.refresh()
+        if self.index is None or len(self.documents) == 0 or not queries:
+            return [[] for _ in queries]
+        
+        embeddings = self.embedder.embed_queries(queries)
+        valid = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        results = [[] for _ in queries]
+        if not valid:
+            return results
+        
+        matrix = np.array([embeddings[i] for i in valid], dtype=np.float32)
+        fetch_k = k * 2 if use_mmr else k
+        for i, hits in zip(valid, self.search_by_embeddings(matrix, fetch_k, user_id=user_id)):
+            results[i] = self.mmr_rerank(embeddings[i], hits, k) if use_mmr and len(hits) > k else hits[:k]
+        
+        return results
+    
+    def search_by_embeddings(self, query_embeddings: np.ndarray, k: int = 5,
+                             user_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search the index with a matrix of query embeddings in one FAISS call
+        
+        Args:
+            query_embeddings: Array of shape (num_queries, dimension)
+            k: Number of results per query
+            user_id: Caller; only their own chunks are listed as a result's duplicates
+            
+        Returns:
+            One result list per query row
+        """
+        # A concurrent hot swap replaces the snapshot, never mutates the one we hold
+        snapshot = self._snapshot
+        if snapshot.index is None or len(snapshot.documents) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        self._check_manifest(snapshot.manifest)
+        
+        # Search FAISS index, over-fetching so collapsed duplicates do not shrink the top-k
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        distances, indices = snapshot.index.search(query_embeddings, min(k * 2, snapshot.index.ntotal))
+        
+        return [
+            self._collect_results(row_distances, row_indices, snapshot, k, user_id)
+            for row_distances, row_indices in zip(distances, indices)
+        ]
+    
+    def _collect_results(self, distances: np.ndarray, indices: np.ndarray, snapshot: IndexSnapshot,
+                         k: int, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Map one row of FAISS hits to documents, collapsing near-duplicates
+        
+        Chunks of every user can share a vector, so a result only lists the
+        caller's own linked chunks in duplicates; duplicate_count counts them all.
+        """
+        documents = snapshot.documents
+        
+        def owned(metadata: Dict[str, Any]) -> bool:
+            return user_id is not None and metadata.get('user_id') == user_id
         
-        # Retrieve documents
         results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.documents):
-                doc = self.documents[idx].copy()
-                doc['score'] = float(1 / (1 + dist))  # Convert distance to similarity score
-                doc['distance'] = float(dist)
-                results.append(doc)
+        for dist, idx in zip(distances, indices):
+            positions = snapshot.vector_docs.get(int(idx))
+            if not positions:
+                continue
+            
+            # Prefer the caller's own copy of a shared chunk
+            primary = next((p for p in positions if owned(documents[p]['metadata'])), positions[0])
+            doc = documents[primary].copy()
+            doc['score'] = float(1 / (1 + dist))  # Convert distance to similarity score
+            doc['distance'] = float(dist)
+            doc['generation'] = snapshot.generation  # vector_id is only meaningful within this generation
+            # Other chunks linked to the same vector (e.g. the same clause in a revised upload)
+            linked = [documents[p]['metadata'] for p in positions if p != primary]
+            doc['duplicates'] = [metadata for metadata in linked if owned(metadata)]
+            doc['duplicate_count'] = len(linked)
+            
+            # Collapse hits that are near-duplicates of a better-ranked hit
+            signature = doc.get('simhash')
+            kept = None
+            if signature is not None:
+                kept = next((
+                    r for r in results
+                    if r.get('simhash') is not None and hamming_distance(r['simhash'], signature) <= DEDUP_MAX_DISTANCE
+                ), None)
+            if kept is not None:
+                kept['duplicates'].extend(([doc['metadata']] if owned(doc['metadata']) else []) + doc['duplicates'])
+                kept['duplicate_count'] += 1 + doc['duplicate_count']
+                continue
+            
+            results.append(doc)
+            if len(results) == k:
+                break
         
         return results
     
+    def mmr_rerank(self, query_embedding: np.ndarray, results: List[Dict[str, Any]], top_k: int = 3,
+                   lambda_mult: float = MMR_LAMBDA) -> List[Dict[str, Any]]:
+        """
+        Re-rank results locally with maximal marginal relevance
+        
+        Uses the vectors stored in the index, so no LLM or embedding calls are made.
+        
+        Args:
+            query_embedding: Embedding of the query
+            results: Initial search results
+            top_k: Number of top results to return
+            lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+            
+        Returns:
+            Re-ranked results
+        """
+        if not results:
+            return []
+        
+        snapshot = self._snapshot
+        if any(r.get('generation', snapshot.generation) != snapshot.generation for r in results):
+            # The index was swapped since the search ran, so the vector ids may point elsewhere
+            logger.info("Index generation changed during query, skipping MMR re-ranking")
+            return results[:top_k]
+        
+        try:
+            vector_ids = np.array([r.get('vector_id', -1) for r in results], dtype=np.int64)
+            vectors = snapshot.index.reconstruct_batch(vector_ids)
+            order, scores = mmr_select(query_embedding, vectors, top_k, lambda_mult)
+        except Exception as e:
+            logger.error(f"Error in MMR re-ranking: {e}")
+            return results[:top_k]
+        
+        reranked = []
+        for position, score in zip(order, scores):
+            result = results[position]
+            result['mmr_score'] = score
+            reranked.append(result)
+        return reranked
+    
     def rerank_results(self, query: str, results: List[Dict[str, Any]], top_k: int = 3) -> List[Dict[str, Any]]:
         """
         Re-rank results using Gemini for better relevance
@@ -209,9 +819,6 @@ class RAGPipeline:
             return []
         
         try:
-            # Use Gemini to score relevance
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
             scored_results = []
             for result in results:
                 prompt = f"""On a scale of 0-10, rate how relevant this text is to the query.
@@ -224,8 +831,8 @@ Text: {result['text'][:500]}
 Relevance score (0-10):"""
                 
                 try:
-                    response = model.generate_content(prompt)
-                    score_text = response.text.strip()
+                    # Use Gemini to score relevance
+                    score_text = self.llm(RERANK_MODEL, prompt).strip()
                     # Extract number from response
                     score = float(''.join(c for c in score_text if c.isdigit() or c == '.'))
                     score = min(max(score, 0), 10)  # Clamp between 0-10
@@ -245,7 +852,8 @@ Relevance score (0-10):"""
             # Fallback to original ranking
             return results[:top_k]
     
-    def query(self, query: str, top_k: int = 3, use_rerank: bool = True) -> Tuple[List[Dict[str, Any]], str]:
+    def query(self, query: str, top_k: int = 3, use_rerank: bool = True,
+              rerank_method: str = "llm", user_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str]:
         """
         Query the RAG pipeline and generate grounded response
         
@@ -253,105 +861,780 @@ Relevance score (0-10):"""
             query: User query
             top_k: Number of top results
             use_rerank: Whether to use re-ranking
+            rerank_method: "llm" for Gemini relevance scoring, "mmr" for local diversity re-ranking
+            user_id: Caller; only their own chunks are listed as a result's duplicates
             
         Returns:
             Tuple of (retrieved documents, generated response)
         """
+        # MMR needs the query vector, so embed once and reuse it for the search
+        query_embedding = None
+        if use_rerank and rerank_method == "mmr":
+            query_embedding = self.generate_query_embedding(query)
+        
         # Search for relevant documents
-        results = self.search(query, k=top_k * 2)
+        results = self.search(query, k=top_k * 2, query_embedding=query_embedding, user_id=user_id)
         
         if not results:
-            return [], "I don't have enough information in my knowledge base to answer this question accurately. Please try uploading relevant legal documents first."
+            return [], NO_RESULTS_ANSWER
         
         # Re-rank if requested
         if use_rerank and len(results) > top_k:
-            results = self.rerank_results(query, results, top_k)
+            if rerank_method == "mmr":
+                results = self.mmr_rerank(query_embedding, results, top_k)
+            else:
+                results = self.rerank_results(query, results, top_k)
         else:
             results = results[:top_k]
         
-        # Generate response with retrieved context
-        context = "\n\n".join([
+        return results, self.generate_answer(query, results)
+    
+    def generate_answer(self, query: str, results: List[Dict[str, Any]]) -> str:
+        """
+        Generate a grounded answer from retrieved documents
+        
+        Args:
+            query: User query
+            results: Retrieved documents used as context
+            
+        Returns:
+            Generated response text
+        """
+        if not results:
+            return NO_RESULTS_ANSWER
+        
+        # Generate response with retrieved context, packing chunks in rank order up to the budget
+        sections = [
             f"Document {i+1} (from {doc['metadata'].get('filename', 'Unknown')}):\n{doc['text']}"
             for i, doc in enumerate(results)
-        ])
+        ]
+        budget = remaining_budget(ANSWER_MODEL, ANSWER_PROMPT_TEMPLATE, query)
+        context = "\n\n".join(section for section in pack(sections, budget) if section is not None)
         
         try:
-            model = genai.GenerativeModel('gemini-2.5-pro')
-            prompt = f"""You are Pleader AI, an expert legal assistant specializing EXCLUSIVELY in Indian law.
-
-Context from documents:
-{context}
-
-Question: {query}
-
-STRICT INSTRUCTIONS:
-- Answer ONLY based on the provided context from uploaded documents
-- You must ONLY discuss Indian legal framework, acts, sections, and precedents
-- Do NOT reference laws from other jurisdictions (US, UK, etc.) unless explicitly comparing to Indian law
-- Cite specific document names, section numbers, article numbers, or case references when making claims
-- Format your response with clear headings, bullet points, and structured sections
-- If the context doesn't contain sufficient information, clearly state: "Based on the uploaded documents, I don't have enough information to answer this fully."
-- Include relevant Indian legal references: Acts, Articles of Constitution, IPC sections, case law citations
-- Be professional, precise, and grounded strictly in Indian legal context
-
-Answer (with citations):"""
-            
-            response = model.generate_content(prompt)
-            answer = response.text
+            prompt = ANSWER_PROMPT_TEMPLATE.format(context=context, query=query)
             
-            return results, answer
+            return self.llm(ANSWER_MODEL, prompt)
             
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            return results, f"I found relevant information but encountered an error generating the response: {str(e)}"
+            return f"I found relevant information but encountered an error generating the response: {str(e)}"
+    
+    def _new_index(self, training_vectors: np.ndarray):
+        """
+        Create an empty index using the configured compression
+        
+        Falls back to a flat index until enough vectors exist to train the quantizer;
+        add_documents re-encodes it once the corpus is large enough.
+        """
+        index_type = self.index_type
+        if len(training_vectors) < MIN_TRAINING_VECTORS.get(index_type, 0):
+            logger.info(f"Not enough vectors to train {index_type} index yet, starting with flat")
+            index_type = "flat"
+        return build_index(index_type, self.dimension, training_vectors)
+    
+    def _reencode(self, index, index_type: str):
+        """
+        Rebuild an index with a different compression type
+        
+        Args:
+            index: Source FAISS index
+            index_type: Target compression type
+            
+        Returns:
+            New FAISS index holding the same vectors in the same order
+        """
+        source_type = index_type_of(index)
+        if source_type != "flat":
+            logger.warning(f"Re-encoding from lossy {source_type} index; vectors carry its quantization error")
+        
+        vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.empty((0, self.dimension), dtype=np.float32)
+        new_index = build_index(index_type, self.dimension, vectors)
+        if len(vectors):
+            new_index.add(vectors)
+        
+        logger.info(f"Re-encoded {index.ntotal} vectors from {source_type} to {index_type}")
+        return new_index
+    
+    def reencode(self, index_type: str):
+        """
+        Migrate the published index to another compression type
+        
+        Args:
+            index_type: Target compression type (flat, fp16, sq8, pq)
+        """
+        index_type = index_type.lower()
+        with self._writer_lock():
+            index, documents, manifest = self._load_writable()
+            if index is None:
+                logger.warning("Index is empty, nothing to re-encode")
+                return
+            self._check_manifest(manifest)
+            
+            required = MIN_TRAINING_VECTORS.get(index_type, 0)
+            if index.ntotal < required:
+                raise ValueError(f"{index_type} needs at least {required} vectors to train, index has {index.ntotal}")
+            
+            self._save_index(self._reencode(index, index_type), documents, lineage=manifest.get("lineage"))
+        self.index_type = index_type
+    
+    @contextmanager
+    def _writer_lock(self):
+        """Hold the cross-process writer lock for the index directory"""
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+    
+    def _generation_dir(self, generation: int) -> Path:
+        """Directory holding the files of a published generation"""
+        return self.index_dir / f"{GENERATION_PREFIX}{generation:06d}"
+    
+    def _current_generation(self) -> int:
+        """Read the generation number published in CURRENT (0 if none)"""
+        try:
+            return int(self.current_file.read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
+    
+    def _read_manifest(self, generation: int) -> Optional[Dict[str, Any]]:
+        """Manifest of a single generation directory, or None if it has none"""
+        base_dir = self._generation_dir(generation) if generation else self.index_dir
+        try:
+            return json.loads((base_dir / MANIFEST_FILENAME).read_text())
+        except (OSError, ValueError):
+            return None
+    
+    def _generation_chain(self, generation: int) -> List[int]:
+        """The full generation a generation is built on, followed by its deltas up to generation"""
+        chain = [generation]
+        while True:
+            parent = (self._read_manifest(chain[-1]) or {}).get("parent")
+            if parent is None:
+                return chain[::-1]
+            chain.append(parent)
+    
+    def _read_part(self, generation: int, use_mmap: bool) -> Tuple[Optional[Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Read the files of one generation directory (or the legacy flat layout for generation 0)
+        
+        For a delta generation this is only the vectors and documents it appended.
+        
+        Args:
+            generation: Generation number to read
+            use_mmap: Memory-map the vectors instead of copying them into RAM
+            
+        Returns:
+            Tuple of (FAISS index or None, document list, manifest or None)
+        """
+        base_dir = self._generation_dir(generation) if generation else self.index_dir
+        index_file = base_dir / INDEX_FILENAME
+        docs_file = base_dir / DOCS_FILENAME
+        
+        if not docs_file.exists():
+            return None, [], None
+        
+        manifest = self._read_manifest(generation)
+        if manifest is None and index_file.exists():
+            manifest = LEGACY_MANIFEST
+        
+        index = None
+        if index_file.exists():
+            index = faiss.read_index(str(index_file), self._mmap_flags(manifest) if use_mmap else 0)
+        
+        with open(docs_file, 'rb') as f:
+            documents = pickle.load(f)
+        
+        return index, documents, manifest
+    
+    def _read_generation(self, generation: int, use_mmap: bool) -> Tuple[Optional[Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Read a generation and every generation in its delta chain
+        
+        Args:
+            generation: Generation number to read
+            use_mmap: Memory-map the vectors instead of copying them into RAM
+            
+        Returns:
+            Tuple of (FAISS index or LayeredIndex or None, document list, manifest or None)
+        """
+        parts, documents, manifest = [], [], None
+        for part_generation in self._generation_chain(generation):
+            index, part_documents, manifest = self._read_part(part_generation, use_mmap)
+            if index is not None:
+                parts.append(index)
+            documents.extend(part_documents)
+        return combine_parts(parts), documents, manifest
+    
+    @staticmethod
+    def _mmap_flags(manifest: Optional[Dict[str, Any]]) -> int:
+        """FAISS read flags that share the index's vectors between processes through the page cache"""
+        # Legacy indexes predate compression and are always flat
+        index_type = (manifest or {}).get("index_type", "flat")
+        if index_type in FLAT_CODES_INDEX_TYPES:
+            return faiss.IO_FLAG_MMAP_IFC
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    
+    def _load_writable(self) -> Tuple[Optional[Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Load a private, appendable copy of the latest generation (writer lock must be held)"""
+        index, documents, manifest = self._read_generation(self._current_generation(), use_mmap=False)
+        if isinstance(index, LayeredIndex):
+            index = index.merge()
+        return index, documents, manifest
     
-    def _save_index(self):
-        """Save FAISS index and documents to disk"""
+    def _migration_due(self, index, new_vectors: int) -> bool:
+        """Whether appending new_vectors moves the index to the configured compression"""
+        return (index_type_of(index) != self.index_type
+                and index.ntotal + new_vectors >= MIN_TRAINING_VECTORS.get(self.index_type, 0))
+    
+    def _compaction_due(self, snapshot: IndexSnapshot, new_vectors: int) -> bool:
+        """Whether the next append should fold the delta chain into a full generation"""
+        # The chain is the base generation followed by its deltas; this append would add one more
+        deltas = len(snapshot.chain) - 1
+        if deltas >= MAX_DELTAS:
+            return True
+        index = snapshot.index
+        base = index.parts[0].ntotal if isinstance(index, LayeredIndex) else index.ntotal
+        return index.ntotal + new_vectors - base > base * DELTA_COMPACT_RATIO
+    
+    def _publish_append(self, snapshot: IndexSnapshot, delta: Optional[Any],
+                        new_documents: List[Dict[str, Any]]) -> bool:
+        """
+        Publish chunks appended to the live generation (writer lock must be held)
+        
+        Usually written as a delta generation holding only the new vectors and
+        documents; when compaction is due the whole chain is rewritten instead.
+        
+        Args:
+            snapshot: The live generation the chunks were appended to
+            delta: Index of the new vectors (ids continue from snapshot.index), or None
+            new_documents: Appended documents
+        
+        Returns:
+            True if the generation was published
+        """
+        lineage = (snapshot.manifest or {}).get("lineage")
+        if delta is not None and not delta.ntotal:
+            delta = None
+        if not self._compaction_due(snapshot, delta.ntotal if delta is not None else 0):
+            return self._save_index(delta, new_documents, lineage=lineage, parent=snapshot)
+        
+        index, documents, _ = self._load_writable()
+        if delta is not None:
+            index.merge_from(delta)
+        documents.extend(new_documents)
+        return self._save_index(index, documents, lineage=lineage)
+    
+    def compact(self) -> bool:
+        """
+        Fold the delta generations on top of the live index into a full generation
+        
+        Returns:
+            True if a compacted generation was published
+        """
+        with self._writer_lock():
+            self.refresh(wait=True)
+            generation = self.generation
+            if len(self._snapshot.chain) <= 1:
+                return False
+            index, documents, manifest = self._load_writable()
+            if not self._save_index(index, documents, lineage=(manifest or {}).get("lineage")):
+                return False
+            dedup_generation, dedup_index = self._dedup
+            if dedup_generation == generation:
+                # Same vectors and documents, so the SimHash table is still valid
+                self._dedup = (self.generation, dedup_index)
+        return True
+    
+    def refresh(self, wait: bool = False):
+        """
+        Hot-reload the index if another process published a newer generation
+        
+        Once an index is loaded the new generation is read in a background thread,
+        so searches keep using the old snapshot until the swap instead of stalling.
+        
+        Args:
+            wait: Load synchronously, e.g. when the caller needs the latest data
+        """
+        if self._current_generation() == self.generation:
+            return
+        if wait or self._snapshot.index is None:
+            self._load_index()
+            return
+        if self._reload_thread is None or not self._reload_thread.is_alive():
+            self._reload_thread = threading.Thread(target=self._load_index, name="rag-index-reload", daemon=True)
+            self._reload_thread.start()
+    
+    def _generation_numbers(self) -> List[int]:
+        """Generation numbers present on disk, oldest first"""
+        generations = []
+        for path in self.index_dir.glob(f"{GENERATION_PREFIX}*"):
+            try:
+                generations.append(int(path.name[len(GENERATION_PREFIX):]))
+            except ValueError:
+                continue
+        return sorted(generations)
+    
+    def _save_index(self, index: Optional[Any], documents: List[Dict[str, Any]],
+                    lineage: Optional[str] = None, parent: Optional[IndexSnapshot] = None) -> bool:
+        """
+        Publish index and documents as a new generation (writer lock must be held)
+        
+        Files are written to a temporary directory which is renamed into place,
+        then CURRENT is replaced atomically so readers never see a partial write.
+        
+        Args:
+            index: FAISS index to publish (None for an empty index)
+            documents: Documents for the index
+            lineage: Lineage id of the generation being extended; None starts a new
+                lineage (a rebuild), after which document positions are no longer comparable
+            parent: Publish a delta on top of this live generation; index and documents
+                then hold only what was appended to it
+        
+        Returns:
+            True if the generation was published
+        """
         try:
-            if self.index is not None:
-                faiss.write_index(self.index, str(self.index_file))
+            # Rolled-back generations stay on disk, so number past everything that exists
+            generation = max(self._generation_numbers() + [self._current_generation()]) + 1
+            gen_dir = self._generation_dir(generation)
+            tmp_dir = self.index_dir / f".{gen_dir.name}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir()
+            
+            if index is not None:
+                faiss.write_index(index, str(tmp_dir / INDEX_FILENAME))
+            
+            with open(tmp_dir / DOCS_FILENAME, 'wb') as f:
+                pickle.dump(documents, f)
+            
+            if parent is not None:
+                manifest = {
+                    **self._build_manifest(),
+                    "index_type": index_type_of(parent.index),
+                    "num_vectors": parent.index.ntotal + (index.ntotal if index is not None else 0),
+                    "num_documents": len(parent.documents) + len(documents),
+                    "lineage": lineage,
+                    "parent": parent.generation,
+                }
+                (tmp_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest))
+            elif index is not None:
+                manifest = {
+                    **self._build_manifest(),
+                    "index_type": index_type_of(index),
+                    "num_vectors": index.ntotal,
+                    "num_documents": len(documents),
+                    "lineage": lineage or uuid.uuid4().hex,
+                }
+                (tmp_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest))
             
-            with open(self.docs_file, 'wb') as f:
-                pickle.dump(self.documents, f)
+            os.replace(tmp_dir, gen_dir)
+            self._publish_generation(generation)
             
-            logger.info(f"Index saved with {len(self.documents)} documents")
+            kind = f"as a delta of generation {parent.generation}" if parent is not None else "in full"
+            logger.info(f"Index generation {generation} published {kind} with {len(documents)} documents")
+            
+            self._load_index()
+            self._prune_generations(generation)
+            return True
         except Exception as e:
             logger.error(f"Error saving index: {e}")
+            return False
+    
+    def _publish_generation(self, generation: int):
+        """Atomically point CURRENT at a generation (writer lock must be held)"""
+        tmp_current = self.index_dir / f".{CURRENT_FILENAME}.tmp"
+        with open(tmp_current, 'w') as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_current, self.current_file)
+    
+    def _prune_generations(self, current: int):
+        """Delete generations outside the rollback window that no process has loaded"""
+        generations = self._generation_numbers()
+        keep = set()
+        for generation in generations[-GENERATIONS_TO_KEEP:] + [current]:
+            # A retained delta is only usable with the generations it is built on
+            keep.update(self._generation_chain(generation))
+        for generation in generations:
+            if generation in keep:
+                continue
+            path = self._generation_dir(generation)
+            try:
+                lock = open(path / READER_LOCK_FILENAME, 'a')
+            except FileNotFoundError:
+                continue
+            with lock:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Still loaded by a reader; tried again on the next publish
+                shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Garbage-collected index generation {generation}")
+    
+    def _lock_generations(self, chain: Tuple[int, ...]):
+        """Take a shared reader lock on each generation of a chain so it is not pruned while loaded"""
+        for generation in chain:
+            if generation and generation not in self._reader_locks:
+                lock = open(self._generation_dir(generation) / READER_LOCK_FILENAME, 'a')
+                fcntl.flock(lock.fileno(), fcntl.LOCK_SH)
+                self._reader_locks[generation] = lock
+    
+    def _release_generations(self, chain: Tuple[int, ...]):
+        """Drop the reader locks of generations outside chain"""
+        for generation in list(self._reader_locks):
+            if generation not in chain:
+                self._reader_locks.pop(generation).close()
     
     def _load_index(self):
-        """Load FAISS index and documents from disk"""
-        try:
-            if self.index_file.exists() and self.docs_file.exists():
-                self.index = faiss.read_index(str(self.index_file))
+        """
+        Load the current index generation and documents from disk
+        
+        When the new generation extends the loaded one with deltas, only the deltas are read.
+        """
+        with self._load_lock:
+            generation = self._current_generation()
+            previous = self._snapshot
+            try:
+                chain = tuple(self._generation_chain(generation))
+                self._lock_generations(chain)
                 
-                with open(self.docs_file, 'rb') as f:
-                    self.documents = pickle.load(f)
+                # Never mutate the previous snapshot's structures; searches may still hold it
+                loaded = len(previous.chain) if previous.chain and chain[:len(previous.chain)] == previous.chain else 0
+                parts, documents, vector_docs, document_ids, manifest = [], [], {}, set(), None
+                if loaded:
+                    index = previous.index
+                    parts = list(index.parts) if isinstance(index, LayeredIndex) else [index] if index is not None else []
+                    documents, vector_docs, manifest = list(previous.documents), dict(previous.vector_docs), previous.manifest
+                    document_ids = set(previous.document_ids)
                 
-                logger.info(f"Loaded index with {len(self.documents)} documents")
-        except Exception as e:
-            logger.warning(f"Could not load existing index: {e}")
-            self.index = None
-            self.documents = []
+                for part_generation in chain[loaded:]:
+                    index, part_documents, manifest = self._read_part(part_generation, self.use_mmap)
+                    if index is not None:
+                        parts.append(index)
+                    for position, doc in enumerate(part_documents, len(documents)):
+                        vector_id = doc.get("vector_id", position)
+                        vector_docs[vector_id] = vector_docs.get(vector_id, []) + [position]
+                        document_ids.add(doc["metadata"].get("document_id"))
+                    documents.extend(part_documents)
+                document_ids.discard(None)
+                
+                self._snapshot = IndexSnapshot(generation, combine_parts(parts), documents, vector_docs, manifest,
+                                               chain, frozenset(document_ids))
+                self._release_generations(chain)
+                
+                if documents:
+                    logger.info(f"Loaded index generation {generation} with {len(documents)} documents "
+                                f"({len(chain) - loaded} of {len(chain)} parts read)")
+            except Exception as e:
+                # Keep the locks of whatever is still loaded
+                self._release_generations(previous.chain)
+                if not previous.chain:
+                    logger.warning(f"Could not load existing index: {e}")
+                    self._snapshot = EMPTY_SNAPSHOT._replace(generation=generation)
+                else:
+                    # Keep serving the loaded generation; its older number makes the next refresh() retry
+                    logger.error(f"Could not load index generation {generation}, "
+                                 f"still serving generation {previous.generation}: {e}")
     
     def clear_index(self):
         """Clear the entire index"""
-        self.index = None
-        self.documents = []
-        
-        if self.index_file.exists():
-            self.index_file.unlink()
-        if self.docs_file.exists():
-            self.docs_file.unlink()
+        with self._writer_lock():
+            self._save_index(None, [])
         
         logger.info("Index cleared")
     
+    def new_builder(self) -> "IndexBuilder":
+        """Start building a replacement index without touching the live one"""
+        return IndexBuilder(self)
+    
+    def rebuild(self, texts: List[str], metadata: List[Dict[str, Any]]) -> int:
+        """
+        Replace the index with one built from scratch, with no search downtime
+        
+        Args:
+            texts: List of text chunks
+            metadata: List of metadata dicts for each chunk
+            
+        Returns:
+            The published generation number
+        """
+        builder = self.new_builder()
+        builder.add_documents(texts, metadata)
+        return builder.publish()
+    
+    def list_generations(self) -> List[Dict[str, Any]]:
+        """Describe the generations on disk, newest first"""
+        current = self._current_generation()
+        generations = []
+        for generation in reversed(self._generation_numbers()):
+            gen_dir = self._generation_dir(generation)
+            manifest_file = gen_dir / MANIFEST_FILENAME
+            try:
+                manifest = json.loads(manifest_file.read_text()) if manifest_file.exists() else {}
+                modified = gen_dir.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            generations.append({
+                "generation": generation,
+                "current": generation == current,
+                "index_type": manifest.get("index_type"),
+                "num_vectors": manifest.get("num_vectors", 0),
+                "num_documents": manifest.get("num_documents"),
+                "embedding_backend": manifest.get("embedding_backend"),
+                "parent": manifest.get("parent"),  # Set for delta generations
+                "modified_at": modified,
+            })
+        return generations
+    
+    def rollback(self, generation: int):
+        """
+        Make an older (or newer) retained generation live again
+        
+        Args:
+            generation: Generation number to publish
+        """
+        with self._writer_lock():
+            if not (self._generation_dir(generation) / DOCS_FILENAME).exists():
+                raise ValueError(f"Index generation {generation} is not available")
+            # Read it once so a corrupt generation is never published
+            self._read_generation(generation, use_mmap=True)
+            self._publish_generation(generation)
+            self._load_index()
+        
+        logger.info(f"Rolled back index to generation {generation}")
+    
+    def _generation_bytes(self, generation: int) -> int:
+        """Disk space used by the files of one generation directory"""
+        if generation:
+            files = self._generation_dir(generation).iterdir()
+        else:
+            files = (self.index_dir / name for name in (INDEX_FILENAME, DOCS_FILENAME, MANIFEST_FILENAME))
+        total = 0
+        for path in files:
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                continue
+        return total
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics"""
+        self.refresh(wait=True)
+        snapshot = self._snapshot
+        index = snapshot.index
         return {
-            "total_documents": len(self.documents),
-            "index_initialized": self.index is not None,
-            "index_size": self.index.ntotal if self.index else 0
+            "total_documents": len(snapshot.documents),
+            "duplicate_chunks": len(snapshot.documents) - (index.ntotal if index else 0),
+            "index_initialized": index is not None,
+            "index_size": index.ntotal if index else 0,
+            "index_type": index_type_of(index) if index else self.index_type,
+            "bytes_per_vector": index.sa_code_size() if index else 0,
+            "generation": snapshot.generation,
+            "delta_generations": max(len(snapshot.chain) - 1, 0),
+            "disk_bytes": sum(self._generation_bytes(generation) for generation in snapshot.chain),
+            "embedding_backend": (snapshot.manifest or {}).get("embedding_backend", self.embedder.name),
+            "dimension": (snapshot.manifest or {}).get("dimension", self.dimension),
+            "memory_mapped": self.use_mmap
+        }
+
+
+class IndexBuilder:
+    """
+    Builds a replacement index generation off to the side
+    
+    The live generation keeps serving searches while the builder embeds, and
+    publish() switches readers over with an atomic pointer swap. Chunks appended
+    to the live index after the build started are carried over on publish.
+    """
+    
+    def __init__(self, pipeline: RAGPipeline):
+        self.pipeline = pipeline
+        self.index = None
+        self.documents: List[Dict[str, Any]] = []
+        self.dedup_index = SimHashIndex() if pipeline.dedup else None
+        
+        # Documents only ever grow within a lineage, so the base count marks where catch-up starts
+        with pipeline._writer_lock():
+            _, documents, manifest = pipeline._load_writable()
+        self.base_lineage = (manifest or {}).get("lineage")
+        self.base_count = len(documents)
+    
+    def needs_embedding(self, texts: List[str]) -> List[int]:
+        """
+        Positions of the chunks that are not near-duplicates of chunks already in the build
+        
+        Args:
+            texts: List of text chunks
+            
+        Returns:
+            Positions in texts worth sending to the embedder
+        """
+        if self.dedup_index is None:
+            return list(range(len(texts)))
+        
+        batch = SimHashIndex()
+        to_embed = []
+        for i, text in enumerate(texts):
+            signature = simhash(text)
+            if self.dedup_index.find(signature) is not None or batch.find(signature) is not None:
+                continue
+            batch.add(i, signature)
+            to_embed.append(i)
+        return to_embed
+    
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]],
+                      embeddings: Optional[Dict[int, np.ndarray]] = None) -> int:
+        """
+        Embed chunks into the new index
+        
+        Args:
+            texts: List of text chunks
+            metadata: List of metadata dicts for each chunk
+            embeddings: Precomputed embeddings by chunk position, e.g. for the
+                positions from needs_embedding computed in parallel
+            
+        Returns:
+            Number of chunks added
+        """
+        if not texts:
+            return 0
+        
+        if embeddings is None:
+            to_embed = self.needs_embedding(texts)
+            embeddings = {}
+            if to_embed:
+                vectors = self.pipeline.embedder.embed_documents([texts[i] for i in to_embed])
+                embeddings = {i: vector for i, vector in zip(to_embed, vectors) if vector is not None}
+        
+        signatures = [simhash(text) if self.dedup_index is not None else None for text in texts]
+        self.index, new_documents, _, dropped = self.pipeline._append_chunks(
+            self.index, self.documents, self.dedup_index, texts, metadata, signatures, embeddings
+        )
+        if dropped:
+            logger.warning(f"Dropped {dropped} chunks whose embeddings failed")
+        return len(new_documents)
+    
+    def _catch_up(self, index: Optional[Any], manifest: Optional[Dict[str, Any]], documents: List[Dict[str, Any]]):
+        """Copy chunks appended to the live index during the build into the new one"""
+        # Documents the build already covers are taken from the build, not duplicated
+        rebuilt = {doc["metadata"].get("document_id") for doc in self.documents} - {None}
+        positions = [
+            position for position in range(self.base_count, len(documents))
+            if documents[position]["metadata"].get("document_id") not in rebuilt
+        ]
+        if not positions:
+            return
+        appended = [documents[position] for position in positions]
+        
+        texts = [doc["text"] for doc in appended]
+        metadata = [doc["metadata"] for doc in appended]
+        signatures = [
+            (doc.get("simhash") or simhash(doc["text"])) if self.dedup_index is not None else None
+            for doc in appended
+        ]
+        
+        expected = self.pipeline._build_manifest()
+        if index is not None and all(manifest.get(key) == value for key, value in expected.items()):
+            # Same embedding space: reuse the stored vectors instead of calling the embedder
+            vector_ids = np.array(
+                [doc.get("vector_id", position) for position, doc in zip(positions, appended)], dtype=np.int64
+            )
+            embeddings = dict(enumerate(index.reconstruct_batch(vector_ids)))
+        else:
+            vectors = self.pipeline.embedder.embed_documents(texts)
+            embeddings = {i: vector for i, vector in enumerate(vectors) if vector is not None}
+        
+        self.index, _, _, _ = self.pipeline._append_chunks(
+            self.index, self.documents, self.dedup_index, texts, metadata, signatures, embeddings
+        )
+        logger.info(f"Carried over {len(appended)} chunks added during the rebuild")
+    
+    def save_checkpoint(self, path: Path, state: Dict[str, Any]):
+        """
+        Persist the partial build so an interrupted rebuild can resume
+        
+        Args:
+            path: Checkpoint directory (replaced atomically)
+            state: JSON-serializable progress of the caller, returned by from_checkpoint
+        """
+        path = Path(path)
+        tmp_dir = path.with_name(f".{path.name}.tmp")
+        old_dir = path.with_name(f".{path.name}.old")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        
+        if self.index is not None:
+            faiss.write_index(self.index, str(tmp_dir / INDEX_FILENAME))
+        with open(tmp_dir / DOCS_FILENAME, 'wb') as f:
+            pickle.dump(self.documents, f)
+        checkpoint = {
+            "manifest": self.pipeline._build_manifest(),
+            "base_lineage": self.base_lineage,
+            "base_count": self.base_count,
+            "state": state,
         }
+        (tmp_dir / CHECKPOINT_FILENAME).write_text(json.dumps(checkpoint))
+        
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old_dir)
+        os.replace(tmp_dir, path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    
+    @classmethod
+    def from_checkpoint(cls, pipeline: RAGPipeline, path: Path) -> Tuple["IndexBuilder", Dict[str, Any]]:
+        """
+        Resume a build saved with save_checkpoint
+        
+        Returns:
+            Tuple of (builder, caller state)
+            
+        Raises:
+            EmbeddingMismatchError: If the checkpoint was built with another embedding backend
+        """
+        path = Path(path)
+        checkpoint = json.loads((path / CHECKPOINT_FILENAME).read_text())
+        pipeline._check_manifest(checkpoint["manifest"])
+        
+        builder = cls(pipeline)
+        builder.base_lineage = checkpoint["base_lineage"]
+        builder.base_count = checkpoint["base_count"]
+        if (path / INDEX_FILENAME).exists():
+            builder.index = faiss.read_index(str(path / INDEX_FILENAME))
+        with open(path / DOCS_FILENAME, 'rb') as f:
+            builder.documents = pickle.load(f)
+        if builder.dedup_index is not None:
+            for position, doc in enumerate(builder.documents):
+                if doc.get("simhash") is not None:
+                    builder.dedup_index.add(doc.get("vector_id", position), doc["simhash"])
+        
+        return builder, checkpoint["state"]
+    
+    def publish(self) -> int:
+        """
+        Publish the new index as the live generation
+        
+        Returns:
+            The published generation number
+        """
+        pipeline = self.pipeline
+        with pipeline._writer_lock():
+            index, documents, manifest = pipeline._load_writable()
+            if self.base_count and (manifest or {}).get("lineage") != self.base_lineage:
+                raise RuntimeError("The index was rebuilt or cleared while building; start the build again")
+            
+            if len(documents) > self.base_count:
+                self._catch_up(index, manifest, documents)
+            
+            if not pipeline._save_index(self.index, self.documents):
+                raise RuntimeError("Could not publish the rebuilt index")
+        
+        logger.info(f"Rebuilt index published as generation {pipeline.generation} with {len(self.documents)} documents")
+        return pipeline.generation
 
 
 # Global RAG pipeline instance
@@ -361,5 +1644,7 @@ def get_rag_pipeline() -> RAGPipeline:
     """Get or create global RAG pipeline instance"""
     global _rag_pipeline
     if _rag_pipeline is None:
-        _rag_pipeline = RAGPipeline()
+        _rag_pipeline = RAGPipeline(
+            index_dir=os.environ.get('RAG_INDEX_DIR', "/app/backend/faiss_index")
+        )
     return _rag_pipeline
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, UploadFile, File, Form, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
@@ -8,7 +8,7 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, BinaryIO, Set
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
@@ -17,14 +17,31 @@ import google.generativeai as genai
 import json
 import base64
 import io
+import asyncio
+import re
+import tempfile
+from collections import deque
+from functools import partial
 
 # Import our utility modules
-from rag_utils import get_rag_pipeline
-from document_utils import extract_text_from_file, validate_file_type
+from rag_utils import get_rag_pipeline, EmbeddingMismatchError
+from document_utils import extract_file, validate_file_type, ExtractionResult, FileSource
+from ocr_utils import OCRQueueFull, get_ocr_stats
+from upload_utils import (
+    MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, RequestSizeLimitMiddleware, detach_upload, hash_upload, validate_upload
+)
+from ingestion_utils import IngestionQueue, JobFailed, TERMINAL_STATUSES
+from storage_utils import TEXT_COLLECTION, build_text_record, read_analysis_record, read_text_record
+from prompt_utils import pack, remaining_budget
+from analysis_utils import analyze_text, ANALYSIS_MODES, ANALYSIS_PROMPT_VERSION
 from export_utils import (
     export_chat_to_pdf, export_chat_to_docx, export_chat_to_txt,
-    export_analysis_to_pdf, export_analysis_to_docx, export_analysis_to_txt
+    export_analysis_to_pdf, export_analysis_to_docx, export_analysis_to_txt,
+    export_chat_to_pdf_file, chat_txt_header, chat_txt_message, normalize_message, spill_message,
+    EXPORT_MEDIA_TYPES, EXPORT_TEMPLATE_VERSION, EXPORT_WORKERS, ExportTimeout, ZipStream,
+    render_export, run_export
 )
+from cache_utils import DiskLRUCache, cache_key
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -105,6 +122,7 @@ class DocumentAnalysis(BaseModel):
     filename: str
     file_type: str
     analysis_result: Dict[str, Any]
+    content_hash: Optional[str] = None  # SHA-256 of the uploaded file
     uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 # ==================== AUTHENTICATION HELPERS ====================
@@ -303,6 +321,28 @@ async def get_me(user_id: str = Depends(get_current_user)):
 
 # ==================== CHAT ENDPOINTS ====================
 
+CHAT_MODEL = 'gemini-2.5-pro'
+# Most recent messages considered for context; the token budget decides how many are sent
+CHAT_HISTORY_MESSAGES = 20
+
+CHAT_PROMPT_TEMPLATE = """You are Pleader AI, an expert legal assistant specializing EXCLUSIVELY in Indian law and legal framework.
+
+Previous conversation:
+{history}
+
+User question: {message}
+
+STRICT INSTRUCTIONS:
+- Focus ONLY on Indian legal system, laws, and precedents
+- Cite specific Indian Acts, IPC sections, Constitution articles, or Supreme Court/High Court judgments when applicable
+- Format responses with clear structure: headings, bullet points, numbered lists
+- Use bold for important terms (**term**) and proper legal terminology
+- If discussing any non-Indian legal concept, explicitly compare it to Indian law
+- Provide practical guidance within Indian legal framework
+- Be professional, accurate, and cite sources when making legal claims
+
+Provide a clear, well-formatted response focusing strictly on Indian legal context:"""
+
 @api_router.post("/chat/send")
 async def send_message(request: SendMessageRequest, user_id: str = Depends(get_current_user)):
     """Send a message and get AI response"""
@@ -329,33 +369,20 @@ async def send_message(request: SendMessageRequest, user_id: str = Depends(get_c
         )
         
         # Generate AI response using Gemini
-        model = genai.GenerativeModel('gemini-2.5-pro')
+        model = genai.GenerativeModel(CHAT_MODEL)
         
-        # Build conversation history for context
+        # Build conversation history for context, newest messages first until the budget is spent
         messages = chat.get("messages", []) if isinstance(chat, dict) else chat.messages
-        conversation_history = "\n".join([
+        history_lines = [
             f"{msg['sender'] if isinstance(msg, dict) else msg.sender}: {msg['content'] if isinstance(msg, dict) else msg.content}"
-            for msg in messages[-5:]  # Last 5 messages for context
-        ])
+            for msg in messages[-CHAT_HISTORY_MESSAGES:]
+        ]
+        budget = remaining_budget(CHAT_MODEL, CHAT_PROMPT_TEMPLATE, request.message)
+        packed = pack(history_lines, budget, priorities=list(range(len(history_lines))))
+        conversation_history = "\n".join(line for line in packed if line is not None)
         
         # Create prompt with legal context
-        prompt = f"""You are Pleader AI, an expert legal assistant specializing EXCLUSIVELY in Indian law and legal framework.
-
-Previous conversation:
-{conversation_history}
-
-User question: {request.message}
-
-STRICT INSTRUCTIONS:
-- Focus ONLY on Indian legal system, laws, and precedents
-- Cite specific Indian Acts, IPC sections, Constitution articles, or Supreme Court/High Court judgments when applicable
-- Format responses with clear structure: headings, bullet points, numbered lists
-- Use bold for important terms (**term**) and proper legal terminology
-- If discussing any non-Indian legal concept, explicitly compare it to Indian law
-- Provide practical guidance within Indian legal framework
-- Be professional, accurate, and cite sources when making legal claims
-
-Provide a clear, well-formatted response focusing strictly on Indian legal context:"""
+        prompt = CHAT_PROMPT_TEMPLATE.format(history=conversation_history, message=request.message)
         
         response = model.generate_content(prompt)
         ai_response_text = response.text
@@ -415,11 +442,281 @@ async def delete_chat(chat_id: str, user_id: str = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="Chat not found")
     return {"message": "Chat deleted successfully"}
 
+# ==================== DOCUMENT PROCESSING ====================
+
+UNSUPPORTED_FILE_TYPE_DETAIL = "Unsupported file type. Supported: PDF, DOCX, TXT, JPG, PNG"
+ANALYSIS_MODE_DETAIL = f"Unknown analysis mode. Use one of: {', '.join(ANALYSIS_MODES)}"
+OCR_BUSY_DETAIL = "OCR service is busy. Please retry shortly."
+# Seconds clients are asked to wait before retrying when the OCR queue is full
+OCR_RETRY_AFTER = 10
+
+def extract_document_text(source: FileSource, filename: str) -> ExtractionResult:
+    """Extract text from an upload, rejecting documents with too little text"""
+    extracted = extract_file(source, filename)
+    if not extracted.text or len(extracted.text.strip()) < 50:
+        raise ValueError("Could not extract sufficient text from document")
+    return extracted
+
+async def extract_upload_text(upload: BinaryIO, filename: str, content_hash: Optional[str]) -> ExtractionResult:
+    """
+    Extract an upload's text, reusing the text of an identical earlier upload
+    
+    Raises:
+        HTTPException: 400 if too little text was extracted, 503 if the OCR queue is full
+    """
+    text = await find_cached_text(content_hash)
+    if text is not None:
+        return ExtractionResult(text, True)
+    try:
+        return await asyncio.to_thread(extract_document_text, upload, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OCRQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail=OCR_BUSY_DETAIL,
+            headers={"Retry-After": str(OCR_RETRY_AFTER)}
+        )
+
+def build_analysis_result(text: str, analysis_text: str) -> Dict[str, Any]:
+    """Analysis payload stored with the document and returned to the client"""
+    return {
+        "extracted_text": text[:2000] + "..." if len(text) > 2000 else text,
+        "full_analysis": analysis_text,
+        "text_length": len(text)
+    }
+
+async def save_document(doc_analysis: DocumentAnalysis, text: str, extraction_complete: bool):
+    """
+    Store a document: lightweight metadata in documents, and the full text and
+    analysis compressed in document_texts (fetched only when a document is opened)
+    
+    Upserts, so retried ingestion jobs do not duplicate the document. Text from
+    an incomplete extraction is stored but never reused for identical uploads.
+    """
+    record = await asyncio.to_thread(
+        build_text_record, doc_analysis.id, doc_analysis.user_id, doc_analysis.filename, text,
+        doc_analysis.content_hash, doc_analysis.analysis_result["full_analysis"], extraction_complete
+    )
+    await db[TEXT_COLLECTION].replace_one({"document_id": doc_analysis.id}, record, upsert=True)
+    
+    metadata = doc_analysis.model_dump(exclude={"analysis_result"})
+    metadata["text_length"] = len(text)
+    await db.documents.replace_one({"id": doc_analysis.id}, metadata, upsert=True)
+
+async def load_document_analysis(doc: Dict[str, Any], include_text: bool = False) -> Dict[str, Any]:
+    """
+    Analysis payload of a stored document, decompressed from document_texts
+    
+    Documents saved before analyses were stored separately keep theirs inline.
+    """
+    if "analysis_result" in doc and not include_text:
+        return doc["analysis_result"]
+    
+    record = await db[TEXT_COLLECTION].find_one({"document_id": doc["id"]})
+    text = await asyncio.to_thread(read_text_record, record)
+    analysis_text = await asyncio.to_thread(read_analysis_record, record)
+    
+    if "analysis_result" in doc:
+        analysis_result = dict(doc["analysis_result"])
+    else:
+        analysis_result = build_analysis_result(text or "", analysis_text or "")
+    if include_text:
+        analysis_result["full_text"] = text
+    return analysis_result
+
+# ==================== UPLOAD DEDUPLICATION ====================
+
+# Analyses keyed by upload content hash, prompt version and analysis mode
+ANALYSIS_CACHE_COLLECTION = "analysis_cache"
+
+async def find_cached_text(content_hash: Optional[str]) -> Optional[str]:
+    """Full text already extracted from an identical upload, if any was extracted completely"""
+    if not content_hash:
+        return None
+    # Text cut short by an extraction timeout is not reused, so a later upload gets a full extraction
+    record = await db[TEXT_COLLECTION].find_one(
+        {"content_hash": content_hash, "extraction_complete": True}, {"analysis": 0}
+    )
+    if record is None:
+        return None
+    logger.info(f"Reusing extracted text of document {record['document_id']} (identical upload)")
+    return await asyncio.to_thread(read_text_record, record)
+
+async def analyze_document_text(text: str, analysis_mode: str, content_hash: Optional[str],
+                                extraction_complete: bool) -> str:
+    """
+    Analyze document text, reusing the analysis of an identical upload made with the current prompts
+    
+    Analyses of incompletely extracted text, or with sections that failed, are
+    not cached, so the next upload of the file gets a full analysis.
+    """
+    key = {
+        "content_hash": content_hash,
+        "prompt_version": ANALYSIS_PROMPT_VERSION,
+        "analysis_mode": analysis_mode,
+    }
+    if content_hash:
+        cached = await db[ANALYSIS_CACHE_COLLECTION].find_one(key)
+        if cached:
+            logger.info(f"Reusing cached analysis for upload {content_hash[:12]}")
+            return cached["analysis"]
+    
+    analysis_text, analysis_complete = await analyze_text(text, analysis_mode)
+    
+    if content_hash and extraction_complete and analysis_complete:
+        await db[ANALYSIS_CACHE_COLLECTION].replace_one(
+            key,
+            {**key, "analysis": analysis_text, "created_at": datetime.now(timezone.utc)},
+            upsert=True
+        )
+    return analysis_text
+
+async def find_indexed_copy(content_hash: Optional[str], document_id: str) -> Optional[str]:
+    """Id of another document with the same content, whose indexed chunks can be reused"""
+    if not content_hash:
+        return None
+    original = await db.documents.find_one(
+        {"content_hash": content_hash, "id": {"$ne": document_id}},
+        {"_id": 0, "id": 1}
+    )
+    return original["id"] if original else None
+
+def index_document_text(text: str, filename: str, user_id: str, document_id: str,
+                        source_document_id: Optional[str] = None) -> int:
+    """
+    Chunk and index document text in the RAG pipeline (blocking)
+    
+    When source_document_id names an indexed document with identical content,
+    its vectors are shared instead of embedding the text again.
+    """
+    return index_document_batch([{
+        "text": text,
+        "filename": filename,
+        "user_id": user_id,
+        "document_id": document_id,
+        "source_document_id": source_document_id,
+    }])
+
+def index_document_batch(documents: List[Dict[str, Any]]) -> int:
+    """
+    Index several documents with a single embedding pass and index generation (blocking)
+    
+    Documents already in the index are skipped, so a retried or re-run ingestion
+    job does not add a document's chunks twice.
+    
+    Args:
+        documents: Dicts with text, filename, user_id, document_id and optionally
+            source_document_id (an indexed document with identical content)
+    
+    Returns:
+        Total number of chunks indexed
+    """
+    rag = get_rag_pipeline()
+    total = 0
+    chunks: List[str] = []
+    metadata: List[Dict[str, Any]] = []
+    for document in documents:
+        if rag.has_document(document["document_id"]):
+            logger.info(f"Document {document['document_id']} is already indexed, skipping")
+            continue
+        
+        if document.get("source_document_id"):
+            num_chunks = rag.copy_document(
+                document["source_document_id"],
+                {"filename": document["filename"], "user_id": document["user_id"], "document_id": document["document_id"]}
+            )
+            if num_chunks:
+                total += num_chunks
+                continue
+        
+        document_chunks = rag.chunk_text(document["text"])
+        chunks.extend(document_chunks)
+        metadata.extend(
+            {
+                "filename": document["filename"],
+                "user_id": document["user_id"],
+                "document_id": document["document_id"],
+                "chunk_index": i
+            }
+            for i in range(len(document_chunks))
+        )
+    
+    rag.add_documents(chunks, metadata)
+    logger.info(f"Indexed {len(chunks)} chunks from {len(documents)} documents to RAG pipeline")
+    return total + len(chunks)
+
+# ==================== INGESTION QUEUE STAGES ====================
+
+async def extraction_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract text from the stored upload"""
+    text = await find_cached_text(job.get("content_hash"))
+    complete = True
+    if text is None:
+        upload = await ingestion_queue.get_blob_file(job["file_id"])
+        try:
+            # OCRQueueFull is left to fail the attempt, so the job is retried after a backoff
+            text, complete = await asyncio.to_thread(extract_document_text, upload, job["filename"])
+        except ValueError as e:
+            raise JobFailed(str(e))
+        finally:
+            upload.close()
+    text_file_id = await ingestion_queue.put_blob(f"{job['id']}.txt", text.encode('utf-8'))
+    return {"text_file_id": text_file_id, "extraction_complete": complete}
+
+async def load_job_text(job: Dict[str, Any]) -> str:
+    """Read the text saved by the extraction stage"""
+    return (await ingestion_queue.get_blob(job["state"]["text_file_id"])).decode('utf-8')
+
+async def analysis_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze the extracted text and save the document"""
+    text = await load_job_text(job)
+    content_hash = job.get("content_hash")
+    extraction_complete = job["state"].get("extraction_complete", False)
+    analysis_text = await analyze_document_text(
+        text, job.get("analysis_mode", "auto"), content_hash, extraction_complete
+    )
+    analysis_result = build_analysis_result(text, analysis_text)
+    
+    doc_analysis = DocumentAnalysis(
+        id=job["document_id"],
+        user_id=job["user_id"],
+        filename=job["filename"],
+        file_type=job["file_type"],
+        analysis_result=analysis_result,
+        content_hash=content_hash
+    )
+    await save_document(doc_analysis, text, extraction_complete)
+    
+    return {
+        "result": {
+            "id": doc_analysis.id,
+            "filename": job["filename"],
+            "analysis": analysis_result
+        }
+    }
+
+async def indexing_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Index the extracted text in the RAG pipeline"""
+    text = await load_job_text(job)
+    source_document_id = await find_indexed_copy(job.get("content_hash"), job["document_id"])
+    num_chunks = await asyncio.to_thread(
+        index_document_text, text, job["filename"], job["user_id"], job["document_id"], source_document_id
+    )
+    return {"chunks_indexed": num_chunks}
+
+ingestion_queue = IngestionQueue(db, stages=[
+    ("extraction", extraction_stage),
+    ("analysis", analysis_stage),
+    ("indexing", indexing_stage),
+])
+
 # ==================== DOCUMENT ENDPOINTS ====================
 
 @api_router.post("/documents/analyze")
 async def analyze_document(
     file: UploadFile = File(...),
+    analysis_mode: str = Form("auto"),
     user_id: str = Depends(get_current_user)
 ):
     """Analyze a legal document with proper text extraction and RAG indexing"""
@@ -428,87 +725,42 @@ async def analyze_document(
         if not validate_file_type(file.filename):
             raise HTTPException(
                 status_code=400, 
-                detail="Unsupported file type. Supported: PDF, DOCX, TXT, JPG, PNG"
+                detail=UNSUPPORTED_FILE_TYPE_DETAIL
             )
+        if analysis_mode not in ANALYSIS_MODES:
+            raise HTTPException(status_code=400, detail=ANALYSIS_MODE_DETAIL)
         
-        # Read file content
-        content = await file.read()
+        # Check size and content type; the upload stays in Starlette's spooled temp file
+        upload = await validate_upload(file)
+        content_hash = await asyncio.to_thread(hash_upload, upload)
         
-        # Extract text using proper extraction utilities
+        # Extract text using proper extraction utilities, unless an identical file was already extracted
         file_type = file.filename.split('.')[-1].lower()
-        text = extract_text_from_file(content, file.filename)
-        
-        if not text or len(text.strip()) < 50:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not extract sufficient text from document"
-            )
-        
-        # Analyze with Gemini
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
-        prompt = f"""Analyze this legal document strictly within the Indian legal framework:
-
-Document text:
-{text[:8000]}
-
-Provide a comprehensive analysis with these sections:
-
-1. **Key Points**: Identify main clauses, provisions, and important sections. Reference specific clause numbers or paragraph references.
-
-2. **Risk Assessment**: Identify legal risks or concerns under Indian law. For each risk:
-   - Categorize severity: LOW/MEDIUM/HIGH
-   - Reference applicable Indian Acts, IPC sections, or constitutional articles
-   - Explain potential legal consequences under Indian jurisdiction
-
-3. **Suggestions**: Provide recommendations for improvement:
-   - Missing clauses required under Indian law
-   - Ambiguous terms needing clarification
-   - Compliance with Indian Contract Act, Consumer Protection Act, or other relevant legislation
-
-4. **Legal References**: Cite specific Indian legal provisions:
-   - Relevant sections from Indian Acts (e.g., Indian Contract Act 1872, IPC, CPC)
-   - Articles from the Indian Constitution if applicable
-   - Relevant Supreme Court or High Court precedents
-   - Mandatory compliance requirements under Indian law
-
-Format with clear headings, bullet points, and bold key terms. Be specific and professional, focusing exclusively on Indian legal framework."""
+        text, extraction_complete = await extract_upload_text(upload, file.filename, content_hash)
         
-        response = model.generate_content(prompt)
-        analysis_text = response.text
+        # Analyze with Gemini, map-reducing over sections when the document is long
+        analysis_text = await analyze_document_text(text, analysis_mode, content_hash, extraction_complete)
         
         # Create analysis result
-        analysis_result = {
-            "extracted_text": text[:2000] + "..." if len(text) > 2000 else text,
-            "full_analysis": analysis_text,
-            "text_length": len(text)
-        }
+        analysis_result = build_analysis_result(text, analysis_text)
         
         # Save document analysis
         doc_analysis = DocumentAnalysis(
             user_id=user_id,
             filename=file.filename,
             file_type=file_type,
-            analysis_result=analysis_result
+            analysis_result=analysis_result,
+            content_hash=content_hash
         )
         
-        await db.documents.insert_one(doc_analysis.model_dump())
+        await save_document(doc_analysis, text, extraction_complete)
         
-        # Index document in RAG pipeline for future queries
+        # Index document in RAG pipeline for future queries, sharing the vectors of an identical upload
         try:
-            rag = get_rag_pipeline()
-            chunks = rag.chunk_text(text)
-            metadata = [
-                {
-                    "filename": file.filename,
-                    "user_id": user_id,
-                    "document_id": doc_analysis.id,
-                    "chunk_index": i
-                }
-                for i in range(len(chunks))
-            ]
-            rag.add_documents(chunks, metadata)
-            logger.info(f"Indexed {len(chunks)} chunks from {file.filename} to RAG pipeline")
+            source_document_id = await find_indexed_copy(content_hash, doc_analysis.id)
+            await asyncio.to_thread(
+                index_document_text, text, file.filename, user_id, doc_analysis.id, source_document_id
+            )
         except Exception as e:
             logger.warning(f"Failed to index document in RAG: {e}")
             # Continue even if RAG indexing fails
@@ -525,11 +777,264 @@ Format with clear headings, bullet points, and bold key terms. Be specific and p
         logging.error(f"Document analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing document: {str(e)}")
 
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '50'))
+BATCH_EXTRACTION_CONCURRENCY = int(os.environ.get('BATCH_EXTRACTION_CONCURRENCY', '4'))
+BATCH_ANALYSIS_CONCURRENCY = int(os.environ.get('BATCH_ANALYSIS_CONCURRENCY', '4'))
+# Batch indexing runs that outlive their stream (client disconnected); referenced so they are not collected
+_batch_indexing_tasks: Set[asyncio.Task] = set()
+
+@api_router.post("/documents/analyze/batch")
+async def analyze_document_batch(
+    files: List[UploadFile] = File(...),
+    analysis_mode: str = Form("auto"),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Analyze a bundle of documents concurrently, streaming one NDJSON line per file as it finishes
+    
+    Extraction and analysis run with separate concurrency limits. Documents are
+    indexed together at the end with one batched embedding pass, reported in the
+    final "summary" line. Documents saved before a client disconnects are still
+    indexed.
+    """
+    if analysis_mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=ANALYSIS_MODE_DETAIL)
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {BATCH_MAX_FILES} per batch")
+    
+    # Invalid files are reported in the stream rather than failing the whole bundle
+    uploads = []
+    rejected = []
+    for file in files:
+        if not validate_file_type(file.filename):
+            rejected.append({"filename": file.filename, "status_code": 400, "error": UNSUPPORTED_FILE_TYPE_DETAIL})
+            continue
+        try:
+            await validate_upload(file)
+        except HTTPException as e:
+            rejected.append({"filename": file.filename, "status_code": e.status_code, "error": e.detail})
+            continue
+        uploads.append((file.filename, detach_upload(file)))
+    
+    return StreamingResponse(
+        stream_batch_analysis(uploads, rejected, analysis_mode, user_id),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_batch_analysis(uploads: List[Any], rejected: List[Dict[str, Any]],
+                                analysis_mode: str, user_id: str):
+    """Run the batch pipeline, yielding an NDJSON line per document and a final summary"""
+    extraction_slots = asyncio.Semaphore(BATCH_EXTRACTION_CONCURRENCY)
+    analysis_slots = asyncio.Semaphore(BATCH_ANALYSIS_CONCURRENCY)
+    to_index: List[Dict[str, Any]] = []
+    
+    async def process(filename: str, upload: BinaryIO) -> Dict[str, Any]:
+        try:
+            async with extraction_slots:
+                content_hash = await asyncio.to_thread(hash_upload, upload)
+                text, extraction_complete = await extract_upload_text(upload, filename, content_hash)
+            upload.close()
+            
+            async with analysis_slots:
+                analysis_text = await analyze_document_text(text, analysis_mode, content_hash, extraction_complete)
+            
+            analysis_result = build_analysis_result(text, analysis_text)
+            doc_analysis = DocumentAnalysis(
+                user_id=user_id,
+                filename=filename,
+                file_type=filename.split('.')[-1].lower(),
+                analysis_result=analysis_result,
+                content_hash=content_hash
+            )
+            source_document_id = await find_indexed_copy(content_hash, doc_analysis.id)
+            await save_document(doc_analysis, text, extraction_complete)
+            
+            # Queued right after saving (no await between), so a cancelled task never leaves a saved document unindexed
+            to_index.append({
+                "text": text,
+                "filename": filename,
+                "user_id": user_id,
+                "document_id": doc_analysis.id,
+                "source_document_id": source_document_id,
+            })
+            return {"filename": filename, "status": "completed", "id": doc_analysis.id, "analysis": analysis_result}
+        except HTTPException as e:
+            return {"filename": filename, "status": "failed", "status_code": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Batch analysis of {filename} failed: {e}")
+            return {"filename": filename, "status": "failed", "status_code": 500, "error": f"Error analyzing document: {str(e)}"}
+        finally:
+            upload.close()
+    
+    for item in rejected:
+        yield json.dumps({"type": "document", "status": "failed", **item}) + "\n"
+    
+    tasks = [asyncio.create_task(process(filename, upload)) for filename, upload in uploads]
+    completed = 0
+    indexing = None
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            completed += result["status"] == "completed"
+            yield json.dumps({"type": "document", **result}, default=str) + "\n"
+    finally:
+        # The client may disconnect mid-stream; stop work nobody will receive
+        for task in tasks:
+            task.cancel()
+        for _, upload in uploads:
+            upload.close()
+        # Documents already saved are indexed regardless, in a task that does not depend on the stream
+        if to_index:
+            indexing = asyncio.create_task(asyncio.to_thread(index_document_batch, to_index))
+            _batch_indexing_tasks.add(indexing)
+            indexing.add_done_callback(log_batch_indexing)
+    
+    summary = {
+        "type": "summary",
+        "completed": completed,
+        "failed": len(rejected) + len(uploads) - completed,
+        "chunks_indexed": 0,
+    }
+    if indexing is not None:
+        try:
+            summary["chunks_indexed"] = await asyncio.shield(indexing)
+        except Exception as e:
+            summary["indexing_error"] = str(e)
+    yield json.dumps(summary) + "\n"
+
+def log_batch_indexing(task: asyncio.Task):
+    """Release a finished batch indexing task, logging its failure"""
+    _batch_indexing_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Failed to index document batch in RAG: {task.exception()}")
+
+@api_router.post("/documents/jobs")
+async def create_ingestion_job(
+    file: UploadFile = File(...),
+    analysis_mode: str = Form("auto"),
+    user_id: str = Depends(get_current_user)
+):
+    """Queue a document for background extraction, analysis and indexing"""
+    if not validate_file_type(file.filename):
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FILE_TYPE_DETAIL)
+    if analysis_mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=ANALYSIS_MODE_DETAIL)
+    
+    upload = await validate_upload(file)
+    content_hash = await asyncio.to_thread(hash_upload, upload)
+    job = await ingestion_queue.enqueue(
+        user_id,
+        file.filename,
+        upload,
+        document_id=str(uuid.uuid4()),
+        file_type=file.filename.split('.')[-1].lower(),
+        analysis_mode=analysis_mode,
+        content_hash=content_hash
+    )
+    
+    return {
+        "job_id": job["id"],
+        "document_id": job["document_id"],
+        "status": job["status"]
+    }
+
+@api_router.get("/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Get the status and stage progress of an ingestion job"""
+    job = await ingestion_queue.get_job(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/documents/jobs/{job_id}/events")
+async def stream_ingestion_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Stream ingestion job updates as server-sent events until the job finishes"""
+    if not await ingestion_queue.get_job(job_id, user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_payload = None
+        while True:
+            job = await ingestion_queue.get_job(job_id, user_id)
+            if job is None:
+                break
+            payload = json.dumps(job, default=str)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+            if job["status"] in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+DOCUMENT_PAGE_SIZE = 50
+DOCUMENT_MAX_PAGE_SIZE = 200
+# Listing fields only; the analysis is loaded by GET /documents/{document_id}
+DOCUMENT_LIST_PROJECTION = {
+    "_id": 0, "id": 1, "filename": 1, "file_type": 1, "uploaded_at": 1,
+    "text_length": 1, "analysis_result.text_length": 1,
+}
+
+def encode_document_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque cursor positioned after a document in the (uploaded_at, id) descending order"""
+    position = json.dumps({"uploaded_at": doc["uploaded_at"].isoformat(), "id": doc["id"]})
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+def decode_document_cursor(cursor: str) -> Dict[str, Any]:
+    """Mongo filter for the documents after a cursor"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        uploaded_at = datetime.fromisoformat(position["uploaded_at"])
+        document_id = position["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"uploaded_at": {"$lt": uploaded_at}},
+        {"uploaded_at": uploaded_at, "id": {"$lt": document_id}},
+    ]}
+
 @api_router.get("/documents")
-async def get_documents(user_id: str = Depends(get_current_user)):
-    """Get user's documents"""
-    documents = await db.documents.find({"user_id": user_id}, {"_id": 0}).sort("uploaded_at", -1).to_list(50)
-    return documents
+async def get_documents(
+    limit: int = Query(DOCUMENT_PAGE_SIZE, ge=1, le=DOCUMENT_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    """Get a page of the user's documents (metadata only), newest first"""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        query.update(decode_document_cursor(cursor))
+    
+    documents = await db.documents.find(query, DOCUMENT_LIST_PROJECTION).sort(
+        [("uploaded_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    for doc in documents:
+        # Documents saved before metadata was split out keep their length in analysis_result
+        legacy = doc.pop("analysis_result", None) or {}
+        doc.setdefault("text_length", legacy.get("text_length"))
+    
+    return {
+        "documents": documents,
+        "next_cursor": encode_document_cursor(documents[-1]) if has_more else None
+    }
+
+@api_router.get("/documents/{document_id}")
+async def get_document(document_id: str, include_text: bool = False, user_id: str = Depends(get_current_user)):
+    """Get a document with its analysis, and optionally its full extracted text"""
+    doc = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    doc["analysis"] = await load_document_analysis(doc, include_text)
+    doc.pop("analysis_result", None)
+    return doc
 
 @api_router.delete("/documents/{document_id}")
 async def delete_document(document_id: str, user_id: str = Depends(get_current_user)):
@@ -537,6 +1042,7 @@ async def delete_document(document_id: str, user_id: str = Depends(get_current_u
     result = await db.documents.delete_one({"id": document_id, "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Document not found")
+    await db[TEXT_COLLECTION].delete_one({"document_id": document_id})
     return {"message": "Document deleted successfully"}
 
 # ==================== RAG ENDPOINTS ====================
@@ -545,6 +1051,28 @@ class RAGQuery(BaseModel):
     query: str
     top_k: int = 3
     use_rerank: bool = True
+    rerank_method: Literal["llm", "mmr"] = "llm"  # mmr re-ranks locally without LLM calls
+
+RAG_BATCH_MAX_QUERIES = int(os.environ.get('RAG_BATCH_MAX_QUERIES', '500'))
+RAG_BATCH_MAX_CONCURRENCY = int(os.environ.get('RAG_BATCH_MAX_CONCURRENCY', '8'))
+
+class RAGBatchSearch(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=RAG_BATCH_MAX_QUERIES)
+    top_k: int = 3
+    rerank_method: Literal["none", "mmr"] = "none"
+    generate_answers: bool = False
+    max_concurrency: int = Field(4, ge=1, le=RAG_BATCH_MAX_CONCURRENCY)  # Parallel answer generations
+
+def format_sources(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Trim retrieved documents to the source summary returned by the API"""
+    return [
+        {
+            "filename": doc['metadata'].get('filename', 'Unknown'),
+            "text": doc['text'][:200] + "..." if len(doc['text']) > 200 else doc['text'],
+            "score": doc.get('rerank_score', doc.get('mmr_score', doc.get('score', 0)))
+        }
+        for doc in results
+    ]
 
 @api_router.post("/rag/query")
 async def rag_query(request: RAGQuery, user_id: str = Depends(get_current_user)):
@@ -556,18 +1084,13 @@ async def rag_query(request: RAGQuery, user_id: str = Depends(get_current_user))
         results, answer = rag.query(
             query=request.query,
             top_k=request.top_k,
-            use_rerank=request.use_rerank
+            use_rerank=request.use_rerank,
+            rerank_method=request.rerank_method,
+            user_id=user_id
         )
         
         # Format sources
-        sources = [
-            {
-                "filename": doc['metadata'].get('filename', 'Unknown'),
-                "text": doc['text'][:200] + "..." if len(doc['text']) > 200 else doc['text'],
-                "score": doc.get('rerank_score', doc.get('score', 0))
-            }
-            for doc in results
-        ]
+        sources = format_sources(results)
         
         return {
             "answer": answer,
@@ -575,10 +1098,59 @@ async def rag_query(request: RAGQuery, user_id: str = Depends(get_current_user))
             "num_sources": len(sources)
         }
     
+    except EmbeddingMismatchError as e:
+        logger.error(f"RAG query error: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"RAG query error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@api_router.post("/rag/batch_search")
+async def rag_batch_search(request: RAGBatchSearch, user_id: str = Depends(get_current_user)):
+    """Run many retrieval queries with batched embedding and one FAISS search"""
+    try:
+        rag = get_rag_pipeline()
+        
+        all_results = await asyncio.to_thread(
+            rag.batch_search,
+            request.queries,
+            request.top_k,
+            request.rerank_method == "mmr",
+            user_id
+        )
+        
+        answers = [None] * len(request.queries)
+        if request.generate_answers:
+            semaphore = asyncio.Semaphore(request.max_concurrency)
+            
+            async def answer(query: str, results: List[Dict[str, Any]]) -> str:
+                async with semaphore:
+                    return await asyncio.to_thread(rag.generate_answer, query, results)
+            
+            answers = await asyncio.gather(*[
+                answer(query, results) for query, results in zip(request.queries, all_results)
+            ])
+        
+        return {
+            "results": [
+                {
+                    "query": query,
+                    "sources": format_sources(results),
+                    "num_sources": len(results),
+                    **({"answer": answer_text} if request.generate_answers else {})
+                }
+                for query, results, answer_text in zip(request.queries, all_results, answers)
+            ],
+            "num_queries": len(request.queries)
+        }
+    
+    except EmbeddingMismatchError as e:
+        logger.error(f"RAG batch search error: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"RAG batch search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch search: {str(e)}")
+
 @api_router.get("/rag/stats")
 async def rag_stats(user_id: str = Depends(get_current_user)):
     """Get RAG index statistics"""
@@ -590,38 +1162,246 @@ async def rag_stats(user_id: str = Depends(get_current_user)):
         logger.error(f"RAG stats error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
+@api_router.get("/ocr/stats")
+async def ocr_stats(user_id: str = Depends(get_current_user)):
+    """Get OCR pool queue depth and latency metrics"""
+    return get_ocr_stats()
+
 # ==================== EXPORT ENDPOINTS ====================
 
+EXPORT_CACHE_BYTES = int(os.environ.get('EXPORT_CACHE_MB', '256')) * 1024 * 1024
+INVALID_EXPORT_FORMAT_DETAIL = "Invalid format. Use: pdf, docx, or txt"
+# Messages fetched per round trip when streaming a chat export
+CHAT_EXPORT_BATCH_SIZE = int(os.environ.get('CHAT_EXPORT_BATCH_SIZE', '200'))
+# Bytes sent per chunk when streaming an export
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Chat fields needed to version and render an export header
+CHAT_EXPORT_PROJECTION = {"_id": 0, "title": 1, "created_at": 1, "updated_at": 1}
+# Exports rendered ahead of the one being written into a workspace ZIP
+WORKSPACE_EXPORT_WINDOW = int(os.environ.get('WORKSPACE_EXPORT_WINDOW', str(EXPORT_WORKERS * 2)))
+
+CHAT_EXPORTERS = {
+    "pdf": export_chat_to_pdf,
+    "docx": export_chat_to_docx,
+    "txt": export_chat_to_txt,
+}
+ANALYSIS_EXPORTERS = {
+    "pdf": export_analysis_to_pdf,
+    "docx": export_analysis_to_docx,
+    "txt": export_analysis_to_txt,
+}
+
+_export_cache: Optional[DiskLRUCache] = None
+
+def get_export_cache() -> DiskLRUCache:
+    """Get or create the rendered export cache"""
+    global _export_cache
+    if _export_cache is None:
+        _export_cache = DiskLRUCache(
+            os.environ.get('EXPORT_CACHE_DIR', "/app/backend/export_cache"),
+            EXPORT_CACHE_BYTES
+        )
+    return _export_cache
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers an ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def iter_file(f: BinaryIO, chunk_size: int = EXPORT_CHUNK_BYTES):
+    """Yield an open file's contents in chunks, closing it at the end"""
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+def file_response(f: BinaryIO, format: str, headers: Dict[str, str]) -> StreamingResponse:
+    """Stream an open export file (read in the threadpool, so large files never sit in memory)"""
+    size = f.seek(0, io.SEEK_END)
+    f.seek(0)
+    headers = {**headers, "Content-Length": str(size)}
+    return StreamingResponse(iter_file(f), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+def export_key(kind: str, entity_id: str, version: Any, format: str) -> str:
+    """Cache key of one rendered version of an export"""
+    return cache_key(kind, entity_id, str(version), format, EXPORT_TEMPLATE_VERSION)
+
+async def render_export_file(key: str, format: str, load, exporters: Dict[str, Any],
+                             renderers: Optional[Dict[str, Any]] = None) -> BinaryIO:
+    """
+    Render an export that is not cached, cache it and return it as an open file
+    
+    Args:
+        key: Export cache key
+        format: pdf, docx or txt
+        load: Coroutine function returning the full entity to render
+        exporters: Render function per format
+        renderers: Coroutine function per format taking the cache key and returning
+            the open, cached export; used instead of load and exporters for that format
+    
+    Raises:
+        ExportTimeout: If rendering does not finish in time
+    """
+    if renderers and format in renderers:
+        return await renderers[format](key)
+    entity = await load()
+    content = await render_export(exporters[format], format, entity)
+    await asyncio.to_thread(get_export_cache().put, key, content)
+    return io.BytesIO(content)
+
+async def send_export(request: Request, kind: str, entity_id: str, version: Any, format: str,
+                      load, exporters: Dict[str, Any], filename: str,
+                      renderers: Optional[Dict[str, Any]] = None,
+                      streamers: Optional[Dict[str, Any]] = None) -> Response:
+    """
+    Serve an export, rendering it only when no cached copy of this version exists
+    
+    Exports are keyed by entity, version, format and template version. Clients
+    holding the current ETag get a 304 without the entity even being loaded.
+    
+    Args:
+        request: Incoming request (for If-None-Match)
+        kind: Entity kind, e.g. chat or analysis
+        entity_id: Entity id
+        version: Value that changes whenever the entity's content does
+        format: pdf, docx or txt
+        load: Coroutine function returning the full entity to render
+        exporters: Render function per format
+        filename: Download filename without extension
+        renderers: See render_export_file
+        streamers: Coroutine function per format taking (cache key, headers) and
+            returning a streaming response that also fills the cache; preferred
+            over renderers for that format
+    """
+    format = format.lower()
+    if format not in exporters:
+        raise HTTPException(status_code=400, detail=INVALID_EXPORT_FORMAT_DETAIL)
+    
+    key = export_key(kind, entity_id, version, format)
+    etag = f'"{key[:32]}"'
+    headers = {
+        "ETag": etag,
+        # Always revalidate; unchanged exports then cost a 304
+        "Cache-Control": "private, no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    headers["Content-Disposition"] = f"attachment; filename={filename}.{format}"
+    export = await asyncio.to_thread(get_export_cache().open, key)
+    if export is None:
+        if streamers and format in streamers:
+            return await streamers[format](key, headers)
+        try:
+            export = await render_export_file(key, format, load, exporters, renderers)
+        except ExportTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+    return file_response(export, format, headers)
+
+def iter_chat_messages(chat_id: str, user_id: str):
+    """A chat's messages in order, fetched in batches instead of as one chat document"""
+    return db.chats.aggregate(
+        [
+            {"$match": {"id": chat_id, "user_id": user_id}},
+            {"$unwind": "$messages"},
+            {"$replaceRoot": {"newRoot": "$messages"}},
+        ],
+        batchSize=CHAT_EXPORT_BATCH_SIZE,
+    )
+
+async def load_chat(chat_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Full chat document, messages included"""
+    return await db.chats.find_one({"id": chat_id, "user_id": user_id})
+
+async def iter_chat_txt(chat_id: str, user_id: str, chat: Dict[str, Any]):
+    """Encoded chunks of a TXT chat export, produced as its messages are read"""
+    yield chat_txt_header(chat).encode('utf-8')
+    
+    parts, size, count = [], 0, 0
+    async for msg in iter_chat_messages(chat_id, user_id):
+        parts.append(chat_txt_message(normalize_message(msg)).encode('utf-8'))
+        size += len(parts[-1])
+        count += 1
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+    logger.info(f"Exported chat to TXT with {count} messages")
+
+async def stream_chat_txt(chat_id: str, user_id: str, chat: Dict[str, Any],
+                          key: str, headers: Dict[str, str]) -> StreamingResponse:
+    """Stream a TXT chat export as its messages are read, teeing it into the export cache"""
+    async def body():
+        # Abandoned downloads raise out of the yield, so a partial export is never cached
+        with get_export_cache().writer(key) as sink:
+            async for chunk in iter_chat_txt(chat_id, user_id, chat):
+                sink.write(chunk)
+                yield chunk
+    
+    return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES["txt"], headers=headers)
+
+async def render_chat_txt(chat_id: str, user_id: str, chat: Dict[str, Any], key: str) -> BinaryIO:
+    """Write a TXT chat export into the export cache as its messages are read"""
+    cache = get_export_cache()
+    output_path = cache.reserve()
+    try:
+        with open(output_path, 'wb') as output:
+            async for chunk in iter_chat_txt(chat_id, user_id, chat):
+                output.write(chunk)
+        txt = open(output_path, 'rb')
+        # The open file outlives the entry being replaced or evicted
+        cache.commit(key, output_path)
+    except BaseException:
+        cache.discard(output_path)
+        raise
+    return txt
+
+async def render_chat_pdf(chat_id: str, user_id: str, chat: Dict[str, Any], key: str) -> BinaryIO:
+    """
+    Render a PDF chat export without holding the messages or the PDF in this process
+    
+    Messages are spooled to a temporary file as they are read, and an export
+    worker renders from the spool straight into the export cache directory.
+    """
+    cache = get_export_cache()
+    spool = tempfile.NamedTemporaryFile(prefix="chat-export-", suffix=".pkl", delete=False)
+    output_path = cache.reserve()
+    try:
+        with spool:
+            async for msg in iter_chat_messages(chat_id, user_id):
+                spill_message(spool, msg)
+        await run_export("pdf", export_chat_to_pdf_file, chat, spool.name, output_path)
+        pdf = open(output_path, 'rb')
+        cache.commit(key, output_path)
+    except BaseException:
+        cache.discard(output_path)
+        raise
+    finally:
+        os.unlink(spool.name)
+    return pdf
+
+def chat_export_renderers(chat_id: str, user_id: str, chat: Dict[str, Any]) -> Dict[str, Any]:
+    """TXT and PDF are produced from a message cursor, so memory does not grow with the chat"""
+    return {
+        "txt": partial(render_chat_txt, chat_id, user_id, chat),
+        "pdf": partial(render_chat_pdf, chat_id, user_id, chat),
+    }
+
 @api_router.get("/chat/{chat_id}/export/{format}")
-async def export_chat(chat_id: str, format: str, user_id: str = Depends(get_current_user)):
+async def export_chat(chat_id: str, format: str, request: Request, user_id: str = Depends(get_current_user)):
     """Export chat in PDF, DOCX, or TXT format"""
     try:
-        # Get chat
-        chat = await db.chats.find_one({"id": chat_id, "user_id": user_id})
+        # Only the chat's header is read up front; the messages are loaded if the export must be rendered
+        chat = await db.chats.find_one({"id": chat_id, "user_id": user_id}, CHAT_EXPORT_PROJECTION)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
-        # Export based on format
-        if format.lower() == 'pdf':
-            content = export_chat_to_pdf(chat)
-            media_type = "application/pdf"
-            filename = f"chat_{chat_id}.pdf"
-        elif format.lower() == 'docx':
-            content = export_chat_to_docx(chat)
-            media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            filename = f"chat_{chat_id}.docx"
-        elif format.lower() == 'txt':
-            content = export_chat_to_txt(chat)
-            media_type = "text/plain"
-            filename = f"chat_{chat_id}.txt"
-        else:
-            raise HTTPException(status_code=400, detail="Invalid format. Use: pdf, docx, or txt")
-        
-        # Return file
-        return StreamingResponse(
-            io.BytesIO(content if isinstance(content, bytes) else content.encode('utf-8')),
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return await send_export(
+            request, "chat", chat_id, chat.get("updated_at"), format, partial(load_chat, chat_id, user_id),
+            CHAT_EXPORTERS, f"chat_{chat_id}", chat_export_renderers(chat_id, user_id, chat),
+            {"txt": partial(stream_chat_txt, chat_id, user_id, chat)}
         )
     
     except HTTPException:
@@ -630,36 +1410,25 @@ async def export_chat(chat_id: str, format: str, user_id: str = Depends(get_curr
         logger.error(f"Export chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error exporting chat: {str(e)}")
 
+async def load_analysis(document_id: str, user_id: str) -> Dict[str, Any]:
+    """Document with its full analysis, as the analysis exporters expect"""
+    doc = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0})
+    doc["analysis_result"] = await load_document_analysis(doc)
+    return doc
+
 @api_router.get("/documents/{document_id}/export/{format}")
-async def export_document_analysis(document_id: str, format: str, user_id: str = Depends(get_current_user)):
+async def export_document_analysis(document_id: str, format: str, request: Request,
+                                   user_id: str = Depends(get_current_user)):
     """Export document analysis in PDF, DOCX, or TXT format"""
     try:
-        # Get document
-        doc = await db.documents.find_one({"id": document_id, "user_id": user_id})
+        # Get document (analyses never change once saved, so the upload time identifies the version)
+        doc = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0, "uploaded_at": 1})
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Export based on format
-        if format.lower() == 'pdf':
-            content = export_analysis_to_pdf(doc)
-            media_type = "application/pdf"
-            filename = f"analysis_{document_id}.pdf"
-        elif format.lower() == 'docx':
-            content = export_analysis_to_docx(doc)
-            media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            filename = f"analysis_{document_id}.docx"
-        elif format.lower() == 'txt':
-            content = export_analysis_to_txt(doc)
-            media_type = "text/plain"
-            filename = f"analysis_{document_id}.txt"
-        else:
-            raise HTTPException(status_code=400, detail="Invalid format. Use: pdf, docx, or txt")
-        
-        # Return file
-        return StreamingResponse(
-            io.BytesIO(content if isinstance(content, bytes) else content.encode('utf-8')),
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return await send_export(
+            request, "analysis", document_id, doc.get("uploaded_at"), format,
+            partial(load_analysis, document_id, user_id), ANALYSIS_EXPORTERS, f"analysis_{document_id}"
         )
     
     except HTTPException:
@@ -668,6 +1437,110 @@ async def export_document_analysis(document_id: str, format: str, user_id: str =
         logger.error(f"Export analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error exporting analysis: {str(e)}")
 
+def workspace_entry_name(folder: str, label: str, entity_id: str, format: str) -> str:
+    """Readable, unique path of an export inside a workspace ZIP"""
+    label = " ".join(re.sub(r"[^\w\- ]+", "", label).split())[:60] or "export"
+    return f"{folder}/{label}_{entity_id[:8]}.{format}"
+
+async def list_workspace_exports(user_id: str, format: str) -> List[Dict[str, Any]]:
+    """Every chat and analysis of a user as export items for stream_workspace_zip"""
+    items = []
+    async for chat in db.chats.find({"user_id": user_id}, {**CHAT_EXPORT_PROJECTION, "id": 1}).sort("created_at", 1):
+        items.append({
+            "name": workspace_entry_name("chats", chat.get("title") or "chat", chat["id"], format),
+            "key": export_key("chat", chat["id"], chat.get("updated_at"), format),
+            "load": partial(load_chat, chat["id"], user_id),
+            "exporters": CHAT_EXPORTERS,
+            "renderers": chat_export_renderers(chat["id"], user_id, chat),
+        })
+    async for doc in db.documents.find({"user_id": user_id}, {"_id": 0, "id": 1, "filename": 1, "uploaded_at": 1}).sort("uploaded_at", 1):
+        items.append({
+            "name": workspace_entry_name("analyses", Path(doc.get("filename") or "analysis").stem, doc["id"], format),
+            "key": export_key("analysis", doc["id"], doc.get("uploaded_at"), format),
+            "load": partial(load_analysis, doc["id"], user_id),
+            "exporters": ANALYSIS_EXPORTERS,
+            "renderers": None,
+        })
+    return items
+
+async def open_workspace_export(item: Dict[str, Any], format: str) -> BinaryIO:
+    """An item's export from the cache, rendered first if needed"""
+    export = await asyncio.to_thread(get_export_cache().open, item["key"])
+    if export is None:
+        export = await render_export_file(item["key"], format, item["load"], item["exporters"], item["renderers"])
+    return export
+
+async def stream_workspace_zip(items: List[Dict[str, Any]], format: str):
+    """
+    Yield a ZIP of exports, written in order while the next ones render
+    
+    At most WORKSPACE_EXPORT_WINDOW exports are rendered ahead of the one being
+    written, so memory stays bounded and the download starts with the first item.
+    Items that fail are listed in export_errors.txt instead of aborting the archive.
+    """
+    archive = ZipStream()
+    pending = deque()
+    remaining = iter(items)
+    failures = []
+    
+    def fill():
+        while len(pending) < WORKSPACE_EXPORT_WINDOW:
+            item = next(remaining, None)
+            if item is None:
+                return
+            pending.append((item, asyncio.create_task(open_workspace_export(item, format))))
+    
+    async def add(name: str, source: BinaryIO, compress: bool):
+        entry = archive.add(name, source, compress)
+        # Reading the export and compressing it happen off the event loop, a chunk at a time
+        while (chunk := await asyncio.to_thread(next, entry, None)) is not None:
+            if chunk:
+                yield chunk
+    
+    try:
+        fill()
+        while pending:
+            item, task = pending.popleft()
+            try:
+                export = await task
+            except Exception as e:
+                logger.warning(f"Workspace export of {item['name']} failed: {e}")
+                failures.append(f"{item['name']}: {e}")
+                continue
+            finally:
+                fill()
+            with export:
+                # PDF and DOCX are already compressed
+                async for chunk in add(item["name"], export, compress=format == "txt"):
+                    yield chunk
+        
+        if failures:
+            async for chunk in add("export_errors.txt", io.BytesIO("\n".join(failures).encode('utf-8')), True):
+                yield chunk
+        yield archive.close()
+        logger.info(f"Exported workspace ZIP with {len(items) - len(failures)} of {len(items)} items")
+    finally:
+        # The client may disconnect mid-download; stop renders nobody will receive
+        for _, task in pending:
+            task.cancel()
+            if task.done() and not task.cancelled() and task.exception() is None:
+                task.result().close()
+
+@api_router.get("/export/workspace")
+async def export_workspace(format: str = Query("pdf"), user_id: str = Depends(get_current_user)):
+    """Export all of the user's chats and document analyses as one ZIP, streamed as items render"""
+    format = format.lower()
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=INVALID_EXPORT_FORMAT_DETAIL)
+    
+    items = await list_workspace_exports(user_id, format)
+    filename = f"pleader_workspace_{datetime.now(timezone.utc):%Y%m%d}.zip"
+    return StreamingResponse(
+        stream_workspace_zip(items, format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 # ==================== USER SETTINGS ====================
 
 @api_router.put("/user/preferences")
@@ -682,6 +1555,12 @@ async def update_preferences(preferences: Dict[str, Any], user_id: str = Depends
 # Include the router in the main app
 app.include_router(api_router)
 
+# Added before CORS so 413 responses still carry CORS headers. A batch may carry
+# BATCH_MAX_FILES full-size files; each one is size-checked as it is validated
+app.add_middleware(RequestSizeLimitMiddleware, path_limits={
+    "/api/documents/analyze/batch": BATCH_MAX_FILES * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -697,6 +1576,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_ingestion_queue():
+    await db[TEXT_COLLECTION].create_index("document_id", unique=True)
+    await db[TEXT_COLLECTION].create_index("content_hash")
+    await db.documents.create_index("content_hash")
+    await db.documents.create_index([("user_id", 1), ("uploaded_at", -1), ("id", -1)])
+    await db[ANALYSIS_CACHE_COLLECTION].create_index(
+        [("content_hash", 1), ("prompt_version", 1), ("analysis_mode", 1)], unique=True
+    )
+    await ingestion_queue.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await ingestion_queue.stop()
     client.close()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Document storage utilities for Pleader AI
+Compressed full-text and analysis records, kept out of the documents collection
+"""
+
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; records fall back to zlib
+    zstandard = None
+
+# zstd compresses extracted legal text better than zlib and decompresses several times faster
+TEXT_CODEC = os.environ.get('TEXT_CODEC', 'zstd' if zstandard is not None else 'zlib').lower()
+TEXT_COMPRESSION_LEVEL = int(os.environ.get('TEXT_COMPRESSION_LEVEL', '6'))
+TEXT_ZSTD_LEVEL = int(os.environ.get('TEXT_ZSTD_LEVEL', '9'))
+TEXT_CODECS = ("zstd", "zlib")
+
+# Collection holding one compressed full-text (and analysis) record per document
+TEXT_COLLECTION = "document_texts"
+
+
+def compress_text(text: str, codec: str = TEXT_CODEC) -> bytes:
+    """Compress UTF-8 text for storage with zstd or zlib"""
+    data = text.encode('utf-8')
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires zstandard: pip install zstandard")
+        return zstandard.ZstdCompressor(level=TEXT_ZSTD_LEVEL).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, TEXT_COMPRESSION_LEVEL)
+    raise ValueError(f"Unknown text compression: {codec}. Use one of: {', '.join(TEXT_CODECS)}")
+
+
+def decompress_text(data: bytes, codec: str = "zlib") -> str:
+    """Inverse of compress_text"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Reading zstd-compressed text requires zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == "zlib":
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown text compression: {codec}")
+
+
+def build_text_record(document_id: str, user_id: str, filename: str, text: str,
+                      content_hash: Optional[str] = None, analysis: Optional[str] = None,
+                      extraction_complete: bool = True) -> Dict[str, Any]:
+    """
+    Build the stored record for a document's full extracted text and analysis
+
+    Args:
+        document_id: Document id shared with the documents collection
+        user_id: Owner of the document
+        filename: Original filename
+        text: Full extracted text
+        content_hash: SHA-256 of the uploaded file, so identical uploads can reuse the text
+        analysis: Full analysis text
+        extraction_complete: False if pages were skipped (timeout), so the text is not reused
+
+    Returns:
+        Record for the document_texts collection
+    """
+    data = compress_text(text)
+    record = {
+        "document_id": document_id,
+        "user_id": user_id,
+        "filename": filename,
+        "content_hash": content_hash,
+        "extraction_complete": extraction_complete,
+        "compression": TEXT_CODEC,
+        "text": data,
+        "text_length": len(text),
+        "compressed_size": len(data),
+        "analysis": None,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    if analysis is not None:
+        record["analysis"] = compress_text(analysis)
+        record["compressed_size"] += len(record["analysis"])
+    return record
+
+
+def read_text_record(record: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the text held in a record built by build_text_record"""
+    if not record:
+        return None
+    return decompress_text(bytes(record["text"]), record.get("compression", "zlib"))
+
+
+def read_analysis_record(record: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the analysis held in a record built by build_text_record, if it has one"""
+    if not record or record.get("analysis") is None:
+        return None
+    return decompress_text(bytes(record["analysis"]), record.get("compression", "zlib"))
@@ -0,0 +1,164 @@
+"""
+Upload handling utilities for Pleader AI
+Request size limits and content sniffing for streamed uploads
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+
+from document_utils import SNIFF_BYTES, matches_file_type
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted upload; multipart bodies are spooled to disk by Starlette as they stream in
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+# Allowance for multipart headers and form fields around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Read size when hashing uploads
+HASH_CHUNK_BYTES = 1024 * 1024
+
+UPLOAD_TOO_LARGE_DETAIL = f"File too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+REQUEST_TOO_LARGE_DETAIL = "Request too large. Maximum size is {mb} MB"
+CONTENT_MISMATCH_DETAIL = "File content does not match its extension"
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject request bodies over a byte limit while they stream in
+
+    Requests announcing a larger Content-Length are refused before any body is
+    read; chunked requests are cut off as soon as the running total passes the limit.
+    Routes taking several files (batch uploads) get their own limit through
+    path_limits; each file in them is still checked by validate_upload.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+                 path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope.get("path"), self.max_bytes)
+        detail = (UPLOAD_TOO_LARGE_DETAIL if max_bytes == self.max_bytes
+                  else REQUEST_TOO_LARGE_DETAIL.format(mb=max_bytes // (1024 * 1024)))
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(send, detail)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            # FastAPI turns body read errors into a 400; answer with the 413 instead
+            if too_large and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except _BodyTooLarge:
+            pass
+        if too_large and not response_started:
+            logger.warning(f"Rejected request body over {max_bytes} bytes for {scope.get('path')}")
+            await self._reject(send, detail)
+
+    @staticmethod
+    async def _reject(send, detail: str):
+        body = json.dumps({"detail": detail}).encode('utf-8')
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def validate_upload(file: UploadFile) -> BinaryIO:
+    """
+    Check an upload's size and magic bytes without reading it into memory
+
+    Args:
+        file: Uploaded file, already spooled by Starlette
+
+    Returns:
+        The spooled binary file, rewound to the start
+
+    Raises:
+        HTTPException: 413 if the file is too large, 415 if its content does not match its extension
+    """
+    size = file.size
+    if size is None:
+        await file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+
+    await file.seek(0)
+    header = await file.read(SNIFF_BYTES)
+    if not matches_file_type(header, file.filename):
+        raise HTTPException(status_code=415, detail=CONTENT_MISMATCH_DETAIL)
+
+    await file.seek(0)
+    return file.file
+
+
+def hash_upload(file: BinaryIO) -> str:
+    """
+    SHA-256 of an upload's content, used to recognise repeat uploads (blocking)
+
+    Args:
+        file: Binary file positioned at the start
+
+    Returns:
+        Hex digest; the file is rewound afterwards
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def detach_upload(file: UploadFile) -> BinaryIO:
+    """
+    Take ownership of an upload's spooled file so it outlives the endpoint
+
+    FastAPI closes form files as soon as the endpoint returns, before a
+    streaming response body runs. The caller must close the returned file.
+    """
+    spooled = file.file
+    file.file = io.BytesIO()
+    return spooled
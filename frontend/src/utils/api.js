@@ -57,8 +57,17 @@ export const documentApi = {
     return response.data;
   },
   
-  getDocuments: async () => {
-    const response = await axios.get(`${API}/documents`);
+  getDocuments: async (cursor = null, limit = 50) => {
+    const response = await axios.get(`${API}/documents`, {
+      params: { limit, ...(cursor ? { cursor } : {}) }
+    });
+    return response.data;
+  },
+
+  getDocument: async (documentId, includeText = false) => {
+    const response = await axios.get(`${API}/documents/${documentId}`, {
+      params: { include_text: includeText }
+    });
     return response.data;
   },
   
@@ -95,6 +104,14 @@ export const userApi = {
   updatePreferences: async (preferences) => {
     const response = await axios.put(`${API}/user/preferences`, preferences);
     return response.data;
+  },
+
+  exportWorkspace: async (format = 'pdf') => {
+    const response = await axios.get(`${API}/export/workspace`, {
+      params: { format },
+      responseType: 'blob'
+    });
+    return response.data;
   }
 };
 
@@ -0,0 +1,66 @@
+"""
+Near-duplicate linking in the RAG index and what search results reveal about it
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from embedding_utils import HashingEmbedder  # noqa: E402
+from rag_utils import RAGPipeline  # noqa: E402
+
+CLAUSE = (
+    "Either party may terminate this Agreement by giving thirty days written notice in the event "
+    "of a material breach under Section 39 of the Indian Contract Act, 1872."
+)
+OTHER_CLAUSE = (
+    "All disputes arising out of this Agreement shall be referred to a sole arbitrator seated at "
+    "Mumbai under the Arbitration and Conciliation Act, 1996."
+)
+
+
+def metadata(user_id: str, document_id: str) -> dict:
+    return {"user_id": user_id, "document_id": document_id, "filename": f"{document_id}.pdf", "chunk_index": 0}
+
+
+def make_pipeline(tmp_path) -> RAGPipeline:
+    return RAGPipeline(index_dir=str(tmp_path), embedder=HashingEmbedder(), llm=lambda model, prompt: "", dedup=True)
+
+
+def test_identical_chunks_from_different_users_share_a_vector(tmp_path):
+    rag = make_pipeline(tmp_path)
+    rag.add_documents([CLAUSE, OTHER_CLAUSE], [metadata("alice", "a1"), metadata("alice", "a1")])
+    rag.add_documents([CLAUSE], [metadata("bob", "b1")])
+
+    stats = rag.get_stats()
+    assert stats["total_documents"] == 3
+    assert stats["index_size"] == 2
+    assert stats["duplicate_chunks"] == 1
+
+
+def test_duplicates_only_list_the_callers_own_chunks(tmp_path):
+    rag = make_pipeline(tmp_path)
+    rag.add_documents([CLAUSE], [metadata("alice", "a1")])
+    rag.add_documents([CLAUSE], [metadata("bob", "b1")])
+    rag.add_documents([CLAUSE], [metadata("alice", "a2")])
+
+    top = rag.search(CLAUSE, k=1, user_id="bob")[0]
+    assert top["metadata"]["user_id"] == "bob"
+    assert top["duplicates"] == []
+    assert top["duplicate_count"] == 2
+
+    top = rag.search(CLAUSE, k=1, user_id="alice")[0]
+    assert top["metadata"]["user_id"] == "alice"
+    assert [linked["document_id"] for linked in top["duplicates"]] == ["a2"]
+    assert top["duplicate_count"] == 2
+
+
+def test_duplicates_are_hidden_without_a_caller(tmp_path):
+    rag = make_pipeline(tmp_path)
+    rag.add_documents([CLAUSE], [metadata("alice", "a1")])
+    rag.add_documents([CLAUSE], [metadata("bob", "b1")])
+
+    for results in (rag.search(CLAUSE, k=1), rag.batch_search([CLAUSE], k=1)[0]):
+        assert results[0]["duplicates"] == []
+        assert results[0]["duplicate_count"] == 1
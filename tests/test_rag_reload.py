@@ -0,0 +1,44 @@
+"""
+Hot reload of index generations published by another process
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from embedding_utils import HashingEmbedder  # noqa: E402
+from rag_utils import RAGPipeline  # noqa: E402
+
+CLAUSE = "The lessee shall pay the monthly rent on or before the fifth day of each calendar month."
+OTHER_CLAUSE = "The arbitral tribunal shall consist of a sole arbitrator appointed by mutual consent."
+
+
+def metadata(document_id: str) -> dict:
+    return {"user_id": "alice", "document_id": document_id, "filename": f"{document_id}.pdf", "chunk_index": 0}
+
+
+def make_pipeline(tmp_path) -> RAGPipeline:
+    return RAGPipeline(index_dir=str(tmp_path), embedder=HashingEmbedder(), llm=lambda model, prompt: "")
+
+
+def test_failed_reload_keeps_serving_the_loaded_generation(tmp_path, monkeypatch):
+    writer = make_pipeline(tmp_path)
+    writer.add_documents([CLAUSE], [metadata("d1")])
+    reader = make_pipeline(tmp_path)
+    loaded = reader.generation
+
+    writer.add_documents([OTHER_CLAUSE], [metadata("d2")])
+
+    def unreadable(*args, **kwargs):
+        raise OSError("generation is being swapped")
+
+    monkeypatch.setattr(reader, "_read_part", unreadable)
+    reader.refresh(wait=True)
+    assert reader.generation == loaded
+    assert reader.get_stats()["total_documents"] == 1
+
+    monkeypatch.undo()
+    reader.refresh(wait=True)
+    assert reader.generation == writer.generation
+    assert reader.get_stats()["total_documents"] == 2
@@ -0,0 +1,54 @@
+"""
+Request body limits for single-file and batch uploads
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+# server.py reads these at import; nothing connects until a request needs the database
+for name, value in (("MONGO_URL", "mongodb://localhost:27017"), ("DB_NAME", "pleader_test"),
+                    ("GEMINI_API_KEY", "test"), ("JWT_SECRET", "test")):
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+from upload_utils import MAX_UPLOAD_BYTES  # noqa: E402
+
+# Each file is under the per-file limit; together they are over it
+FILE_BYTES = 20 * 1024 * 1024
+NUM_FILES = 3
+
+
+@pytest.fixture
+def client():
+    server.app.dependency_overrides[server.get_current_user] = lambda: "user-1"
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+
+def test_batch_over_the_single_upload_limit_is_accepted(client):
+    assert FILE_BYTES * NUM_FILES > MAX_UPLOAD_BYTES
+    # An unsupported extension is rejected per file in the stream, so nothing is extracted or analysed
+    files = [("files", (f"bundle-{i}.bin", b"\0" * FILE_BYTES, "application/octet-stream")) for i in range(NUM_FILES)]
+
+    response = client.post("/api/documents/analyze/batch", files=files)
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["filename"] for line in lines[:-1]] == [f"bundle-{i}.bin" for i in range(NUM_FILES)]
+    assert all(line["status_code"] == 400 for line in lines[:-1])
+    assert lines[-1] == {"type": "summary", "completed": 0, "failed": NUM_FILES, "chunks_indexed": 0}
+
+
+def test_single_upload_over_the_limit_is_rejected(client):
+    files = {"file": ("large.txt", b"a" * (MAX_UPLOAD_BYTES + FILE_BYTES), "text/plain")}
+
+    response = client.post("/api/documents/analyze", files=files)
+
+    assert response.status_code == 413